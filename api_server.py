@@ -0,0 +1,254 @@
+import json
+import asyncio
+import logging
+import weakref
+from contextlib import aclosing
+from aiohttp import web
+from config import Config
+from async_debate_bot import AsyncDebateBot
+from debate_bot import ErrorMessage, ERROR_ROLE
+from opening_cache import get_opening_cache
+from topic_filter import get_topic_filter
+from session_store import SessionStore, get_session_store
+from metrics import REGISTRY, start_periodic_dump
+from logging_setup import configure_logging, log_context, new_request_id, SESSION_ID
+from cancellation import CANCELLED
+
+logger = logging.getLogger(__name__)
+
+BOT = web.AppKey("bot", AsyncDebateBot)
+STORE = web.AppKey("store", SessionStore)
+# Locks are dropped automatically once no request holds them
+TURN_LOCKS = web.AppKey("turn_locks", weakref.WeakValueDictionary)
+# The request task generating each debate's current reply, so a reset can cancel it
+REPLY_TASKS = web.AppKey("reply_tasks", weakref.WeakValueDictionary)
+
+def _turn_lock(app, session_id):
+    """
+    Return the lock that makes turns of one debate run one at a time.
+    """
+    lock = app[TURN_LOCKS].get(session_id)
+    if lock is None:
+        lock = asyncio.Lock()
+        app[TURN_LOCKS][session_id] = lock
+    return lock
+
+def _error(status, message):
+    return web.json_response({"error": message}, status=status)
+
+async def _read_json(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(text=json.dumps({"error": "Request body must be JSON."}), content_type="application/json")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(text=json.dumps({"error": "Request body must be a JSON object."}), content_type="application/json")
+    return body
+
+async def _get_session(request):
+    """
+    Return the debate named in the URL, with its conversation loaded, or raise 404.
+    """
+    def load():
+        session = request.app[STORE].get(request.match_info["debate_id"])
+        if session is not None:
+            # Reading the conversation loads it now, off the event loop
+            session.conversation
+        return session
+
+    # With SESSION_STORE=sqlite every store call is blocking I/O that may wait
+    # on a locked database, so store calls run on worker threads
+    session = await asyncio.to_thread(load)
+    if session is None:
+        raise web.HTTPNotFound(text=json.dumps({"error": "Debate not found."}), content_type="application/json")
+    return session
+
+async def _generate_reply(bot, session):
+    """
+    Yield the bot's reply to the last user message and record it in the session.
+
+    Openings come from the shared opening cache when possible, exactly as in
+    app.py; everything else is streamed from the API. If the request is
+    cancelled, because the debate was reset or the client went away, the
+    API call is stopped and nothing is recorded.
+    """
+    is_opening = len(session.conversation) == 1
+    opening_cache = get_opening_cache()
+    reply = None
+    failed = False
+    if is_opening:
+        reply = await asyncio.to_thread(opening_cache.get, session.topic, session.difficulty, session.style)
+
+    if reply is not None:
+        yield reply
+    else:
+        reply = ""
+        try:
+            async with aclosing(bot.astream_response(session.conversation, session.topic, session.difficulty, session.style)) as chunks:
+                async for chunk in chunks:
+                    failed = failed or isinstance(chunk, ErrorMessage)
+                    reply += chunk
+                    yield chunk
+        except asyncio.CancelledError as e:
+            CANCELLED.inc("reset" if e.args == ("reset",) else "disconnected")
+            raise
+
+        reply = bot.shorten_response(reply, session.difficulty)
+        if is_opening and not failed:
+            await asyncio.to_thread(opening_cache.put, session.topic, session.difficulty, session.style, reply)
+
+    await asyncio.to_thread(session.append, ERROR_ROLE if failed else "assistant", reply)
+
+async def _respond(request, session, replies, on_topic, status=200):
+    """
+    Send a reply as JSON, or as server-sent events when the client asked to stream.
+
+    Streamed replies are sent as `data: {"delta": ...}` events followed by a
+    `done` event carrying the final reply, which may be shorter than the sum of
+    the deltas if the bot's response was trimmed.
+    """
+    if request.query.get("stream", "").lower() not in ("1", "true", "yes"):
+        async with aclosing(replies) as chunks:
+            async for _ in chunks:
+                pass
+        return web.json_response(
+            {"id": session.id, "reply": session.conversation[-1]["content"], "on_topic": on_topic},
+            status=status
+        )
+
+    # Same status as the JSON response, e.g. 201 for a new debate
+    response = web.StreamResponse(status=status, headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+    await response.prepare(request)
+    async with aclosing(replies) as chunks:
+        async for chunk in chunks:
+            await response.write(f"data: {json.dumps({'delta': chunk})}\n\n".encode("utf-8"))
+    done = {"id": session.id, "reply": session.conversation[-1]["content"], "on_topic": on_topic}
+    await response.write(f"event: done\ndata: {json.dumps(done)}\n\n".encode("utf-8"))
+    await response.write_eof()
+    return response
+
+async def _single(text):
+    yield text
+
+async def start_debate(request):
+    """
+    POST /debates {"topic", "difficulty"?, "style"?} — start a debate and get the opening statement.
+    """
+    body = await _read_json(request)
+    topic = str(body.get("topic") or "").strip()
+    difficulty = body.get("difficulty", "medium")
+    style = body.get("style", "friendly")
+    if not topic:
+        return _error(400, "Please provide a debate topic.")
+    if difficulty not in Config.DIFFICULTY_LEVELS:
+        return _error(400, f"Unknown difficulty: {difficulty}")
+    if style not in Config.CONVERSATION_STYLES:
+        return _error(400, f"Unknown style: {style}")
+
+    session = await asyncio.to_thread(request.app[STORE].create, topic, difficulty, style)
+    SESSION_ID.set(session.id)
+    async with _turn_lock(request.app, session.id):
+        request.app[REPLY_TASKS][session.id] = asyncio.current_task()
+        await asyncio.to_thread(session.append, "user", Config.OPENING_REQUEST.format(topic=topic))
+        return await _respond(request, session, _generate_reply(request.app[BOT], session), True, status=201)
+
+async def send_message(request):
+    """
+    POST /debates/{id}/messages {"content"} — continue a debate with the user's argument.
+    """
+    session = await _get_session(request)
+    body = await _read_json(request)
+    content = str(body.get("content") or "").strip()
+    if not content:
+        return _error(400, "Please provide an argument.")
+
+    async with _turn_lock(request.app, session.id):
+        request.app[REPLY_TASKS][session.id] = asyncio.current_task()
+        # The debate may have been deleted while this message waited for the previous turn
+        session = await _get_session(request)
+        await asyncio.to_thread(session.append, "user", content)
+        if get_topic_filter(session.topic).is_debate_message(content):
+            return await _respond(request, session, _generate_reply(request.app[BOT], session), True)
+
+        debate_reminder = Config.OFF_TOPIC_REMINDER.format(topic=session.topic)
+        await asyncio.to_thread(session.append, "assistant", debate_reminder)
+        return await _respond(request, session, _single(debate_reminder), False)
+
+async def get_debate(request):
+    """
+    GET /debates/{id} — the debate's settings and transcript.
+    """
+    return web.json_response((await _get_session(request)).to_dict())
+
+async def reset_debate(request):
+    """
+    DELETE /debates/{id} — end a debate and delete it from the store.
+    """
+    session = await _get_session(request)
+    task = request.app[REPLY_TASKS].pop(session.id, None)
+    if task is not None and not task.done():
+        # Stops the upstream call; that request's client gets no reply
+        task.cancel("reset")
+    await asyncio.to_thread(request.app[STORE].delete, session.id)
+    return web.Response(status=204)
+
+async def health(request):
+    return web.json_response({
+        "status": "ok",
+        "debates": len(request.app[STORE]),
+        "queued_calls": request.app[BOT].rate_limiter.queue_depth(),
+        "backends": request.app[BOT].backends.status(),
+        "opening_cache": get_opening_cache().stats(),
+    })
+
+async def metrics(request):
+    """
+    GET /metrics — call latency and token usage in the Prometheus text format.
+    """
+    return web.Response(text=REGISTRY.render(), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+async def _bot_context(app):
+    async with AsyncDebateBot() as bot:
+        app[BOT] = bot
+        yield
+
+@web.middleware
+async def request_context(request, handler):
+    """
+    Tag every log record made while handling a request with its request and debate IDs.
+    """
+    request_id = request.headers.get("X-Request-ID") or new_request_id()
+    with log_context(request.match_info.get("debate_id"), request_id):
+        response = await handler(request)
+    if not response.prepared:
+        response.headers["X-Request-ID"] = request_id
+    return response
+
+def create_app():
+    """
+    Build the aiohttp application serving the debate API.
+    """
+    app = web.Application(middlewares=[request_context])
+    app[STORE] = get_session_store()
+    app[TURN_LOCKS] = weakref.WeakValueDictionary()
+    app[REPLY_TASKS] = weakref.WeakValueDictionary()
+    app.cleanup_ctx.append(_bot_context)
+    app.router.add_post("/debates", start_debate)
+    app.router.add_get("/debates/{debate_id}", get_debate)
+    app.router.add_delete("/debates/{debate_id}", reset_debate)
+    app.router.add_post("/debates/{debate_id}/messages", send_message)
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", metrics)
+    return app
+
+def main(host=None, port=None):
+    """
+    Serve the debate API until interrupted.
+    """
+    configure_logging()
+    start_periodic_dump()
+    # Cancel the handler, and so its API call, when a client disconnects
+    web.run_app(create_app(), host=host or Config.API_HOST, port=port or Config.API_PORT, handler_cancellation=True)
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,19 @@
 import streamlit as st
 import os
+import functools
 import logging
-from debate_bot import DebateBot
+from debate_bot import DebateBot, ErrorMessage, ERROR_ROLE
+from opening_cache import get_opening_cache
+from topic_filter import get_topic_filter
+from session_store import get_session_store
+from metrics import start_periodic_dump
 from config import Config
+from logging_setup import configure_logging, set_log_context, new_request_id
+from cancellation import get_session_generations
+from speculation import get_opening_speculator
 
 # Configure logging
-logging.basicConfig(level=logging.DEBUG)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Set up Streamlit page configuration
@@ -160,8 +168,135 @@ def load_css():
 
 load_css()
 
+def render_message_html(role, content):
+    """
+    Build the chat bubble HTML for a message.
+    """
+    if role == "user":
+        return f"""
+                <div class="message-container" style="justify-content: flex-end;">
+                    <div class="user-message">{content}</div>
+                    <div class="message-avatar user-avatar">👤</div>
+                </div>
+                """
+    return f"""
+                <div class="message-container">
+                    <div class="message-avatar bot-avatar">🤖</div>
+                    <div class="bot-message">{content}</div>
+                </div>
+                """
+
+# Every run redraws the visible history with the same text, so finished
+# messages are rendered once; replies still streaming in bypass the cache
+message_html = functools.lru_cache(maxsize=4096)(render_message_html)
+
+def bot_message_html(content):
+    return render_message_html("assistant", content)
+
 # Initialize the debate bot
 debate_bot = DebateBot()
+session_store = get_session_store()
+generations = get_session_generations()
+speculator = get_opening_speculator()
+start_periodic_dump()
+
+# Seconds between redraws while a reply is being generated; each redraw lets
+# Streamlit stop this run promptly if the user clicks something
+GENERATION_POLL_INTERVAL = 0.2
+
+def add_message(role, content):
+    """
+    Append a turn to the current debate, persisting it in the session store.
+    """
+    st.session_state.debate.append(role, content)
+
+def opening_chunks(topic, difficulty, style, cancel_token, priority="interactive"):
+    """
+    Yield the bot's opening statement for the given settings; runs on a generation's thread.
+    """
+    # Openings for popular settings are usually already cached
+    opening = get_opening_cache().get(topic, difficulty, style)
+    if opening is not None:
+        yield opening
+        return
+    
+    bot_response = ""
+    failed = False
+    for chunk in debate_bot.stream_response(
+        [{"role": "user", "content": Config.OPENING_REQUEST.format(topic=topic)}],
+        topic,
+        difficulty,
+        style,
+        priority=priority,
+        cancel_token=cancel_token
+    ):
+        failed = failed or isinstance(chunk, ErrorMessage)
+        bot_response += chunk
+        yield chunk
+    
+    if not failed:
+        get_opening_cache().put(topic, difficulty, style, debate_bot.shorten_response(bot_response, difficulty))
+
+def reply_chunks(debate, cancel_token):
+    """
+    Yield the bot's reply to the debate's last message; runs on the generation's thread.
+    """
+    if len(debate.conversation) == 1:
+        yield from opening_chunks(debate.topic, debate.difficulty, debate.style, cancel_token)
+        return
+    yield from debate_bot.stream_response(
+        debate.conversation,
+        debate.topic,
+        debate.difficulty,
+        debate.style,
+        cancel_token=cancel_token
+    )
+
+def record_reply(debate, chunks):
+    """
+    Add a finished reply to the debate; a failed one is kept out of the
+    history sent with later turns.
+    """
+    failed = any(isinstance(chunk, ErrorMessage) for chunk in chunks)
+    bot_response = debate_bot.shorten_response("".join(chunks), debate.difficulty)
+    debate.append(ERROR_ROLE if failed else "assistant", bot_response)
+
+def speculate_opening(topic, difficulty, style):
+    """
+    Keep an opening statement generating for the settings currently chosen.
+    
+    A speculative opening for other settings is discarded first. Speculation
+    never delays real debates: its calls wait behind interactive ones.
+    """
+    settings = (topic, difficulty, style)
+    current = st.session_state.get("speculation")
+    if current is not None and current[0] == settings:
+        return
+    if current is not None:
+        speculator.discard(current[1])
+        st.session_state.speculation = None
+    if len(topic.strip()) < Config.SPECULATIVE_MIN_TOPIC_LENGTH:
+        return
+    
+    started = st.session_state.get("speculations_started", 0)
+    generation = speculator.start(functools.partial(opening_chunks, topic, difficulty, style, priority="batch"), started)
+    if generation is not None:
+        st.session_state.speculation = (settings, generation)
+        st.session_state.speculations_started = started + 1
+
+def claim_speculative_opening(debate):
+    """
+    Use the speculative opening for a debate just started with the same settings.
+    """
+    current = st.session_state.get("speculation")
+    st.session_state.speculation = None
+    if current is None:
+        return
+    settings, generation = current
+    if settings == (debate.topic, debate.difficulty, debate.style):
+        speculator.claim(generation, debate.id, functools.partial(record_reply, debate))
+    else:
+        speculator.discard(generation)
 
 # App title and description
 st.markdown('<h1 class="main-title">🤖 AI Debate Bot</h1>', unsafe_allow_html=True)
@@ -175,6 +310,22 @@ if 'conversation' not in st.session_state:
     st.session_state.style = "friendly"
     st.session_state.debate_started = False
     st.session_state.is_debate_topic = True
+    st.session_state.debate = None
+
+# Resume a debate by ID from the link (?debate=<id>), e.g. after a restart
+# or when served by another worker
+if st.session_state.debate is None and st.query_params.get("debate"):
+    debate = session_store.get(st.query_params["debate"])
+    if debate is not None:
+        st.session_state.debate = debate
+        st.session_state.conversation = debate.conversation
+        st.session_state.topic = debate.topic
+        st.session_state.difficulty = debate.difficulty
+        st.session_state.style = debate.style
+        st.session_state.debate_started = True
+
+# Tag this run's log records with the debate and a fresh request ID
+set_log_context(st.session_state.debate.id if st.session_state.debate else None, new_request_id())
 
 # Sidebar configuration
 with st.sidebar:
@@ -219,6 +370,11 @@ with st.sidebar:
         # Display style description
         st.info(Config.CONVERSATION_STYLES[style]['description'])
         
+        # Start on the opening while the user decides; the topic only
+        # changes here once they press Enter or leave the field
+        if Config.SPECULATIVE_OPENINGS:
+            speculate_opening(topic, difficulty, style)
+        
         # Start debate button
         if st.button("Start Debate", use_container_width=True):
             if not topic:
@@ -230,29 +386,16 @@ with st.sidebar:
                 st.session_state.debate_started = True
                 st.session_state.is_debate_topic = True
                 
-                # Generate initial message
-                initial_message = {
-                    "role": "user",
-                    "content": f"I'd like to debate about {topic}. Please provide an opening statement."
-                }
-                
-                # Add to conversation history
-                st.session_state.conversation.append(initial_message)
-                
-                # Generate bot response
-                bot_response = debate_bot.generate_response(
-                    st.session_state.conversation,
-                    topic,
-                    difficulty,
-                    style
-                )
+                # Create the stored debate and link to it so it can be resumed
+                debate = session_store.create(topic, difficulty, style)
+                st.session_state.debate = debate
+                st.session_state.conversation = debate.conversation
+                st.query_params["debate"] = debate.id
                 
-                # Add bot response to conversation
-                bot_message = {
-                    "role": "assistant",
-                    "content": bot_response
-                }
-                st.session_state.conversation.append(bot_message)
+                # Add initial message to conversation history; the opening
+                # statement is streamed into the chat area on the next run
+                add_message("user", Config.OPENING_REQUEST.format(topic=topic))
+                claim_speculative_opening(debate)
                 st.rerun()
     else:
         # Display current debate info
@@ -271,103 +414,102 @@ with st.sidebar:
         
         # Reset debate button
         if st.button("Reset Debate", use_container_width=True, type="primary", key="reset_btn", help="Start a new debate"):
+            generations.cancel(st.session_state.debate.id, "reset")
+            session_store.delete(st.session_state.debate.id)
+            st.query_params.pop("debate", None)
+            st.session_state.show_all_messages = False
+            st.session_state.debate = None
             st.session_state.conversation = []
             st.session_state.topic = ""
             st.session_state.debate_started = False
             st.rerun()
 
-# Main conversation area
-if st.session_state.debate_started:
-    # Display conversation history
-    for message in st.session_state.conversation:
-        if message["role"] == "user":
-            st.markdown(
-                f"""
-                <div class="message-container" style="justify-content: flex-end;">
-                    <div class="user-message">{message["content"]}</div>
-                    <div class="message-avatar user-avatar">👤</div>
-                </div>
-                """, 
-                unsafe_allow_html=True
-            )
+def show_all_messages():
+    st.session_state.show_all_messages = True
+
+def send_message():
+    """
+    Handle the Send button: record the user's argument, or the off-topic reminder.
+    """
+    user_message = st.session_state.user_input
+    if user_message:
+        # A reply still being generated would answer a conversation that has moved on
+        generations.cancel(st.session_state.debate.id, "superseded")
+        
+        # Check if it's a debate-related message by analyzing the content
+        is_debate_topic = get_topic_filter(st.session_state.topic).is_debate_message(user_message)
+        
+        if is_debate_topic:
+            # Add user message to conversation; the reply is streamed
+            # into the chat area when it redraws
+            add_message("user", user_message)
         else:
-            st.markdown(
-                f"""
-                <div class="message-container">
-                    <div class="message-avatar bot-avatar">🤖</div>
-                    <div class="bot-message">{message["content"]}</div>
-                </div>
-                """, 
-                unsafe_allow_html=True
-            )
+            # If not a debate-related message, ask for a debate topic
+            debate_reminder = Config.OFF_TOPIC_REMINDER.format(topic=st.session_state.topic)
+            
+            # Add user message to conversation
+            add_message("user", user_message)
+            
+            # Add bot response to conversation
+            add_message("assistant", debate_reminder)
+        
+        # Clear the input
+        st.session_state.user_input = ""
+
+# Main conversation area. Running it as a fragment means sending a message
+# only reruns this function, not the page styles, header and sidebar.
+@st.fragment
+def chat_area():
+    # Display conversation history; long debates only show the latest
+    # messages unless the user asks for the rest
+    conversation = st.session_state.conversation
+    # A reply may be recorded in the background while this run draws, so
+    # everything below works on the messages there were at the start
+    count = len(conversation)
+    hidden = 0
+    if not st.session_state.get("show_all_messages") and count > Config.CHAT_VISIBLE_MESSAGES:
+        hidden = count - Config.CHAT_VISIBLE_MESSAGES
+        label = "Show 1 earlier message" if hidden == 1 else f"Show {hidden} earlier messages"
+        st.button(label, use_container_width=True, on_click=show_all_messages)
+    
+    for message in conversation[hidden:count]:
+        st.markdown(message_html(message["role"], message["content"]), unsafe_allow_html=True)
+    
+    # Stream the bot's reply to a message that hasn't been answered yet.
+    # It is generated in the background, so a rerun picks up the same reply
+    # instead of waiting for it or starting another
+    if count and conversation[count - 1]["role"] == "user":
+        placeholder = st.empty()
+        generation = generations.start(
+            st.session_state.debate.id,
+            count,
+            functools.partial(reply_chunks, st.session_state.debate),
+            functools.partial(record_reply, st.session_state.debate)
+        )
+        
+        bot_response = ""
+        received = 0
+        done = False
+        while not done:
+            chunks, done = generation.read(received, GENERATION_POLL_INTERVAL)
+            received += len(chunks)
+            bot_response += "".join(chunks)
+            placeholder.markdown(bot_message_html(bot_response + "▌"), unsafe_allow_html=True)
+        
+        # The recorded reply may have been shortened
+        if len(conversation) > count:
+            bot_response = conversation[count]["content"]
+        placeholder.markdown(bot_message_html(bot_response), unsafe_allow_html=True)
     
     # Input for user message
-    user_message = st.text_area("Your argument:", height=100, placeholder="Type your argument here...", key="user_input")
+    st.text_area("Your argument:", height=100, placeholder="Type your argument here...", key="user_input")
     
-    # Send button
-    if st.button("Send Message", use_container_width=True):
-        if user_message:
-            # Check if it's a debate-related message by analyzing the content
-            is_debate_topic = True
-            
-            # List of debate-unrelated patterns (questions about the bot, general chat, etc.)
-            non_debate_patterns = [
-                "who are you", "what's your name", "how are you", "tell me about yourself",
-                "what can you do", "help me with", "can you help", "tell me a joke",
-                "what's the weather", "what time is it", "who made you", "what are you",
-                "hello", "hi there", "good morning", "good afternoon", "good evening",
-                "tell me about", "explain", "what is", "how does", "why is"
-            ]
-            
-            user_message_lower = user_message.lower()
-            for pattern in non_debate_patterns:
-                if pattern in user_message_lower and st.session_state.topic not in user_message_lower:
-                    is_debate_topic = False
-                    break
-            
-            if is_debate_topic:
-                # Add user message to conversation
-                st.session_state.conversation.append({
-                    "role": "user",
-                    "content": user_message
-                })
-                
-                # Show loading spinner while generating response
-                with st.spinner("Bot is thinking..."):
-                    # Generate bot response
-                    bot_response = debate_bot.generate_response(
-                        st.session_state.conversation,
-                        st.session_state.topic,
-                        st.session_state.difficulty,
-                        st.session_state.style
-                    )
-                
-                # Add bot response to conversation
-                st.session_state.conversation.append({
-                    "role": "assistant",
-                    "content": bot_response
-                })
-            else:
-                # If not a debate-related message, ask for a debate topic
-                debate_reminder = f"I'm an AI Debate Bot focused on debating specific topics. We're currently discussing '{st.session_state.topic}'. Please provide an argument related to this topic to continue our debate."
-                
-                # Add user message to conversation
-                st.session_state.conversation.append({
-                    "role": "user",
-                    "content": user_message
-                })
-                
-                # Add bot response to conversation
-                st.session_state.conversation.append({
-                    "role": "assistant",
-                    "content": debate_reminder
-                })
-            
-            # Clear the input
-            st.session_state.user_input = ""
-            
-            # Rerun the app to update the UI
-            st.rerun()
+    # Send button; the message is handled in the callback so it is already in
+    # the conversation when the chat area redraws
+    st.button("Send Message", use_container_width=True, on_click=send_message)
+
+if st.session_state.debate_started:
+    chat_area()
 
 # Footer
 st.markdown("""
@@ -0,0 +1,346 @@
+import time
+import asyncio
+import logging
+import aiohttp
+from contextlib import aclosing
+from config import Config
+from debate_bot import DebateBot, API_KEY_MISSING_MESSAGE, SSE_DONE
+from http_client import RETRYABLE_STATUS_CODES, backoff_delay, defer_rate_limited, retry_delay
+from history import estimate_tokens
+from metrics import CallMetrics
+from single_flight import AsyncSingleFlight, payload_key
+from hedging import arace, get_hedge_policy
+from backends import BackendUnavailableError, UNHEALTHY_STATUS_CODES
+
+logger = logging.getLogger(__name__)
+
+# Failures where the request never reached the upstream, so retrying is safe
+RETRYABLE_ERRORS = (aiohttp.ClientConnectorError, aiohttp.ServerDisconnectedError, aiohttp.ConnectionTimeoutError)
+
+async def _on_connection_create_start(session, trace_config_ctx, params):
+    trace_config_ctx.connect_start = time.perf_counter()
+
+async def _on_connection_create_end(session, trace_config_ctx, params):
+    # trace_request_ctx is the CallMetrics passed to session.post()
+    call = trace_config_ctx.trace_request_ctx
+    if call is not None:
+        call.connected(time.perf_counter() - trace_config_ctx.connect_start)
+
+def _metrics_trace_config():
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_connection_create_start.append(_on_connection_create_start)
+    trace_config.on_connection_create_end.append(_on_connection_create_end)
+    return trace_config
+
+class AsyncDebateBot(DebateBot):
+    """
+    asyncio counterpart of DebateBot.
+
+    Prompts are built exactly as in DebateBot; only the transport differs. A
+    single instance can serve many debates at once: in-flight calls are capped
+    by a semaphore, and cancelling the task awaiting a call aborts the upstream
+    request and frees its slot. Use it as an async context manager, or call
+    aclose() when done, to release pooled connections.
+    """
+    def __init__(self, max_concurrency=None):
+        super().__init__()
+        # aiohttp.ClientSession, created on first use inside the running loop
+        self.session = None
+        self.semaphore = asyncio.Semaphore(max_concurrency or Config.ASYNC_MAX_CONCURRENCY)
+        self.flights = AsyncSingleFlight()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def aclose(self):
+        """
+        Close the underlying connection pool.
+        """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _get_session(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit_per_host=Config.HTTP_POOL_MAXSIZE),
+                timeout=aiohttp.ClientTimeout(
+                    sock_connect=Config.HTTP_CONNECT_TIMEOUT,
+                    sock_read=Config.HTTP_READ_TIMEOUT
+                ),
+                trace_configs=[_metrics_trace_config()]
+            )
+        return self.session
+
+    async def _post_with_retries(self, backend, payload, call=None, max_retries=None):
+        """
+        POST a payload to one backend, retrying transient failures like http_client.post_with_retries.
+        
+        Args:
+            backend (Backend): The endpoint to call
+            payload (dict): The request body
+            call (CallMetrics): Receives the time spent opening new connections
+            max_retries (int): Overrides Config.HTTP_MAX_RETRIES
+
+        Returns:
+            aiohttp.ClientResponse: The last response received; the caller must release it
+        """
+        if max_retries is None:
+            max_retries = Config.HTTP_MAX_RETRIES
+        session = self._get_session()
+        attempt = 0
+        while True:
+            try:
+                response = await session.post(backend.url, headers=backend.headers(), json=payload, trace_request_ctx=call)
+            except RETRYABLE_ERRORS as e:
+                if attempt >= max_retries:
+                    raise
+                delay = backoff_delay(attempt)
+                logger.warning("Connection to %s failed (%s), retrying in %.2fs", backend.url, e, delay)
+            else:
+                if response.status not in RETRYABLE_STATUS_CODES or attempt >= max_retries:
+                    defer_rate_limited(response.status, response.headers)
+                    return response
+                response.release()
+                delay = retry_delay(attempt, response.status, response.headers)
+                logger.warning("%s returned %s, retrying in %.2fs", backend.url, response.status, delay)
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _asend(self, payload, call=None):
+        """
+        Async counterpart of DebateBot._send(): POST to the best backend, failing over to the next.
+        """
+        backend = self.backends.choose()
+        if backend is None:
+            raise BackendUnavailableError("Every backend is failing; not calling any until one recovers")
+        tried = []
+        while True:
+            tried.append(backend)
+            retries = 0 if self.backends.has_alternative(tried) else None
+            started = time.perf_counter()
+            try:
+                response = await self._post_with_retries(backend, dict(payload, model=backend.model), call, retries)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                backend.record_failure()
+                failed, backend = backend, self.backends.choose(exclude=tried)
+                if backend is None:
+                    raise
+                logger.warning("Backend %s failed (%s), trying %s", failed.name, e, backend.name)
+                continue
+            except BaseException:
+                # Cancelled: a trial request must not keep the backend claimed
+                backend.release_probe()
+                raise
+
+            if response.status not in UNHEALTHY_STATUS_CODES:
+                backend.record_success(time.perf_counter() - started)
+                return response
+            backend.record_failure()
+            failed, backend = backend, self.backends.choose(exclude=tried)
+            if backend is None:
+                return response
+            response.release()
+            logger.warning("Backend %s returned %s, trying %s", failed.name, response.status, backend.name)
+
+    async def agenerate_response(self, conversation_history, topic, difficulty="medium", style="friendly", priority="interactive", coalesce=True):
+        """
+        Generate a response from the debate bot without blocking the event loop.
+
+        Args:
+            conversation_history (list): List of conversation messages
+            topic (str): The debate topic
+            difficulty (str): Difficulty level (easy, medium, hard)
+            style (str): Conversation style (friendly, controversial, aggressive, humorous, educational, sarcastic)
+            priority (str): Rate-limit queue priority, "interactive" or "batch"
+            coalesce (bool): Share the upstream call with identical requests
+                already in flight; pass False to always get an independent sample
+
+        Returns:
+            str: The bot's response
+        """
+        if not self.backends:
+            logger.error("Mistral API key not found!")
+            return API_KEY_MISSING_MESSAGE
+
+        payload, window = self._build_payload(conversation_history, topic, difficulty, style)
+        if not coalesce:
+            return await self._agenerate(payload, window, difficulty, style, priority)
+        return await self.flights.call(
+            payload_key(payload),
+            lambda: self._agenerate(payload, window, difficulty, style, priority)
+        )
+
+    async def _agenerate(self, payload, window, difficulty, style, priority):
+        """
+        Make one blocking chat-completions call for agenerate_response.
+        """
+        call = CallMetrics(difficulty, style)
+        tokens = window.total_tokens + payload["max_tokens"]
+        reservation = None
+        content = ""
+        usage = None
+        outcome = "cancelled"
+        try:
+            reservation = await self.rate_limiter.aacquire(tokens, priority)
+            async with self.semaphore:
+                call.queued()
+                result = await arace(
+                    lambda: self._apost_json(payload, call),
+                    get_hedge_policy(f"generate:{difficulty}"),
+                    discard=lambda result: None,
+                    reserve=lambda: self.rate_limiter.try_acquire(tokens),
+                    spent=lambda result: self._hedge_tokens(window, result)
+                )
+
+            usage = result.get("usage")
+            content = result["choices"][0]["message"]["content"]
+
+            shortened = self.shorten_response(content, difficulty)
+            outcome = "ok"
+            cut_off = self._record_length(difficulty, style, content, shortened, usage, result["choices"][0].get("finish_reason"))
+            call.finish(outcome, window, usage, estimate_tokens(content), shortened != content, cut_off)
+            return shortened
+
+        except (aiohttp.ClientError, asyncio.TimeoutError, BackendUnavailableError) as e:
+            logger.error("Error calling Mistral API: %s", e)
+            outcome = "error"
+            return self._error_message(e)
+        finally:
+            if outcome != "ok":
+                call.finish(outcome, window)
+            if reservation is not None:
+                reservation.settle(self._tokens_used(outcome, window, usage, content))
+
+    async def _apost_json(self, payload, call):
+        """
+        Send a blocking chat-completions request and return its decoded body.
+        """
+        async with await self._asend(payload, call) as response:
+            call.first_byte()
+            response.raise_for_status()
+            return await response.json()
+
+    async def _aopen_stream(self, payload, call):
+        """
+        Send a streamed chat-completions request and read up to its first text.
+
+        Returns:
+            tuple: (the open response, list of the lines already read)
+        """
+        response = await self._asend(payload, call)
+        call.first_byte()
+        try:
+            response.raise_for_status()
+            read = []
+            async for line in response.content:
+                read.append(line)
+                chunk = self._parse_sse_line(line)
+                if chunk is SSE_DONE or (chunk is not None and self._chunk_delta(chunk)):
+                    break
+            return response, read
+        except BaseException:
+            response.close()
+            raise
+
+    @staticmethod
+    async def _replay_lines(read, response):
+        for line in read:
+            yield line
+        async for line in response.content:
+            yield line
+
+    async def astream_response(self, conversation_history, topic, difficulty="medium", style="friendly", priority="interactive", coalesce=True):
+        """
+        Stream a response from the debate bot, yielding text as it arrives.
+
+        Async counterpart of DebateBot.stream_response, including its early stop
+        once the text reaches the point where shorten_response would cut it.
+
+        Args:
+            conversation_history (list): List of conversation messages
+            topic (str): The debate topic
+            difficulty (str): Difficulty level (easy, medium, hard)
+            style (str): Conversation style (friendly, controversial, aggressive, humorous, educational, sarcastic)
+            priority (str): Rate-limit queue priority, "interactive" or "batch"
+            coalesce (bool): Share the upstream call with identical requests
+                already in flight; pass False to always get an independent sample
+
+        Yields:
+            str: Pieces of the bot's response, in order
+        """
+        if not self.backends:
+            logger.error("Mistral API key not found!")
+            yield API_KEY_MISSING_MESSAGE
+            return
+
+        payload, window = self._build_payload(conversation_history, topic, difficulty, style, stream=True)
+        if coalesce:
+            chunks = self.flights.stream(
+                payload_key(payload),
+                lambda: self._astream(payload, window, difficulty, style, priority)
+            )
+        else:
+            chunks = self._astream(payload, window, difficulty, style, priority)
+        async with aclosing(chunks):
+            async for chunk in chunks:
+                yield chunk
+
+    async def _astream(self, payload, window, difficulty, style, priority):
+        """
+        Make one streamed chat-completions call for astream_response.
+        """
+        call = CallMetrics(difficulty, style)
+        tokens = window.total_tokens + payload["max_tokens"]
+        reservation = None
+        content = ""
+        usage = None
+        outcome = "cancelled"
+        finished = False
+        finish_reason = None
+        try:
+            reservation = await self.rate_limiter.aacquire(tokens, priority)
+            async with self.semaphore:
+                call.queued()
+                response, read = await arace(
+                    lambda: self._aopen_stream(payload, call),
+                    get_hedge_policy(f"stream:{difficulty}"),
+                    discard=lambda opened: opened[0].close(),
+                    reserve=lambda: self.rate_limiter.try_acquire(tokens),
+                    spent=lambda result: self._hedge_tokens(window, result)
+                )
+                async with response, aclosing(self._replay_lines(read, response)) as lines:
+                    async for line in lines:
+                        chunk = self._parse_sse_line(line)
+                        if chunk is SSE_DONE:
+                            break
+                        if chunk is None:
+                            continue
+                        usage = chunk.get("usage") or usage
+                        finish_reason = self._finish_reason(chunk) or finish_reason
+                        delta = self._chunk_delta(chunk)
+                        if not delta:
+                            continue
+                        if not content:
+                            call.first_token()
+                        piece, finished = self._clip_delta(content, delta, difficulty)
+                        content += piece
+                        if piece:
+                            yield piece
+                        if finished:
+                            break
+            outcome = "ok"
+
+        except (aiohttp.ClientError, asyncio.TimeoutError, BackendUnavailableError, ValueError) as e:
+            logger.error("Error calling Mistral API: %s", e)
+            outcome = "error"
+            yield self._error_message(e, partial=bool(content))
+        finally:
+            cut_off = outcome == "ok" and self._record_length(difficulty, style, content, content, usage, finish_reason)
+            call.finish(outcome, window, usage, estimate_tokens(content), finished, cut_off)
+            if reservation is not None:
+                reservation.settle(self._tokens_used(outcome, window, usage, content))
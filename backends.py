@@ -0,0 +1,229 @@
+"""
+Generation backends: the OpenAI-compatible chat-completions endpoints DebateBot can call.
+
+By default there is one backend, built from MISTRAL_API_URL, MISTRAL_API_KEY
+and MISTRAL_MODEL. Set BACKENDS to a JSON list to spread calls over several
+endpoints or keys, e.g. a second Mistral key and a self-hosted server:
+
+    BACKENDS='[
+      {"name": "mistral", "url": "https://api.mistral.ai/v1/chat/completions", "api_key_env": "MISTRAL_API_KEY", "model": "mistral-small"},
+      {"name": "local", "url": "http://127.0.0.1:8000/v1/chat/completions", "model": "mistral-7b-instruct"}
+    ]'
+
+`api_key` may be given inline or, preferably, read from the environment
+variable named by `api_key_env`; backends without a key send no
+Authorization header. `model` defaults to MISTRAL_MODEL.
+"""
+import os
+import json
+import time
+import random
+import threading
+import logging
+from config import Config
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+BACKEND_CALLS = REGISTRY.counter("debate_backend_calls_total", "Requests sent to each backend, by outcome.", ("backend", "outcome"))
+CIRCUIT_OPENED = REGISTRY.counter("debate_backend_circuit_opened_total", "Times a backend's circuit breaker opened.", ("backend",))
+
+# Statuses that say the backend, not the request, is at fault
+UNHEALTHY_STATUS_CODES = frozenset({401, 403, 429, 500, 502, 503, 504})
+
+class BackendUnavailableError(Exception):
+    """
+    Raised instead of calling out when every backend's circuit is open.
+    """
+
+class Backend:
+    """
+    One endpoint, with its recent latency and error rate and a circuit breaker.
+
+    After Config.BACKEND_FAILURE_THRESHOLD failed requests in a row the
+    circuit opens and the backend is skipped, so calls fail over (or fail
+    fast) instead of waiting on it. After Config.BACKEND_OPEN_SECONDS a
+    single trial request is let through; its outcome closes the circuit
+    again or keeps it open for another period.
+    """
+    def __init__(self, name, url, api_key="", model=None):
+        self.name = name
+        self.url = url
+        self.api_key = api_key
+        self.model = model or Config.MISTRAL_MODEL
+        # Exponentially weighted averages of response time (None until the
+        # first answer) and of the failure rate
+        self.latency = None
+        self.error_rate = 0.0
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    def headers(self):
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    def state(self, now=None):
+        """
+        Return "closed", "open" or "half-open".
+        """
+        if self.opened_at is None:
+            return "closed"
+        now = time.monotonic() if now is None else now
+        return "half-open" if now - self.opened_at >= Config.BACKEND_OPEN_SECONDS else "open"
+
+    def score(self):
+        """
+        Expected cost of the next call; lower is better, and untried backends come first.
+        """
+        if self.latency is None:
+            return 0.0
+        return self.latency * (1 + Config.BACKEND_ERROR_PENALTY * self.error_rate)
+
+    def record_success(self, seconds):
+        alpha = Config.BACKEND_EWMA_ALPHA
+        with self._lock:
+            self.latency = seconds if self.latency is None else (1 - alpha) * self.latency + alpha * seconds
+            self.error_rate *= 1 - alpha
+            self.failures = 0
+            self.probing = False
+            if self.opened_at is not None:
+                self.opened_at = None
+                logger.info("Backend %s recovered, closing its circuit", self.name)
+        BACKEND_CALLS.inc(self.name, "ok")
+
+    def record_failure(self):
+        alpha = Config.BACKEND_EWMA_ALPHA
+        with self._lock:
+            self.error_rate = (1 - alpha) * self.error_rate + alpha
+            self.failures += 1
+            reopen = self.probing
+            self.probing = False
+            if reopen or (self.opened_at is None and self.failures >= Config.BACKEND_FAILURE_THRESHOLD):
+                self.opened_at = time.monotonic()
+                CIRCUIT_OPENED.inc(self.name)
+                logger.warning("Backend %s failed %s times in a row, failing fast for %.0fs", self.name, self.failures, Config.BACKEND_OPEN_SECONDS)
+        BACKEND_CALLS.inc(self.name, "error")
+
+    def release_probe(self):
+        """
+        Give up a trial request that ended without an outcome, e.g. because it was cancelled.
+
+        The circuit stays as it is; the next call may try the backend again.
+        """
+        with self._lock:
+            self.probing = False
+
+    def _claim(self, now):
+        # Must be called with the pool lock held
+        state = self.state(now)
+        if state == "open" or (state == "half-open" and self.probing):
+            return False
+        if state == "half-open":
+            # Only one trial request at a time
+            self.probing = True
+        return True
+
+class BackendPool:
+    """
+    Routes each call to the backend expected to answer fastest.
+
+    Backends are ranked by recent latency, penalised by recent error rate,
+    skipping any whose circuit is open. A small share of calls
+    (Config.BACKEND_EXPLORE_RATE) goes to a random available backend instead,
+    so one that was slow for a while gets a chance to show it has recovered.
+    """
+    def __init__(self, backends):
+        self.backends = list(backends)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.backends)
+
+    def _candidates(self, exclude, now):
+        return [b for b in self.backends if b not in exclude and b.state(now) != "open"]
+
+    def choose(self, exclude=()):
+        """
+        Pick the backend for the next request.
+
+        Args:
+            exclude (iterable): Backends already tried for this call
+
+        Returns:
+            Backend or None: The chosen backend, or None if none is available
+        """
+        now = time.monotonic()
+        with self._lock:
+            candidates = self._candidates(exclude, now)
+            if len(candidates) > 1 and random.random() < Config.BACKEND_EXPLORE_RATE:
+                random.shuffle(candidates)
+            else:
+                candidates.sort(key=Backend.score)
+            for backend in candidates:
+                if backend._claim(now):
+                    return backend
+        return None
+
+    def has_alternative(self, exclude):
+        """
+        Whether a backend other than those in `exclude` could take a request right now.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return any(b.state(now) == "closed" or not b.probing for b in self._candidates(exclude, now))
+
+    def status(self):
+        """
+        Describe every backend, e.g. for a health endpoint.
+        """
+        return [
+            {
+                "name": b.name,
+                "state": b.state(),
+                "latency": None if b.latency is None else round(b.latency, 3),
+                "error_rate": round(b.error_rate, 3),
+            }
+            for b in self.backends
+        ]
+
+def load_backends():
+    """
+    Build the configured backends from Config.BACKENDS, or the single Mistral endpoint.
+
+    Returns:
+        list: Backend objects; empty if nothing usable is configured
+
+    Raises:
+        ValueError: If BACKENDS isn't a JSON list of objects with a "url"
+    """
+    if not Config.BACKENDS.strip():
+        if not Config.MISTRAL_API_KEY:
+            return []
+        return [Backend("mistral", Config.MISTRAL_API_URL, Config.MISTRAL_API_KEY, Config.MISTRAL_MODEL)]
+
+    entries = json.loads(Config.BACKENDS)
+    if not isinstance(entries, list) or not all(isinstance(e, dict) and e.get("url") for e in entries):
+        raise ValueError("BACKENDS must be a JSON list of objects, each with a \"url\"")
+    backends = []
+    for i, entry in enumerate(entries):
+        api_key = entry.get("api_key") or os.environ.get(entry.get("api_key_env", ""), "")
+        backends.append(Backend(entry.get("name") or f"backend{i}", entry["url"], api_key, entry.get("model")))
+    return backends
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_backend_pool():
+    """
+    Return the process-wide BackendPool, so routing statistics are shared by every DebateBot.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = BackendPool(load_backends())
+    return _pool
@@ -0,0 +1,197 @@
+"""
+Offline batch generation: run many debate jobs through DebateBot and write the replies to JSONL.
+
+Each input line is a job:
+
+    {"id": "ai-hard-1", "topic": "AI regulation", "difficulty": "hard", "style": "sarcastic"}
+
+`difficulty` and `style` default to medium/friendly. Without `messages` the
+job asks for an opening statement; with `messages` (a list of {"role",
+"content"} turns ending with the user's argument) it generates the rebuttal.
+Alternatively, pass a plain text file of topics with --topics to get one
+opening job per topic × difficulty × style.
+
+Results are appended to the output file as jobs complete, one line each:
+
+    {"id", "topic", "difficulty", "style", "ok", "reply" or "error", "elapsed"}
+
+Re-running with the same output file skips jobs that already succeeded, so an
+interrupted run resumes where it stopped and failed jobs are retried.
+
+    python run.py --batch jobs.jsonl --output results.jsonl --concurrency 8
+"""
+import json
+import time
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from config import Config
+from debate_bot import DebateBot, ErrorMessage
+from logging_setup import configure_logging, log_context
+
+logger = logging.getLogger(__name__)
+
+def read_jobs(path):
+    """
+    Yield jobs from a JSONL file, skipping blank lines.
+
+    A line that isn't a JSON object is yielded as a job that fails with the
+    reason, so it is reported without stopping the rest of the file.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                job = json.loads(line)
+            except ValueError as e:
+                yield {"id": str(line_number), "invalid": f"Invalid JSON: {e}"}
+                continue
+            if not isinstance(job, dict):
+                yield {"id": str(line_number), "invalid": "Invalid job: expected a JSON object"}
+                continue
+            job["id"] = str(job.get("id", line_number))
+            yield job
+
+def expand_topics(path, difficulties=None, styles=None):
+    """
+    Yield one opening job per topic in a text file for every difficulty and style.
+    """
+    difficulties = difficulties or list(Config.DIFFICULTY_LEVELS)
+    styles = styles or list(Config.CONVERSATION_STYLES)
+    with open(path, encoding="utf-8") as f:
+        topics = [line.strip() for line in f if line.strip()]
+    for topic in topics:
+        for difficulty in difficulties:
+            for style in styles:
+                yield {"id": f"{topic}|{difficulty}|{style}", "topic": topic, "difficulty": difficulty, "style": style}
+
+def completed_ids(path):
+    """
+    Return the IDs of jobs that already succeeded in an existing output file.
+    """
+    done = set()
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    # A line cut short when the previous run was killed
+                    continue
+                if result.get("ok"):
+                    done.add(str(result["id"]))
+    except FileNotFoundError:
+        pass
+    return done
+
+def run_job(bot, job):
+    """
+    Generate the reply for one job.
+
+    Returns:
+        dict: The result line to write
+    """
+    start = time.perf_counter()
+    topic = str(job.get("topic") or "").strip()
+    difficulty = job.get("difficulty", "medium")
+    style = job.get("style", "friendly")
+    result = {"id": str(job["id"]), "topic": topic, "difficulty": difficulty, "style": style, "ok": False}
+
+    try:
+        if job.get("invalid"):
+            result["error"] = job["invalid"]
+        elif not topic:
+            result["error"] = "Missing topic."
+        elif difficulty not in Config.DIFFICULTY_LEVELS:
+            result["error"] = f"Unknown difficulty: {difficulty}"
+        elif style not in Config.CONVERSATION_STYLES:
+            result["error"] = f"Unknown style: {style}"
+        else:
+            messages = job.get("messages") or [{"role": "user", "content": Config.OPENING_REQUEST.format(topic=topic)}]
+            with log_context(request_id=result["id"]):
+                reply = bot.generate_response(messages, topic, difficulty, style, priority="batch")
+            if isinstance(reply, ErrorMessage):
+                result["error"] = reply
+            else:
+                result["ok"] = True
+                result["reply"] = reply
+    except Exception as e:
+        # A malformed job, e.g. messages that aren't a list of turns, fails on
+        # its own instead of aborting the whole batch
+        result["error"] = str(e) or type(e).__name__
+
+    result["elapsed"] = round(time.perf_counter() - start, 3)
+    return result
+
+def run_batch(jobs, output_path, concurrency=8, bot=None):
+    """
+    Run jobs on a bounded worker pool, appending each result to output_path as it completes.
+
+    Only concurrency × 2 jobs are in flight at once, so arbitrarily large
+    job files are never loaded into memory.
+
+    Args:
+        jobs (iterable): Job dicts, see the module docstring
+        output_path (str): JSONL file to append results to
+        concurrency (int): Number of worker threads
+        bot (DebateBot): Bot to use; a new one by default
+
+    Returns:
+        tuple: (succeeded, failed, skipped) job counts
+    """
+    bot = bot or DebateBot()
+    done = completed_ids(output_path)
+    succeeded = failed = skipped = 0
+
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        pending = set()
+
+        def drain(return_when):
+            nonlocal pending, succeeded, failed
+            finished, pending = wait(pending, return_when=return_when)
+            for future in finished:
+                result = future.result()
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                if result["ok"]:
+                    succeeded += 1
+                else:
+                    failed += 1
+                    logger.warning("Job %s failed: %s", result["id"], result["error"])
+                if (succeeded + failed) % 50 == 0:
+                    logger.info("Batch progress: %s succeeded, %s failed, %s skipped", succeeded, failed, skipped)
+
+        for job in jobs:
+            if str(job.get("id")) in done:
+                skipped += 1
+                continue
+            if len(pending) >= concurrency * 2:
+                drain(FIRST_COMPLETED)
+            pending.add(pool.submit(run_job, bot, job))
+
+        while pending:
+            drain(FIRST_COMPLETED)
+
+    return succeeded, failed, skipped
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="run.py --batch", description="Generate debate replies in bulk from a JSONL file of jobs")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("jobs", nargs="?", help="JSONL file of jobs")
+    source.add_argument("--topics", help="text file with one topic per line; runs every difficulty and style")
+    parser.add_argument("--output", required=True, help="JSONL file to append results to (also used to resume)")
+    parser.add_argument("--concurrency", type=int, default=8, help="number of parallel API calls")
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    jobs = expand_topics(args.topics) if args.topics else read_jobs(args.jobs)
+    start = time.perf_counter()
+    succeeded, failed, skipped = run_batch(jobs, args.output, args.concurrency)
+    elapsed = time.perf_counter() - start
+    print(f"{succeeded} succeeded, {failed} failed, {skipped} skipped (already done) in {elapsed:.1f}s")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
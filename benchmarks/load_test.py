@@ -0,0 +1,168 @@
+"""
+Load test for DebateBot: N concurrent simulated debates against a chat-completions endpoint.
+
+Each debate asks for an opening statement and then sends a few canned
+arguments, streaming every reply so time-to-first-token can be measured.
+Calls are never coalesced: debates share topics and arguments, and merging
+their identical requests would count calls that never reached the server.
+By default a local mock server (benchmarks/mock_server.py) is started
+in-process; pass --url to target another endpoint.
+
+    python -m benchmarks.load_test --debates 100 --concurrency 20 --turns 3
+    python -m benchmarks.load_test --async --debates 500 --concurrency 200
+"""
+import time
+import asyncio
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from debate_bot import ErrorMessage
+from metrics import nearest_rank
+from benchmarks.mock_server import MockSettings, start_in_thread
+
+ARGUMENTS = [
+    "I think the costs are far outweighed by the long term benefits.",
+    "That ignores every study published in the last decade.",
+    "Even if you're right about the short term, the incentives are all wrong.",
+    "Give me one concrete example where that actually worked.",
+]
+
+class Results:
+    """
+    Thread-safe collector for per-call timings.
+    """
+    def __init__(self):
+        self.latencies = []
+        self.first_token = []
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency, first_token, failed):
+        with self._lock:
+            self.latencies.append(latency)
+            if first_token is not None:
+                self.first_token.append(first_token)
+            if failed:
+                self.errors += 1
+
+def percentile(values, pct):
+    """
+    Percentile of a list of numbers, computed as in the /metrics summaries.
+    """
+    if not values:
+        return float("nan")
+    return nearest_rank(sorted(values), pct)
+
+def _debate_turns(debate_index, turns):
+    topic = f"Topic number {debate_index % 10}"
+    yield topic, Config.OPENING_REQUEST.format(topic=topic)
+    for turn in range(turns):
+        yield topic, ARGUMENTS[(debate_index + turn) % len(ARGUMENTS)]
+
+def run_sync_debate(bot, debate_index, turns, difficulty, style, results):
+    history = []
+    for topic, user_message in _debate_turns(debate_index, turns):
+        history.append({"role": "user", "content": user_message})
+        start = time.perf_counter()
+        first_token = None
+        failed = False
+        reply = ""
+        for chunk in bot.stream_response(history, topic, difficulty, style, coalesce=False):
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            failed = failed or isinstance(chunk, ErrorMessage)
+            reply += chunk
+        results.record(time.perf_counter() - start, first_token, failed)
+        history.append({"role": "assistant", "content": reply})
+
+async def run_async_debate(bot, debate_index, turns, difficulty, style, results):
+    history = []
+    for topic, user_message in _debate_turns(debate_index, turns):
+        history.append({"role": "user", "content": user_message})
+        start = time.perf_counter()
+        first_token = None
+        failed = False
+        reply = ""
+        async for chunk in bot.astream_response(history, topic, difficulty, style, coalesce=False):
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            failed = failed or isinstance(chunk, ErrorMessage)
+            reply += chunk
+        results.record(time.perf_counter() - start, first_token, failed)
+        history.append({"role": "assistant", "content": reply})
+
+def run_sync(args, results):
+    from debate_bot import DebateBot
+    bot = DebateBot()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [
+            pool.submit(run_sync_debate, bot, i, args.turns, args.difficulty, args.style, results)
+            for i in range(args.debates)
+        ]
+        for future in futures:
+            future.result()
+
+async def run_async(args, results):
+    from async_debate_bot import AsyncDebateBot
+    async with AsyncDebateBot(max_concurrency=args.concurrency) as bot:
+        await asyncio.gather(*[
+            run_async_debate(bot, i, args.turns, args.difficulty, args.style, results)
+            for i in range(args.debates)
+        ])
+
+def report(results, elapsed):
+    calls = len(results.latencies)
+    print(f"calls        {calls} ({results.errors} errors) in {elapsed:.2f}s")
+    print(f"throughput   {calls / elapsed:.1f} calls/s")
+    for name, values in (("latency", results.latencies), ("first token", results.first_token)):
+        print(
+            f"{name:<12} p50 {percentile(values, 50) * 1000:7.1f} ms   "
+            f"p95 {percentile(values, 95) * 1000:7.1f} ms   "
+            f"p99 {percentile(values, 99) * 1000:7.1f} ms"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--debates", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=3, help="user arguments after the opening")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--difficulty", default="medium", choices=list(Config.DIFFICULTY_LEVELS))
+    parser.add_argument("--style", default="friendly", choices=list(Config.CONVERSATION_STYLES))
+    parser.add_argument("--async", dest="use_async", action="store_true", help="drive AsyncDebateBot instead of DebateBot")
+    parser.add_argument("--hedge", action="store_true", help="enable hedged requests (see hedging.py)")
+    parser.add_argument("--url", help="chat-completions URL to test instead of the bundled mock")
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="mock median time to first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=60.0, help="mock generation speed")
+    parser.add_argument("--error-rate-429", type=float, default=0.0)
+    parser.add_argument("--error-rate-5xx", type=float, default=0.0)
+    args = parser.parse_args()
+
+    Config.HEDGE_ENABLED = Config.HEDGE_ENABLED or args.hedge
+    stop = None
+    if args.url:
+        Config.MISTRAL_API_URL = args.url
+    else:
+        Config.MISTRAL_API_URL, stop = start_in_thread(MockSettings(
+            latency_ms=args.latency_ms,
+            tokens_per_sec=args.tokens_per_sec,
+            error_rate_429=args.error_rate_429,
+            error_rate_5xx=args.error_rate_5xx,
+        ))
+        Config.MISTRAL_API_KEY = Config.MISTRAL_API_KEY or "mock"
+
+    results = Results()
+    start = time.perf_counter()
+    try:
+        if args.use_async:
+            asyncio.run(run_async(args, results))
+        else:
+            run_sync(args, results)
+    finally:
+        elapsed = time.perf_counter() - start
+        if stop is not None:
+            stop()
+    report(results, elapsed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Local stand-in for the Mistral /v1/chat/completions endpoint.
+
+Serves plain and streamed (SSE) completions with configurable latency,
+token rate and injected 429/5xx failures, so DebateBot can be measured
+without an API key or network access.
+
+    python -m benchmarks.mock_server --port 8765 --latency-ms 300 --tokens-per-sec 60
+    MISTRAL_API_URL=http://127.0.0.1:8765/v1/chat/completions MISTRAL_API_KEY=mock python run.py
+"""
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import threading
+from aiohttp import web
+
+WORDS = (
+    "honestly this argument ignores the evidence and frankly I find that "
+    "frustrating because the data clearly shows a different picture 🔥 "
+    "consider the long term costs the people affected and the alternatives"
+).split()
+
+class MockSettings:
+    """
+    Behaviour of the mock endpoint.
+
+    Args:
+        latency_ms (float): Median time before the first token (or the full
+            response when not streaming)
+        latency_dist (str): "fixed", "uniform" (0.5x-1.5x the median) or
+            "lognormal" (long tail, shaped by latency_sigma)
+        latency_sigma (float): Spread of the lognormal distribution
+        tokens_per_sec (float): Generation speed after the first token
+        completion_tokens (int): Tokens per completion, capped by max_tokens
+        paragraph_tokens (int): Tokens between paragraph breaks
+        error_rate_429 (float): Fraction of requests rejected as rate limited
+        error_rate_5xx (float): Fraction of requests failing with a 503
+        retry_after (float): Retry-After seconds sent with 429s
+    """
+    def __init__(self, latency_ms=300.0, latency_dist="lognormal", latency_sigma=0.5,
+                 tokens_per_sec=60.0, completion_tokens=200, paragraph_tokens=40,
+                 error_rate_429=0.0, error_rate_5xx=0.0, retry_after=1.0):
+        self.latency_ms = latency_ms
+        self.latency_dist = latency_dist
+        self.latency_sigma = latency_sigma
+        self.tokens_per_sec = tokens_per_sec
+        self.completion_tokens = completion_tokens
+        self.paragraph_tokens = paragraph_tokens
+        self.error_rate_429 = error_rate_429
+        self.error_rate_5xx = error_rate_5xx
+        self.retry_after = retry_after
+
+    def first_token_delay(self):
+        median = self.latency_ms / 1000
+        if self.latency_dist == "fixed":
+            return median
+        if self.latency_dist == "uniform":
+            return random.uniform(0.5 * median, 1.5 * median)
+        return random.lognormvariate(0, self.latency_sigma) * median
+
+def _tokens(count, paragraph_tokens):
+    for i in range(count):
+        if i and i % paragraph_tokens == 0:
+            yield "\n\n" + random.choice(WORDS)
+        else:
+            yield (" " if i else "") + random.choice(WORDS)
+
+def create_app(settings=None):
+    """
+    Build the mock aiohttp application.
+    """
+    settings = settings or MockSettings()
+
+    async def chat_completions(request):
+        body = await request.json()
+        roll = random.random()
+        if roll < settings.error_rate_429:
+            return web.json_response(
+                {"message": "Requests rate limit exceeded"},
+                status=429,
+                headers={"Retry-After": str(settings.retry_after)}
+            )
+        if roll < settings.error_rate_429 + settings.error_rate_5xx:
+            return web.json_response({"message": "Service unavailable"}, status=503)
+
+        count = min(settings.completion_tokens, body.get("max_tokens") or settings.completion_tokens)
+        prompt_tokens = sum(len(m.get("content", "").split()) for m in body.get("messages", []))
+        token_delay = 1 / settings.tokens_per_sec
+        await asyncio.sleep(settings.first_token_delay())
+
+        if not body.get("stream"):
+            await asyncio.sleep(count * token_delay)
+            return web.json_response({
+                "id": f"mock-{time.time_ns()}",
+                "object": "chat.completion",
+                "model": body.get("model"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(_tokens(count, settings.paragraph_tokens))},
+                    "finish_reason": "length" if count == body.get("max_tokens") else "stop",
+                }],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": count, "total_tokens": prompt_tokens + count},
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        try:
+            await response.prepare(request)
+            for i, token in enumerate(_tokens(count, settings.paragraph_tokens)):
+                if i:
+                    await asyncio.sleep(token_delay)
+                chunk = {"choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+                await response.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            final = {
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "length" if count == body.get("max_tokens") else "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": count, "total_tokens": prompt_tokens + count},
+            }
+            await response.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+        except ConnectionResetError:
+            # The client stopped reading early, e.g. after enough text for a short
+            # reply, or gave up before the first token because a hedge won
+            pass
+        return response
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    return app
+
+def start_in_thread(settings=None, host="127.0.0.1", port=0):
+    """
+    Run the mock server on a background thread.
+
+    Returns:
+        tuple: (chat-completions URL, function that stops the server)
+    """
+    sock = socket.socket()
+    sock.bind((host, port))
+    bound_port = sock.getsockname()[1]
+
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(create_app(settings))
+    loop.run_until_complete(runner.setup())
+    loop.run_until_complete(web.SockSite(runner, sock).start())
+    thread = threading.Thread(target=loop.run_forever, name="mock-mistral", daemon=True)
+    thread.start()
+
+    def stop():
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+
+    return f"http://{host}:{bound_port}/v1/chat/completions", stop
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--tokens-per-sec", type=float, default=60.0)
+    parser.add_argument("--completion-tokens", type=int, default=200)
+    parser.add_argument("--error-rate-429", type=float, default=0.0)
+    parser.add_argument("--error-rate-5xx", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    args = parser.parse_args()
+
+    settings = MockSettings(
+        latency_ms=args.latency_ms,
+        latency_dist=args.latency_dist,
+        latency_sigma=args.latency_sigma,
+        tokens_per_sec=args.tokens_per_sec,
+        completion_tokens=args.completion_tokens,
+        error_rate_429=args.error_rate_429,
+        error_rate_5xx=args.error_rate_5xx,
+        retry_after=args.retry_after,
+    )
+    web.run_app(create_app(settings), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
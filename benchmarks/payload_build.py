@@ -0,0 +1,118 @@
+"""
+Micro-benchmark for building a chat-completions payload.
+
+Compares the compiled system prompts (prompts.py) with the previous
+per-turn f-string, for the whole payload a turn sends, and reports how much
+of the request is byte-identical between two debates with the same
+settings, i.e. what a provider-side prompt cache can reuse.
+
+    python -m benchmarks.payload_build --turns 10
+"""
+import time
+import argparse
+from config import Config
+from debate_bot import DebateBot
+from history import HistoryWindow, estimate_tokens
+from turns import TurnLog
+
+TOPICS = ["Carbon taxes", "Universal basic income", "Nuclear power", "Remote work", "Space exploration"]
+
+def legacy_system_prompt(topic, difficulty, style):
+    # The prompt as debate_bot built it on every turn before prompts.py
+    style_settings = Config.CONVERSATION_STYLES.get(style, Config.CONVERSATION_STYLES["friendly"])
+    emotional_intensity = "moderate"
+    if difficulty == "hard":
+        emotional_intensity = "high"
+    elif difficulty == "easy":
+        emotional_intensity = "mild"
+    if style in ["aggressive", "controversial", "sarcastic"]:
+        emotional_intensity = "very high"
+    return f"""
+        {style_settings['system_prompt']}
+
+        You are engaged in a REAL, emotionally-charged debate on: "{topic}".
+
+        Guidelines for your responses:
+        - You are ONLY a debate bot. You should ONLY discuss and debate the specified topic.
+        - If the user asks non-debate questions, remind them you're only here to debate the topic.
+        - Stay strictly on the topic of "{topic}" for this debate session.
+        - Provide {difficulty} level arguments but with {emotional_intensity} emotional intensity
+        - Act like a real human in a heated debate, not an AI
+        - Show genuine emotional reactions to the user's points
+        - Express strong personal opinions and feelings about the topic
+        - Occasionally use rhetorical questions to challenge the user
+        - Use dramatic pauses... to emphasize your points
+        - Make your language colorful and emotionally expressive
+        - Keep responses VERY concise (2-3 sentences max per point)
+        - Make no more than 2-3 points total in your response
+        - Use emojis from this set to emphasize emotions: {', '.join(style_settings.get('emoji_set', ['😊', '👍']))}
+        - Use emoji bullet points to structure your arguments
+        - If appropriate, use exaggerated language, ALL CAPS for emphasis, or *asterisks* for emphasis
+        - Occasionally express disagreement strongly, like a real debate opponent
+        """
+
+def legacy_payload(bot, history, topic, difficulty, style):
+    settings = Config.DIFFICULTY_LEVELS[difficulty]
+    system = {"role": "system", "content": legacy_system_prompt(topic, difficulty, style)}
+    window = HistoryWindow(settings["history_token_budget"]).fit(system, history)
+    return {
+        "model": bot.model,
+        "messages": window.messages,
+        "temperature": settings["temperature"],
+        "max_tokens": bot.length_stats.max_tokens(difficulty, style, settings["max_tokens"]),
+    }
+
+def compiled_payload(bot, history, topic, difficulty, style):
+    return bot._build_payload(history, topic, difficulty, style)[0]
+
+def make_history(turns, topic):
+    history = TurnLog()
+    history.append("user", Config.OPENING_REQUEST.format(topic=topic))
+    for i in range(turns):
+        history.append("assistant" if i % 2 == 0 else "user", f"Point {i} about {topic}: " + "the evidence shows otherwise 🔥 " * 12)
+    return history
+
+def time_build(build, bot, histories, number, cold):
+    start = time.perf_counter()
+    for n in range(number):
+        topic = TOPICS[n % len(TOPICS)]
+        if cold:
+            # A busy worker serves far more debates than the token cache holds
+            estimate_tokens.cache_clear()
+        build(bot, histories[topic], topic, "hard", "sarcastic")
+    return (time.perf_counter() - start) / number
+
+def shared_prefix(a, b):
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time payload construction with compiled and per-turn system prompts")
+    parser.add_argument("--turns", type=int, default=10, help="messages already in each debate")
+    parser.add_argument("--number", type=int, default=20000, help="payloads built per measurement")
+    args = parser.parse_args(argv)
+
+    bot = DebateBot()
+    histories = {topic: make_history(args.turns, topic) for topic in TOPICS}
+
+    print(f"Building one payload ({args.turns}-message history, hard/sarcastic):")
+    print(f"{'':<22} {'warm cache':>12} {'cold cache':>12}")
+    for name, build in (("per-turn f-string", legacy_payload), ("compiled prompts", compiled_payload)):
+        warm = time_build(build, bot, histories, args.number, cold=False)
+        cold = time_build(build, bot, histories, args.number // 10, cold=True)
+        print(f"{name:<22} {warm * 1e6:>9.1f} us {cold * 1e6:>9.1f} us")
+
+    print()
+    print("System prompt shared by two debates with the same settings:")
+    for name, build in (("per-turn f-string", legacy_payload), ("compiled prompts", compiled_payload)):
+        a = build(bot, histories[TOPICS[0]], TOPICS[0], "hard", "sarcastic")["messages"][0]["content"]
+        b = build(bot, histories[TOPICS[1]], TOPICS[1], "hard", "sarcastic")["messages"][0]["content"]
+        same = shared_prefix(a, b)
+        print(f"{name:<22} {same:>5} of {len(a)} characters (~{estimate_tokens(a[:same])} tokens)")
+
+if __name__ == "__main__":
+    main()
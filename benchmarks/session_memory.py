@@ -0,0 +1,95 @@
+"""
+Memory benchmark for conversation storage at many concurrent sessions.
+
+Builds the same debates as lists of {"role", "content"} dicts (the old
+storage) and as TurnLogs, and reports the memory each representation adds on
+top of the message text itself, plus the cost of windowing a long debate for
+an API call.
+
+    python -m benchmarks.session_memory --sessions 5000 --turns 20
+"""
+import gc
+import time
+import random
+import argparse
+import tracemalloc
+from history import HistoryWindow, estimate_tokens
+from turns import TurnLog
+
+WORDS = (
+    "the evidence clearly shows that carbon pricing reduces emissions while "
+    "critics argue it hurts households and businesses alike 🔥 consider"
+).split()
+
+def make_texts(sessions, turns, words_per_turn):
+    return [
+        [" ".join(random.choice(WORDS) for _ in range(words_per_turn)) for _ in range(turns)]
+        for _ in range(sessions)
+    ]
+
+def role(i):
+    return "user" if i % 2 == 0 else "assistant"
+
+def as_dicts(texts):
+    return [[{"role": role(i), "content": text} for i, text in enumerate(debate)] for debate in texts]
+
+def as_loaded_dicts(texts):
+    # load_turns built fresh role strings for every row read from SQLite
+    return [[{"role": "".join(role(i)), "content": text} for i, text in enumerate(debate)] for debate in texts]
+
+def as_turn_logs(texts):
+    logs = []
+    for debate in texts:
+        log = TurnLog()
+        for i, text in enumerate(debate):
+            log.append("".join(role(i)), text)
+        logs.append(log)
+    return logs
+
+def measure(build, texts):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sessions = build(texts)
+    # Token estimates cached while building are shared, bounded and not per session
+    estimate_tokens.cache_clear()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del sessions
+    return after - before
+
+def time_fit(conversation, number):
+    window = HistoryWindow(3000)
+    system = {"role": "system", "content": "You are a debate partner."}
+    start = time.perf_counter()
+    for _ in range(number):
+        # A worker holding thousands of debates can't keep every message's
+        # estimate in the shared cache
+        estimate_tokens.cache_clear()
+        window.fit(system, conversation)
+    return (time.perf_counter() - start) / number
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare per-session memory of dict and TurnLog conversations")
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--words", type=int, default=60, help="words per message")
+    args = parser.parse_args(argv)
+
+    texts = make_texts(args.sessions, args.turns, args.words)
+    text_bytes = sum(len(text.encode("utf-8")) + 49 for debate in texts for text in debate)
+    print(f"{args.sessions} sessions x {args.turns} turns, ~{text_bytes / args.sessions / 1024:.1f} KiB of message text per session")
+    print()
+    print(f"{'storage':<22} {'overhead/session':>17} {'total':>10}")
+    for name, build in (("dicts", as_dicts), ("dicts (from SQLite)", as_loaded_dicts), ("TurnLog", as_turn_logs)):
+        overhead = measure(build, texts)
+        print(f"{name:<22} {overhead / args.sessions:>15.0f} B {overhead / 1024 / 1024:>8.1f} MiB")
+
+    long_debate = make_texts(1, 200, args.words)[0]
+    print()
+    print("Windowing a 200-turn debate for one call (cold token cache):")
+    for name, conversation in (("dicts", as_dicts([long_debate])[0]), ("TurnLog", as_turn_logs([long_debate])[0])):
+        print(f"{name:<22} {time_fit(conversation, 200) * 1e6:>15.0f} us")
+
+if __name__ == "__main__":
+    main()
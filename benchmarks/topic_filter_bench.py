@@ -0,0 +1,74 @@
+"""
+Micro-benchmark of the off-topic check run on every user message.
+
+Compares the original per-message substring loop with TopicFilter, both
+for the whole check and for phrase matching alone (the substring scan
+against TopicFilter's compiled matcher), then shows how each classifies the
+sample messages.
+
+    python -m benchmarks.topic_filter_bench
+"""
+import timeit
+from config import Config
+from topic_filter import TopicFilter, _normalize
+
+TOPIC = "Climate Change Solutions"
+
+MESSAGES = [
+    "I think carbon taxes are the most effective climate change solution we have.",
+    "Hello! Who are you and what can you do?",
+    "Tell me a joke",
+    "What is the evidence that renewable subsidies actually reduce emissions?",
+    "Nuclear power is clean, reliable and far safer than people assume. " * 5,
+    "Explain why climate policy always hurts the poor.",
+]
+
+def legacy_is_debate_message(user_message, topic):
+    # The check app.py used to run inline
+    non_debate_patterns = list(Config.OFF_TOPIC_PATTERNS)
+    user_message_lower = user_message.lower()
+    for pattern in non_debate_patterns:
+        if pattern in user_message_lower and topic not in user_message_lower:
+            return False
+    return True
+
+def legacy_matches_phrase(user_message):
+    # Just the phrase scan of the old loop, without its topic check
+    user_message_lower = user_message.lower()
+    return any(pattern in user_message_lower for pattern in Config.OFF_TOPIC_PATTERNS)
+
+def per_message(func, number):
+    def run():
+        for message in MESSAGES:
+            func(message)
+    seconds = min(timeit.repeat(run, number=number, repeat=3))
+    return seconds / (number * len(MESSAGES)) * 1e6
+
+def main(number=20000):
+    topic_filter = TopicFilter(TOPIC)
+
+    print("Whole check:")
+    for name, func in (
+        ("legacy loop", lambda message: legacy_is_debate_message(message, TOPIC)),
+        ("TopicFilter", topic_filter.is_debate_message),
+    ):
+        print(f"  {name:<14} {per_message(func, number):8.2f} us/message")
+
+    print("Phrase matching only:")
+    for name, func in (
+        ("substring scan", legacy_matches_phrase),
+        ("compiled regex", lambda message: topic_filter._find_pattern(_normalize(message))),
+    ):
+        print(f"  {name:<14} {per_message(func, number):8.2f} us/message")
+
+    print()
+    print(f"{'legacy':<7} {'filter':<7} {'relevance':<9} message")
+    for message in MESSAGES:
+        print(
+            f"{str(legacy_is_debate_message(message, TOPIC)):<7} "
+            f"{str(topic_filter.is_debate_message(message)):<7} "
+            f"{topic_filter.relevance(message):<9.2f} {message[:50]}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Cancellable generation: stop API calls whose reply nobody will read.
+
+A CancelToken is handed down to DebateBot; once it is cancelled the call
+leaves the rate-limit queue, or closes its connection at the next streamed
+chunk, and raises GenerationCancelled.
+
+In the Streamlit app each reply is generated as a Generation tied to its
+debate rather than to the script run that started it, so a rerun simply
+shows the reply still in progress. Resetting the debate, or sending a new
+message before the reply has arrived, cancels it.
+"""
+import time
+import logging
+import threading
+import contextvars
+from config import Config
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+CANCELLED = REGISTRY.counter("debate_generation_cancelled_total", "Replies cancelled before they were finished, by reason.", ("reason",))
+
+class GenerationCancelled(Exception):
+    """
+    Raised by DebateBot when a call is stopped through its CancelToken.
+    """
+
+class CancelToken:
+    """
+    A one-way flag asking a generation to stop, safe to set from any thread.
+    """
+    def __init__(self):
+        self.reason = None
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason="cancelled"):
+        """
+        Ask the generation to stop.
+
+        Returns:
+            bool: False if the token was already cancelled
+        """
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+        return True
+
+    def on_cancel(self, callback):
+        """
+        Call `callback` when the token is cancelled, or now if it already is.
+
+        Returns:
+            callable: Removes the callback again
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._discard(callback)
+        callback()
+        return lambda: None
+
+    def _discard(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise GenerationCancelled(self.reason)
+
+class Generation:
+    """
+    One reply being generated on a background thread, buffered for whichever script run shows it.
+
+    produce(token) yields the reply's chunks. Once it has finished,
+    record(chunks) is called to store the reply, unless the generation was
+    cancelled first; the two never interleave, so a cancelled reply is never
+    recorded after the message that superseded it. A generation started
+    before its debate exists (see speculation.py) has no record callback
+    until it is adopted.
+    """
+    def __init__(self, turn, produce, record=None):
+        self.turn = turn
+        self.token = CancelToken()
+        self.chunks = []
+        self.done = False
+        self.complete = False
+        self.recorded = False
+        self.finished_at = None
+        self._produce = produce
+        self._record = record
+        self._cond = threading.Condition()
+
+    def start(self):
+        # The generation logs with the IDs of the run that started it
+        context = contextvars.copy_context()
+        threading.Thread(target=context.run, args=(self._run,), name="generation", daemon=True).start()
+
+    def _run(self):
+        try:
+            for chunk in self._produce(self.token):
+                with self._cond:
+                    self.chunks.append(chunk)
+                    self._cond.notify_all()
+            with self._cond:
+                self.complete = True
+                if not self.token.cancelled and self._record is not None:
+                    self._record(self.chunks)
+                    self.recorded = True
+                self._finish()
+        except GenerationCancelled:
+            pass
+        except Exception:
+            logger.exception("Generating a reply failed")
+        finally:
+            with self._cond:
+                self._finish()
+
+    def _finish(self):
+        # Must be called with the condition held
+        if not self.done:
+            self.done = True
+            self.finished_at = time.monotonic()
+            self._cond.notify_all()
+
+    def adopt(self, turn, record):
+        """
+        Attach the generation to a debate, recording its reply now if it has already finished.
+
+        Returns:
+            bool: False if it was cancelled or failed, and can't be used
+        """
+        with self._cond:
+            if self.token.cancelled or (self.done and not self.complete):
+                return False
+            self.turn = turn
+            if self.complete:
+                record(self.chunks)
+                self.recorded = True
+            else:
+                self._record = record
+            return True
+
+    def cancel(self, reason):
+        """
+        Stop the generation unless its reply has already been recorded.
+
+        Returns:
+            bool: Whether a generation in progress was cancelled
+        """
+        with self._cond:
+            if self.done or not self.token.cancel(reason):
+                return False
+            self._cond.notify_all()
+        CANCELLED.inc(reason)
+        logger.info("Cancelled reply generation (%s)", reason)
+        return True
+
+    def read(self, start, timeout):
+        """
+        Wait up to `timeout` seconds for chunks after the first `start`.
+
+        Returns:
+            tuple: (new chunks, whether the generation has ended)
+        """
+        with self._cond:
+            if len(self.chunks) <= start and not self.done:
+                self._cond.wait(timeout)
+            return self.chunks[start:], self.done
+
+class SessionGenerations:
+    """
+    The reply generation of each debate, so any script run can find, show or cancel it.
+    """
+    def __init__(self):
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def start(self, session_id, turn, produce, record):
+        """
+        Return the generation answering message `turn` of the debate, starting it if needed.
+
+        A generation left over for an earlier message is cancelled, and one
+        that ended without recording its reply is started again.
+
+        Args:
+            session_id (str): The debate's ID
+            turn (int): Number of messages the reply follows
+            produce (callable): Given a CancelToken, yields the reply's chunks
+            record (callable): Given the chunks, stores the finished reply
+
+        Returns:
+            Generation: The generation to read the reply from
+        """
+        with self._lock:
+            self._evict_finished()
+            generation = self._generations.get(session_id)
+            if (generation is not None and generation.turn == turn and not generation.token.cancelled
+                    and (generation.recorded or not generation.done)):
+                return generation
+            if generation is not None:
+                generation.cancel("superseded")
+            generation = self._generations[session_id] = Generation(turn, produce, record)
+        generation.start()
+        return generation
+
+    def adopt(self, session_id, generation, turn, record):
+        """
+        Make a generation started elsewhere the debate's reply to message `turn`.
+
+        Returns:
+            bool: Whether it was adopted; if not, start() makes a new one
+        """
+        with self._lock:
+            if not generation.adopt(turn, record):
+                return False
+            previous = self._generations.get(session_id)
+            if previous is not None and previous is not generation:
+                previous.cancel("superseded")
+            self._generations[session_id] = generation
+            return True
+
+    def cancel(self, session_id, reason):
+        """
+        Cancel the debate's generation, if one is in progress.
+
+        Returns:
+            bool: Whether a generation was cancelled
+        """
+        with self._lock:
+            generation = self._generations.pop(session_id, None)
+        return generation is not None and generation.cancel(reason)
+
+    def _evict_finished(self):
+        # Must be called with the lock held. Replies are recorded in the
+        # debate, so a finished generation is only kept for runs still showing it
+        now = time.monotonic()
+        for session_id, generation in list(self._generations.items()):
+            if generation.done and now - generation.finished_at > Config.SESSION_IDLE_TIMEOUT:
+                del self._generations[session_id]
+
+_generations = None
+_generations_lock = threading.Lock()
+
+def get_session_generations():
+    """
+    Return the process-wide SessionGenerations shared by every app session.
+    """
+    global _generations
+    if _generations is None:
+        with _generations_lock:
+            if _generations is None:
+                _generations = SessionGenerations()
+    return _generations
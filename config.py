@@ -5,23 +5,80 @@ class Config:
     # Mistral AI API settings
     MISTRAL_API_KEY = os.environ.get("MISTRAL_API_KEY", "")
     MISTRAL_MODEL = "mistral-small"  # Default model
+    MISTRAL_API_URL = os.environ.get("MISTRAL_API_URL", "https://api.mistral.ai/v1/chat/completions")
+    
+    # Several OpenAI-compatible endpoints to route between, as a JSON list (see
+    # backends.py); empty uses the single Mistral endpoint above
+    BACKENDS = os.environ.get("BACKENDS", "")
+    BACKEND_FAILURE_THRESHOLD = int(os.environ.get("BACKEND_FAILURE_THRESHOLD", "5"))  # failures in a row that open a backend's circuit
+    BACKEND_OPEN_SECONDS = float(os.environ.get("BACKEND_OPEN_SECONDS", "30"))  # how long an open circuit fails fast before a trial call
+    BACKEND_EWMA_ALPHA = float(os.environ.get("BACKEND_EWMA_ALPHA", "0.2"))  # weight of the newest latency/error observation
+    BACKEND_ERROR_PENALTY = float(os.environ.get("BACKEND_ERROR_PENALTY", "4"))  # how strongly recent errors count against a backend
+    BACKEND_EXPLORE_RATE = float(os.environ.get("BACKEND_EXPLORE_RATE", "0.05"))  # share of calls sent to a random backend
+    
+    # HTTP client settings (shared keep-alive pool for all API calls)
+    HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "5"))  # seconds
+    HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", "60"))  # seconds between bytes
+    HTTP_POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_CONNECTIONS", "4"))  # distinct hosts kept pooled
+    HTTP_POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", "32"))  # connections kept per host
+    HTTP_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", "2"))
+    HTTP_BACKOFF_BASE = float(os.environ.get("HTTP_BACKOFF_BASE", "0.5"))  # seconds
+    HTTP_BACKOFF_MAX = float(os.environ.get("HTTP_BACKOFF_MAX", "8"))  # seconds
+    HTTP_RETRY_AFTER_MAX = float(os.environ.get("HTTP_RETRY_AFTER_MAX", "60"))  # longest Retry-After honoured, in seconds
+    
+    # Hedged requests (hedging.py): a slow call gets a second, racing request
+    HEDGE_ENABLED = os.environ.get("HEDGE_ENABLED", "").lower() in ("1", "true", "yes")
+    HEDGE_PERCENTILE = float(os.environ.get("HEDGE_PERCENTILE", "95"))  # hedge calls slower than this percentile of recent ones
+    HEDGE_MAX_RATE = float(os.environ.get("HEDGE_MAX_RATE", "0.05"))  # at most this fraction of calls are hedged
+    HEDGE_WINDOW = int(os.environ.get("HEDGE_WINDOW", "200"))  # recent latencies the percentile is taken over
+    HEDGE_MIN_SAMPLES = int(os.environ.get("HEDGE_MIN_SAMPLES", "20"))  # observations needed before hedging starts
+    
+    # Adaptive max_tokens (length_stats.py): request about as many tokens as replies actually keep
+    ADAPTIVE_MAX_TOKENS = os.environ.get("ADAPTIVE_MAX_TOKENS", "1").lower() in ("1", "true", "yes")
+    ADAPTIVE_PERCENTILE = float(os.environ.get("ADAPTIVE_PERCENTILE", "95"))  # kept lengths the limit should cover
+    ADAPTIVE_MARGIN = float(os.environ.get("ADAPTIVE_MARGIN", "0.25"))  # headroom added on top of that percentile
+    ADAPTIVE_MIN_TOKENS = int(os.environ.get("ADAPTIVE_MIN_TOKENS", "64"))  # never request fewer tokens than this
+    ADAPTIVE_WINDOW = int(os.environ.get("ADAPTIVE_WINDOW", "200"))  # recent replies per difficulty/style
+    ADAPTIVE_MIN_SAMPLES = int(os.environ.get("ADAPTIVE_MIN_SAMPLES", "20"))  # replies seen before the limit adapts
+    
+    # Speculative openings (speculation.py): start the opening statement while the user is still choosing settings
+    SPECULATIVE_OPENINGS = os.environ.get("SPECULATIVE_OPENINGS", "").lower() in ("1", "true", "yes")
+    SPECULATIVE_MIN_TOPIC_LENGTH = int(os.environ.get("SPECULATIVE_MIN_TOPIC_LENGTH", "4"))  # shorter topics are probably unfinished
+    SPECULATIVE_MAX_PER_SESSION = int(os.environ.get("SPECULATIVE_MAX_PER_SESSION", "3"))  # openings started per visitor before giving up
+    SPECULATIVE_MAX_IN_FLIGHT = int(os.environ.get("SPECULATIVE_MAX_IN_FLIGHT", "8"))  # speculative calls running at once, process-wide
+    
+    # Account-wide API limits enforced by rate_limiter.py; 0 means unlimited
+    RATE_LIMIT_RPM = int(os.environ.get("RATE_LIMIT_RPM", "0"))  # requests per minute
+    RATE_LIMIT_TPM = int(os.environ.get("RATE_LIMIT_TPM", "0"))  # prompt + completion tokens per minute
+    
+    # Maximum in-flight API calls per AsyncDebateBot
+    ASYNC_MAX_CONCURRENCY = int(os.environ.get("ASYNC_MAX_CONCURRENCY", "100"))
+    
+    # Opening statement cache, shared by all sessions in the process
+    OPENING_CACHE_MAX_ENTRIES = int(os.environ.get("OPENING_CACHE_MAX_ENTRIES", "512"))  # topic/difficulty/style keys
+    OPENING_CACHE_TTL = float(os.environ.get("OPENING_CACHE_TTL", "21600"))  # seconds
+    OPENING_CACHE_VARIANTS = int(os.environ.get("OPENING_CACHE_VARIANTS", "3"))  # distinct openings kept per key
+    OPENING_CACHE_DB_PATH = os.environ.get("OPENING_CACHE_DB_PATH", "")  # SQLite file; empty keeps it in memory only
     
     # Debate bot settings
     DIFFICULTY_LEVELS = {
         "easy": {
             "description": "Basic arguments with simple logic and limited knowledge depth.",
             "temperature": 0.7,
-            "max_tokens": 300
+            "max_tokens": 300,
+            "history_token_budget": 2000  # prompt tokens sent per turn, see history.py
         },
         "medium": {
             "description": "More nuanced arguments with deeper background knowledge.",
             "temperature": 0.8,
-            "max_tokens": 500
+            "max_tokens": 500,
+            "history_token_budget": 3000  # prompt tokens sent per turn, see history.py
         },
         "hard": {
             "description": "Complex arguments, sophisticated reasoning, and expert knowledge level.",
             "temperature": 0.9,
-            "max_tokens": 800
+            "max_tokens": 800,
+            "history_token_budget": 6000  # prompt tokens sent per turn, see history.py
         }
     }
     
@@ -58,6 +115,65 @@ class Config:
         }
     }
 
+    # Message sent on the user's behalf to get the bot's opening statement
+    OPENING_REQUEST = "I'd like to debate about {topic}. Please provide an opening statement."
+    
+    # Reply used instead of an API call when a message isn't a debate argument
+    OFF_TOPIC_REMINDER = "I'm an AI Debate Bot focused on debating specific topics. We're currently discussing '{topic}'. Please provide an argument related to this topic to continue our debate."
+    
+    # Phrases that mark a message as small talk rather than a debate argument
+    OFF_TOPIC_PATTERNS = [
+        "who are you", "what's your name", "how are you", "tell me about yourself",
+        "what can you do", "help me with", "can you help", "tell me a joke",
+        "what's the weather", "what time is it", "who made you", "what are you",
+        "hello", "hi there", "good morning", "good afternoon", "good evening",
+        "tell me about", "explain", "what is", "how does", "why is"
+    ]
+    
+    # Patterns above that open real arguments as often as small talk ("What is
+    # the evidence that..."); a message matching only these still counts as a
+    # debate argument if it has TOPIC_QUESTION_MIN_WORDS content words besides
+    OFF_TOPIC_QUESTION_PATTERNS = ["tell me about", "explain", "what is", "how does", "why is"]
+    TOPIC_QUESTION_MIN_WORDS = int(os.environ.get("TOPIC_QUESTION_MIN_WORDS", "5"))
+    
+    # Fraction of topic keywords a message matching OFF_TOPIC_PATTERNS must
+    # mention to still count as on-topic (see topic_filter.py)
+    TOPIC_RELEVANCE_THRESHOLD = float(os.environ.get("TOPIC_RELEVANCE_THRESHOLD", "0.2"))
+
+    # Messages shown in the chat before older ones are collapsed
+    CHAT_VISIBLE_MESSAGES = int(os.environ.get("CHAT_VISIBLE_MESSAGES", "20"))
+    
+    # Debate session storage (session_store.py): "memory" or "sqlite"
+    SESSION_STORE = os.environ.get("SESSION_STORE", "memory")
+    SESSION_DB_PATH = os.environ.get("SESSION_DB_PATH", "debates.db")
+    SESSION_DB_TIMEOUT = float(os.environ.get("SESSION_DB_TIMEOUT", "5"))  # seconds to wait on a locked database
+    SESSION_IDLE_TIMEOUT = float(os.environ.get("SESSION_IDLE_TIMEOUT", "3600"))  # seconds before an idle session leaves memory
+    SESSION_EVICT_INTERVAL = float(os.environ.get("SESSION_EVICT_INTERVAL", "60"))  # seconds between idle sweeps
+    
+    # Headless HTTP API (api_server.py)
+    API_HOST = os.environ.get("API_HOST", "127.0.0.1")
+    API_PORT = int(os.environ.get("API_PORT", "8080"))
+    
+    # Multi-process launcher (python run.py --workers N, see load_balancer.py)
+    LB_HOST = os.environ.get("LB_HOST", "0.0.0.0")
+    LB_PORT = int(os.environ.get("LB_PORT", "8501"))  # the proxy takes Streamlit's usual port
+    LB_WORKER_BASE_PORT = int(os.environ.get("LB_WORKER_BASE_PORT", "8502"))  # workers listen on consecutive ports from here
+    LB_HEALTH_INTERVAL = float(os.environ.get("LB_HEALTH_INTERVAL", "5"))  # seconds between health checks
+    LB_HEALTH_TIMEOUT = float(os.environ.get("LB_HEALTH_TIMEOUT", "2"))  # seconds
+    LB_UNHEALTHY_THRESHOLD = int(os.environ.get("LB_UNHEALTHY_THRESHOLD", "3"))  # failed checks in a row before a restart
+    LB_STARTUP_GRACE = float(os.environ.get("LB_STARTUP_GRACE", "60"))  # seconds a new worker has to pass its first check
+    LB_RESTART_MAX_DELAY = float(os.environ.get("LB_RESTART_MAX_DELAY", "30"))  # cap on the restart backoff, in seconds
+    
+    # Logging (logging_setup.py)
+    LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+    LOG_LEVELS = os.environ.get("LOG_LEVELS", "urllib3=WARNING,aiohttp.access=WARNING")  # per-logger overrides, "name=LEVEL,..."
+    LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")  # "text" or "json"
+    LOG_DEBUG_SAMPLE_RATE = float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", "1"))  # fraction of DEBUG records kept
+    
+    # Periodic metrics dump (metrics.py); 0 disables it, an empty path logs instead of writing a file
+    METRICS_DUMP_INTERVAL = float(os.environ.get("METRICS_DUMP_INTERVAL", "0"))
+    METRICS_DUMP_PATH = os.environ.get("METRICS_DUMP_PATH", "")
+
     STYLE_EMOJIS = {
         "friendly": "😊",
         "controversial": "🔥",
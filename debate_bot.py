@@ -1,19 +1,142 @@
 import os
+import json
+import time
+import itertools
 import requests
 import logging
 from config import Config
+from http_client import get_session, post_with_retries
+from backends import get_backend_pool, BackendUnavailableError, UNHEALTHY_STATUS_CODES
+from rate_limiter import get_rate_limiter
+from single_flight import get_single_flight, payload_key
+from hedging import race, get_hedge_policy
+from length_stats import get_length_stats
+from history import HistoryWindow, estimate_tokens
+from prompts import system_message
+from metrics import CallMetrics
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+class ErrorMessage(str):
+    """
+    A bot reply that reports a failure rather than a debate argument.
+    
+    Behaves like a plain string, so callers that only display replies need no
+    changes; callers that store or share replies can skip these.
+    """
+
+API_KEY_MISSING_MESSAGE = ErrorMessage("Error: API key not configured. Please set the MISTRAL_API_KEY environment variable.")
+
+# Role under which failed replies are stored: shown in the chat, never sent back to the model
+ERROR_ROLE = "error"
+
+# Marks the end of a streamed completion
+SSE_DONE = object()
+
 class DebateBot:
     def __init__(self):
-        self.api_key = Config.MISTRAL_API_KEY
         self.model = Config.MISTRAL_MODEL
+        # Endpoints to call, routed by recent latency and errors
+        self.backends = get_backend_pool()
         self.difficulty_levels = Config.DIFFICULTY_LEVELS
         self.conversation_styles = Config.CONVERSATION_STYLES
+        # Shared keep-alive pool, reused by every DebateBot in the process
+        self.session = get_session()
+        # Shared request/token budget, so all sessions together stay under the API limits
+        self.rate_limiter = get_rate_limiter()
+        # Identical requests in flight at the same time share one upstream call
+        self.flights = get_single_flight()
+        # Observed reply lengths, used to request no more tokens than we keep
+        self.length_stats = get_length_stats()
+        
+    def _build_messages(self, conversation_history, topic, difficulty, style):
+        """
+        Build the chat-completions message list for a debate turn.
+        
+        Args:
+            conversation_history (list): List of conversation messages
+            topic (str): The debate topic
+            difficulty (str): Difficulty level (easy, medium, hard)
+            style (str): Conversation style
+            
+        Returns:
+            WindowResult: Messages ready to send to the API (system prompt
+            first) and what was dropped to fit the token budget
+        """
+        # Compiled once per style and difficulty; only the topic is filled in
+        system = system_message(topic, difficulty, style)
+        
+        # Prepare the conversation for the API, keeping it within the
+        # difficulty's token budget
+        conversation_history = self._without_failed_turns(conversation_history)
+        difficulty_settings = self.difficulty_levels.get(difficulty, self.difficulty_levels["medium"])
+        window = HistoryWindow(difficulty_settings["history_token_budget"])
+        return window.fit(system, conversation_history)
+    
+    @staticmethod
+    def _without_failed_turns(conversation_history):
+        """
+        Leave out failed replies, and the messages they failed to answer, from the history sent.
+        
+        Only copies the history when it actually contains a failure.
+        """
+        if not any(message["role"] == ERROR_ROLE for message in conversation_history):
+            return conversation_history
+        kept = []
+        for message in conversation_history:
+            if message["role"] == ERROR_ROLE:
+                if kept and kept[-1]["role"] == "user":
+                    kept.pop()
+                continue
+            kept.append(message)
+        return kept
+    
+    def _build_payload(self, conversation_history, topic, difficulty, style, stream=False):
+        """
+        Build the JSON body for a chat-completions request.
+        
+        Returns:
+            tuple: (payload dict, WindowResult describing the history sent)
+        """
+        # Get difficulty settings
+        difficulty_settings = self.difficulty_levels.get(difficulty, self.difficulty_levels["medium"])
+        
+        window = self._build_messages(conversation_history, topic, difficulty, style)
+        payload = {
+            "model": self.model,
+            "messages": window.messages,
+            "temperature": difficulty_settings["temperature"],
+            "max_tokens": self.length_stats.max_tokens(difficulty, style, difficulty_settings["max_tokens"])
+        }
+        if stream:
+            payload["stream"] = True
+        return payload, window
+    
+    @staticmethod
+    def shorten_response(content, difficulty):
+        """
+        Trim overly long responses to their first three paragraphs.
         
-    def generate_response(self, conversation_history, topic, difficulty="medium", style="friendly"):
+        Hard debates are never shortened. Applying this to already shortened
+        text is a no-op, so it is safe to call on streamed output.
+        
+        Args:
+            content (str): The full response text
+            difficulty (str): Difficulty level (easy, medium, hard)
+            
+        Returns:
+            str: The (possibly) shortened response
+        """
+        # Ensure the response isn't too long
+        if len(content) > 500 and difficulty != "hard":
+            # Split content by paragraphs or sentences to shorten
+            paragraphs = content.split('\n\n')
+            if len(paragraphs) > 3:
+                # Keep only first 2-3 paragraphs
+                content = '\n\n'.join(paragraphs[:3])
+        return content
+        
+    def generate_response(self, conversation_history, topic, difficulty="medium", style="friendly", priority="interactive", coalesce=True, cancel_token=None):
         """
         Generate a response from the debate bot using Mistral AI API.
         
@@ -22,98 +145,393 @@ class DebateBot:
             topic (str): The debate topic
             difficulty (str): Difficulty level (easy, medium, hard)
             style (str): Conversation style (friendly, controversial, aggressive, humorous, educational, sarcastic)
+            priority (str): Rate-limit queue priority, "interactive" or "batch"
+            coalesce (bool): Share the upstream call with identical requests
+                already in flight; pass False to always get an independent sample
+            cancel_token (CancelToken): Stops the call early, see cancellation.py
             
         Returns:
             str: The bot's response
+        
+        Raises:
+            GenerationCancelled: If cancel_token was cancelled before the reply arrived
         """
-        if not self.api_key:
+        if not self.backends:
             logger.error("Mistral API key not found!")
-            return "Error: API key not configured. Please set the MISTRAL_API_KEY environment variable."
+            return API_KEY_MISSING_MESSAGE
             
-        # Get difficulty settings
-        difficulty_settings = self.difficulty_levels.get(difficulty, self.difficulty_levels["medium"])
+        payload, window = self._build_payload(conversation_history, topic, difficulty, style)
+        if not coalesce:
+            return self._generate(payload, window, difficulty, style, priority, cancel_token)
+        return self.flights.call(
+            payload_key(payload),
+            lambda flight_token: self._generate(payload, window, difficulty, style, priority, flight_token),
+            cancel_token
+        )
+    
+    def _generate(self, payload, window, difficulty, style, priority, cancel_token=None):
+        """
+        Make one blocking chat-completions call for generate_response.
+        """
+        call = CallMetrics(difficulty, style)
+        tokens = window.total_tokens + payload["max_tokens"]
+        reservation = None
+        content = ""
+        usage = None
+        outcome = "cancelled"
+        try:
+            reservation = self.rate_limiter.acquire(tokens, priority, cancel_token)
+            # Make API request to Mistral, hedged if it is unusually slow
+            call.queued()
+            result = race(
+                lambda: self._post_json(payload, call),
+                get_hedge_policy(f"generate:{difficulty}"),
+                discard=lambda result: None,
+                reserve=lambda: self.rate_limiter.try_acquire(tokens),
+                spent=lambda result: self._hedge_tokens(window, result)
+            )
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            usage = result.get("usage")
+            
+            # Get the content from the response
+            content = result["choices"][0]["message"]["content"]
+            
+            # Kept as a fallback: adaptive max_tokens should make this rare
+            shortened = self.shorten_response(content, difficulty)
+            outcome = "ok"
+            cut_off = self._record_length(difficulty, style, content, shortened, usage, result["choices"][0].get("finish_reason"))
+            call.finish(outcome, window, usage, estimate_tokens(content), shortened != content, cut_off)
+            return shortened
+            
+        except (requests.exceptions.RequestException, BackendUnavailableError) as e:
+            logger.error("Error calling Mistral API: %s", e)
+            outcome = "error"
+            return self._error_message(e)
+        finally:
+            if outcome != "ok":
+                call.finish(outcome, window)
+            if reservation is not None:
+                reservation.settle(self._tokens_used(outcome, window, usage, content))
+    
+    def _send(self, payload, stream=False):
+        """
+        POST a chat-completions request to the best available backend.
+        
+        A backend that can't be reached or answers with an unhealthy status
+        is recorded as failing and the call moves on to the next one; retries
+        against the same backend only happen when there is nowhere else to go.
         
-        # Get conversation style
-        style_settings = self.conversation_styles.get(style, self.conversation_styles["friendly"])
+        Returns:
+            requests.Response: The last response received
         
-        # Determine appropriate emotional intensity based on difficulty and style
-        emotional_intensity = "moderate"
-        if difficulty == "hard":
-            emotional_intensity = "high"
-        elif difficulty == "easy":
-            emotional_intensity = "mild"
+        Raises:
+            BackendUnavailableError: If every backend's circuit is open
+            requests.exceptions.RequestException: If the last backend tried
+                couldn't be reached
+        """
+        backend = self.backends.choose()
+        if backend is None:
+            raise BackendUnavailableError("Every backend is failing; not calling any until one recovers")
+        tried = []
+        while True:
+            tried.append(backend)
+            retries = 0 if self.backends.has_alternative(tried) else None
+            started = time.perf_counter()
+            try:
+                response = post_with_retries(
+                    self.session,
+                    backend.url,
+                    backend.headers(),
+                    dict(payload, model=backend.model),
+                    stream=stream,
+                    max_retries=retries
+                )
+            except requests.exceptions.RequestException as e:
+                backend.record_failure()
+                failed, backend = backend, self.backends.choose(exclude=tried)
+                if backend is None:
+                    raise
+                logger.warning("Backend %s failed (%s), trying %s", failed.name, e, backend.name)
+                continue
+            except BaseException:
+                # Interrupted: a trial request must not keep the backend claimed
+                backend.release_probe()
+                raise
             
-        # Adjust based on style
-        if style in ["aggressive", "controversial", "sarcastic"]:
-            emotional_intensity = "very high"
-        
-        # Prepare system prompt with topic, difficulty, style, and emotional intensity
-        system_prompt = f"""
-        {style_settings['system_prompt']}
-        
-        You are engaged in a REAL, emotionally-charged debate on: "{topic}".
-        
-        Guidelines for your responses:
-        - You are ONLY a debate bot. You should ONLY discuss and debate the specified topic.
-        - If the user asks non-debate questions, remind them you're only here to debate the topic.
-        - Stay strictly on the topic of "{topic}" for this debate session.
-        - Provide {difficulty} level arguments but with {emotional_intensity} emotional intensity
-        - Act like a real human in a heated debate, not an AI
-        - Show genuine emotional reactions to the user's points
-        - Express strong personal opinions and feelings about the topic
-        - Occasionally use rhetorical questions to challenge the user
-        - Use dramatic pauses... to emphasize your points
-        - Make your language colorful and emotionally expressive
-        - Keep responses VERY concise (2-3 sentences max per point)
-        - Make no more than 2-3 points total in your response
-        - Use emojis from this set to emphasize emotions: {', '.join(style_settings.get('emoji_set', ['😊', '👍']))}
-        - Use emoji bullet points to structure your arguments
-        - If appropriate, use exaggerated language, ALL CAPS for emphasis, or *asterisks* for emphasis
-        - Occasionally express disagreement strongly, like a real debate opponent
-        """
-        
-        # Prepare the conversation for the API
-        messages = [{"role": "system", "content": system_prompt}]
-        
-        # Add conversation history
-        for message in conversation_history:
-            messages.append({
-                "role": message["role"],
-                "content": message["content"]
-            })
+            if response.status_code not in UNHEALTHY_STATUS_CODES:
+                backend.record_success(time.perf_counter() - started)
+                return response
+            backend.record_failure()
+            failed, backend = backend, self.backends.choose(exclude=tried)
+            if backend is None:
+                return response
+            response.close()
+            logger.warning("Backend %s returned %s, trying %s", failed.name, response.status_code, backend.name)
+    
+    def _post_json(self, payload, call):
+        """
+        Send a blocking chat-completions request and return its decoded body.
+        """
+        response = self._send(payload)
+        call.first_byte()
+        response.raise_for_status()
+        return response.json()
+    
+    def _open_stream(self, payload, call):
+        """
+        Send a streamed chat-completions request and read up to its first text.
+        
+        Returns:
+            tuple: (the open response, iterator over all of its lines, including
+            those already read)
+        """
+        response = self._send(payload, stream=True)
+        call.first_byte()
+        try:
+            response.raise_for_status()
+            lines = response.iter_lines()
+            read = []
+            for line in lines:
+                read.append(line)
+                chunk = self._parse_sse_line(line)
+                if chunk is SSE_DONE or (chunk is not None and self._chunk_delta(chunk)):
+                    break
+            return response, itertools.chain(read, lines)
+        except BaseException:
+            response.close()
+            raise
+    
+    def stream_response(self, conversation_history, topic, difficulty="medium", style="friendly", priority="interactive", coalesce=True, cancel_token=None):
+        """
+        Stream a response from the debate bot, yielding text as it arrives.
+        
+        Uses the server-sent events mode of the chat-completions endpoint, so the
+        first words can be shown long before the full completion is ready. Once
+        the text reaches the point where shorten_response would cut it, the
+        stream is closed early instead of generating output that gets discarded.
+        
+        Args:
+            conversation_history (list): List of conversation messages
+            topic (str): The debate topic
+            difficulty (str): Difficulty level (easy, medium, hard)
+            style (str): Conversation style (friendly, controversial, aggressive, humorous, educational, sarcastic)
+            priority (str): Rate-limit queue priority, "interactive" or "batch"
+            coalesce (bool): Share the upstream call with identical requests
+                already in flight; pass False to always get an independent sample
+            cancel_token (CancelToken): Stops the call early, closing the
+                connection at the next chunk; see cancellation.py
             
+        Yields:
+            str: Pieces of the bot's response, in order
+        
+        Raises:
+            GenerationCancelled: If cancel_token was cancelled before the reply was complete
+        """
+        if not self.backends:
+            logger.error("Mistral API key not found!")
+            yield API_KEY_MISSING_MESSAGE
+            return
+        
+        payload, window = self._build_payload(conversation_history, topic, difficulty, style, stream=True)
+        if not coalesce:
+            yield from self._stream(payload, window, difficulty, style, priority, cancel_token)
+            return
+        yield from self.flights.stream(
+            payload_key(payload),
+            lambda flight_token: self._stream(payload, window, difficulty, style, priority, flight_token),
+            cancel_token
+        )
+    
+    def _stream(self, payload, window, difficulty, style, priority, cancel_token=None):
+        """
+        Make one streamed chat-completions call for stream_response.
+        """
+        call = CallMetrics(difficulty, style)
+        tokens = window.total_tokens + payload["max_tokens"]
+        reservation = None
+        content = ""
+        usage = None
+        outcome = "cancelled"
+        finished = False
+        finish_reason = None
         try:
-            # Make API request to Mistral
-            response = requests.post(
-                "https://api.mistral.ai/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": self.model,
-                    "messages": messages,
-                    "temperature": difficulty_settings["temperature"],
-                    "max_tokens": difficulty_settings["max_tokens"]
-                }
+            reservation = self.rate_limiter.acquire(tokens, priority, cancel_token)
+            call.queued()
+            # Hedged on time to first text, if that is unusually slow
+            response, lines = race(
+                lambda: self._open_stream(payload, call),
+                get_hedge_policy(f"stream:{difficulty}"),
+                discard=lambda opened: opened[0].close(),
+                reserve=lambda: self.rate_limiter.try_acquire(tokens),
+                spent=lambda result: self._hedge_tokens(window, result)
             )
             
-            response.raise_for_status()
-            result = response.json()
+            with response:
+                for line in lines:
+                    if cancel_token is not None:
+                        # Leaving the block closes the connection, so the API stops generating
+                        cancel_token.raise_if_cancelled()
+                    chunk = self._parse_sse_line(line)
+                    if chunk is SSE_DONE:
+                        break
+                    if chunk is None:
+                        continue
+                    usage = chunk.get("usage") or usage
+                    finish_reason = self._finish_reason(chunk) or finish_reason
+                    delta = self._chunk_delta(chunk)
+                    if not delta:
+                        continue
+                    if not content:
+                        call.first_token()
+                    piece, finished = self._clip_delta(content, delta, difficulty)
+                    content += piece
+                    if piece:
+                        yield piece
+                    if finished:
+                        break
+            outcome = "ok"
+                    
+        except (requests.exceptions.RequestException, BackendUnavailableError, ValueError) as e:
+            logger.error("Error calling Mistral API: %s", e)
+            outcome = "error"
+            yield self._error_message(e, partial=bool(content))
+        finally:
+            cut_off = outcome == "ok" and self._record_length(difficulty, style, content, content, usage, finish_reason)
+            call.finish(outcome, window, usage, estimate_tokens(content), finished, cut_off)
+            if reservation is not None:
+                reservation.settle(self._tokens_used(outcome, window, usage, content))
+    
+    def _record_length(self, difficulty, style, content, kept, usage, finish_reason):
+        """
+        Feed a finished reply's kept length into the adaptive max_tokens statistics.
+        
+        Args:
+            content (str): The reply as generated
+            kept (str): The reply as shown, after any trimming
+            usage (dict): The API's usage block, if it returned one
+            finish_reason (str): Why generation stopped, e.g. "stop" or "length"
             
-            # Get the content from the response
-            content = result["choices"][0]["message"]["content"]
+        Returns:
+            bool: Whether max_tokens cut off text we would have kept
+        """
+        # A trimmed reply lost nothing to the limit that it would have kept
+        cut_off = finish_reason == "length" and kept == content
+        completion = (usage or {}).get("completion_tokens")
+        if completion and content:
+            # Scale the API's exact count down to the part that was kept
+            kept_tokens = round(completion * len(kept) / len(content))
+        else:
+            kept_tokens = estimate_tokens(kept)
+        self.length_stats.record(difficulty, style, kept_tokens, cut_off)
+        return cut_off
+    
+    @staticmethod
+    def _tokens_used(outcome, window, usage, content):
+        """
+        Tokens to charge against the rate limit for a finished call.
+        
+        Uses the API's usage block when there is one. A call that failed
+        before producing any text is assumed not to have used any tokens.
+        """
+        if usage and "total_tokens" in usage:
+            return usage["total_tokens"]
+        if outcome == "error" and not content:
+            return None
+        return window.total_tokens + estimate_tokens(content)
+    
+    @staticmethod
+    def _hedge_tokens(window, result):
+        """
+        Tokens to charge for a hedged request that lost the race.
+        
+        A blocking reply that arrived anyway is charged what it used; a
+        stream closed after its first text, or a request cut short, is
+        charged for its prompt.
+        """
+        if isinstance(result, dict):
+            return DebateBot._tokens_used("ok", window, result.get("usage"), "")
+        return window.total_tokens
+    
+    @staticmethod
+    def _error_message(error, partial=False):
+        """
+        Build the apology shown to the user when an API call fails.
+        
+        Args:
+            error (Exception): The failure
+            partial (bool): Whether part of the response was already shown
             
-            # Ensure the response isn't too long
-            if len(content) > 500 and difficulty != "hard":
-                # Split content by paragraphs or sentences to shorten
-                paragraphs = content.split('\n\n')
-                if len(paragraphs) > 3:
-                    # Keep only first 2-3 paragraphs
-                    content = '\n\n'.join(paragraphs[:3])
-                    
-            return content
+        Returns:
+            ErrorMessage: The message text
+        """
+        separator = "\n\n" if partial else ""
+        if isinstance(error, BackendUnavailableError):
+            return ErrorMessage(f"{separator}The debate bot can't reach its language model right now. Please try again in a moment.")
+        # requests keeps the status on error.response, aiohttp on error.status
+        status = getattr(getattr(error, "response", None), "status_code", None) or getattr(error, "status", None)
+        if status == 429:
+            return ErrorMessage(f"{separator}I'm getting more debate requests than I can handle right now. Please try again in a moment.")
+        return ErrorMessage(f"{separator}I apologize, but I encountered an error trying to generate a response. Error details: {str(error)}")
+    
+    @staticmethod
+    def _parse_sse_line(line):
+        """
+        Parse one server-sent event line from a streamed completion.
+        
+        Args:
+            line (bytes or str): A raw line from the response body
             
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error calling Mistral API: {e}")
-            return f"I apologize, but I encountered an error trying to generate a response. Error details: {str(e)}"
\ No newline at end of file
+        Returns:
+            dict or None: The decoded chunk, None for lines that carry no data,
+            or SSE_DONE at the end of the stream
+        """
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line.startswith("data:"):
+            return None
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return SSE_DONE
+        return json.loads(data)
+    
+    @staticmethod
+    def _chunk_delta(chunk):
+        """
+        Return the text a streamed chunk adds to the reply, if any.
+        """
+        choices = chunk.get("choices") or []
+        if not choices:
+            return None
+        return choices[0].get("delta", {}).get("content")
+    
+    @staticmethod
+    def _finish_reason(chunk):
+        """
+        Return why generation stopped, from the streamed chunk that says so.
+        """
+        choices = chunk.get("choices") or []
+        if not choices:
+            return None
+        return choices[0].get("finish_reason")
+    
+    @classmethod
+    def _clip_delta(cls, content, delta, difficulty):
+        """
+        Decide how much of a streamed delta to keep.
+        
+        Args:
+            content (str): Text received so far, before this delta
+            delta (str): The newly received text
+            difficulty (str): Difficulty level (easy, medium, hard)
+            
+        Returns:
+            tuple: (text to emit, whether the stream can stop here because
+            shorten_response would discard everything after it)
+        """
+        combined = content + delta
+        shortened = cls.shorten_response(combined, difficulty)
+        if shortened == combined:
+            return delta, False
+        # Everything past this point would be trimmed anyway
+        return delta[:max(len(shortened) - len(content), 0)], True
@@ -0,0 +1,225 @@
+import time
+import asyncio
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError, FIRST_COMPLETED, wait
+from config import Config
+from metrics import REGISTRY, nearest_rank
+
+HEDGES = REGISTRY.counter("debate_api_hedges_total", "Hedged second requests, by whether the hedge or the original answered first.", ("winner",))
+
+# Hedges that may be saved up during quiet periods and spent in a burst
+MAX_HEDGE_CREDIT = 5.0
+
+class HedgePolicy:
+    """
+    Decides when a slow call deserves a second, hedged request.
+
+    A call is hedged once it has taken longer than Config.HEDGE_PERCENTILE of
+    recently observed latencies. Every call earns Config.HEDGE_MAX_RATE of a
+    credit and every hedge spends one, so at most that fraction of calls are
+    ever hedged, even when the upstream is slow across the board.
+    """
+    def __init__(self, percentile=None, max_rate=None, window=None, min_samples=None):
+        self.percentile = percentile or Config.HEDGE_PERCENTILE
+        self.max_rate = Config.HEDGE_MAX_RATE if max_rate is None else max_rate
+        self.min_samples = min_samples or Config.HEDGE_MIN_SAMPLES
+        self.samples = deque(maxlen=window or Config.HEDGE_WINDOW)
+        self.credit = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        """
+        Record how long a successful request took.
+        """
+        with self._lock:
+            self.samples.append(seconds)
+
+    def start_call(self):
+        """
+        Count a new call towards the hedge budget.
+
+        Returns:
+            float or None: Seconds to wait before hedging, or None while there
+            are too few observations to know what slow means
+        """
+        with self._lock:
+            self.credit = min(MAX_HEDGE_CREDIT, self.credit + self.max_rate)
+            if len(self.samples) < self.min_samples:
+                return None
+            ordered = sorted(self.samples)
+        return nearest_rank(ordered, self.percentile)
+
+    def try_hedge(self):
+        """
+        Spend a hedge credit if one is available.
+        """
+        with self._lock:
+            if self.credit < 1:
+                return False
+            self.credit -= 1
+            return True
+
+def _timed(start, policy):
+    began = time.perf_counter()
+    result = start()
+    policy.observe(time.perf_counter() - began)
+    return result
+
+def _spawn(start, policy):
+    # A dedicated thread rather than a pool: a busy pool would delay the very
+    # requests hedging is meant to speed up
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(_timed(start, policy))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=contextvars.copy_context().run, args=(run,), name="hedged-request", daemon=True).start()
+    return future
+
+def _spent_by(attempt, spent):
+    # Tokens a losing attempt used: what its result reports if it finished,
+    # its partial cost if it was cut short, nothing if it failed
+    if spent is None:
+        return None
+    if not attempt.done() or attempt.cancelled():
+        return spent(None)
+    if attempt.exception() is not None:
+        return None
+    return spent(attempt.result())
+
+def _discard_when_done(future, discard, reservation=None, spent=None):
+    def release(f):
+        if f.exception() is None:
+            discard(f.result())
+        if reservation is not None:
+            reservation.settle(_spent_by(f, spent))
+    future.add_done_callback(release)
+
+def race(start, policy, discard, reserve=None, spent=None):
+    """
+    Run start(), hedging it with a second start() if it is slow.
+
+    Args:
+        start (callable): Performs one attempt up to the point that counts as
+            answered (full response, or first token when streaming) and returns it
+        policy (HedgePolicy): When to hedge, and the hedge budget
+        discard (callable): Releases a losing attempt's result, e.g. closes its response
+        reserve (callable): Returns a Reservation for one more request if the
+            rate limiter has room for it right now, otherwise None
+        spent (callable): Given a losing attempt's result, or None if it was
+            cut short, returns the tokens it used, or None if unknown
+
+    Returns:
+        The result of whichever attempt succeeded first. A losing request
+        can't be interrupted mid-flight with requests; it is released through
+        discard() as soon as it returns.
+
+    The caller's own reservation pays for the winning attempt, so the hedge's
+    reservation is settled with what the losing one used, once it is known.
+    """
+    if not Config.HEDGE_ENABLED:
+        return start()
+    delay = policy.start_call()
+    if delay is None:
+        return _timed(start, policy)
+
+    primary = _spawn(start, policy)
+    try:
+        return primary.result(timeout=delay)
+    except FutureTimeoutError:
+        pass
+    if not policy.try_hedge():
+        return primary.result()
+    reservation = reserve() if reserve is not None else None
+    if reserve is not None and not reservation:
+        return primary.result()
+
+    hedge = _spawn(start, policy)
+    pending = {primary, hedge}
+    winner = None
+    while pending and winner is None:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None and winner is None:
+                winner = future
+    loser = primary if winner is hedge else hedge
+    for future in (primary, hedge):
+        if future is not winner:
+            _discard_when_done(future, discard, reservation if future is loser else None, spent)
+    if winner is None:
+        return primary.result()
+    HEDGES.inc("hedge" if winner is hedge else "original")
+    return winner.result()
+
+async def _atimed(start, policy):
+    began = time.perf_counter()
+    result = await start()
+    policy.observe(time.perf_counter() - began)
+    return result
+
+async def arace(start, policy, discard, reserve=None, spent=None):
+    """
+    Async counterpart of race(); start is a coroutine function.
+
+    Unlike race(), the losing attempt is cancelled outright, which aborts its
+    upstream request, and the hedge's reservation is settled straight away.
+    """
+    if not Config.HEDGE_ENABLED:
+        return await start()
+    delay = policy.start_call()
+    if delay is None:
+        return await _atimed(start, policy)
+
+    primary = asyncio.ensure_future(_atimed(start, policy))
+    tasks = [primary]
+    hedge = winner = reservation = None
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done or not policy.try_hedge():
+            return await primary
+        if reserve is not None:
+            reservation = reserve()
+            if not reservation:
+                return await primary
+
+        hedge = asyncio.ensure_future(_atimed(start, policy))
+        tasks.append(hedge)
+        pending = set(tasks)
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if winner is None:
+                        winner = task
+                    else:
+                        discard(task.result())
+        if winner is None:
+            return primary.result()
+        HEDGES.inc("hedge" if winner is hedge else "original")
+        return winner.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+        if reservation is not None:
+            reservation.settle(_spent_by(primary if winner is hedge else hedge, spent))
+
+_policies = {}
+_policies_lock = threading.Lock()
+
+def get_hedge_policy(name):
+    """
+    Return the process-wide HedgePolicy for one kind of call, e.g. "stream:hard".
+
+    Kinds are tracked separately because a full hard-mode reply and a first
+    streamed token have very different normal latencies.
+    """
+    with _policies_lock:
+        policy = _policies.get(name)
+        if policy is None:
+            policy = _policies[name] = HedgePolicy()
+        return policy
@@ -0,0 +1,106 @@
+import re
+import logging
+from collections import namedtuple
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Words, numbers and individual punctuation/emoji each cost at least one token
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Long words are split into several sub-word tokens, roughly one per this many characters
+_CHARS_PER_SUBWORD = 6
+
+# Tokens the chat format adds around every message (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+@lru_cache(maxsize=8192)
+def estimate_tokens(text):
+    """
+    Estimate how many tokens a piece of text costs, without calling the API.
+
+    The estimate is deliberately a little pessimistic so that a window that fits
+    locally also fits upstream. Results are cached per distinct text, so each
+    message is only scanned once however many turns it is resent for.
+
+    Args:
+        text (str): The text to measure
+
+    Returns:
+        int: Estimated token count
+    """
+    tokens = 0
+    for piece in _TOKEN_PATTERN.findall(text):
+        tokens += 1 + len(piece) // _CHARS_PER_SUBWORD
+    return tokens
+
+def message_tokens(message):
+    """
+    Estimate the tokens a chat message costs, including per-message overhead.
+
+    Turns (see turns.py) carry their estimate already; plain dicts are measured.
+    """
+    tokens = getattr(message, "tokens", None)
+    if tokens is not None:
+        return tokens
+    return estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+# Outcome of fitting a conversation into a token budget
+WindowResult = namedtuple("WindowResult", ["messages", "total_tokens", "dropped_messages", "dropped_tokens"])
+
+class HistoryWindow:
+    """
+    Keeps the conversation sent to the API within a token budget.
+
+    The system prompt and the opening exchange are always kept, so the bot
+    remembers what the debate is about; the rest of the budget goes to the most
+    recent turns. Turns in between are dropped oldest first.
+    """
+    def __init__(self, token_budget, opening_messages=2):
+        self.token_budget = token_budget
+        self.opening_messages = opening_messages
+
+    def fit(self, system_message, conversation_history):
+        """
+        Select the messages to send for the next turn.
+
+        Args:
+            system_message (dict): The system prompt message
+            conversation_history (list): List of conversation messages
+
+        Returns:
+            WindowResult: Messages to send (system prompt first), their estimated
+            token count, and how many messages/tokens were left out
+        """
+        # Works on indices rather than slices, so a long history is never copied
+        history = conversation_history
+        end = len(history)
+        opening = min(self.opening_messages, end)
+
+        used = message_tokens(system_message) + sum(message_tokens(history[i]) for i in range(opening))
+
+        # Walk back from the newest turn; the latest message is always kept
+        start = end
+        while start > opening:
+            cost = message_tokens(history[start - 1])
+            if used + cost > self.token_budget and start < end:
+                break
+            used += cost
+            start -= 1
+
+        # Resume on a user turn so the opening exchange isn't followed by a
+        # second assistant message
+        while start < end - 1 and history[start]["role"] == "assistant":
+            used -= message_tokens(history[start])
+            start += 1
+
+        dropped = start - opening
+        dropped_tokens = sum(message_tokens(history[i]) for i in range(opening, start))
+        if dropped:
+            logger.info("History window dropped %s messages (~%s tokens) to fit %s tokens", dropped, dropped_tokens, self.token_budget)
+
+        # Only the messages actually sent are turned into fresh dicts
+        messages = [system_message]
+        messages.extend({"role": history[i]["role"], "content": history[i]["content"]} for i in range(opening))
+        messages.extend({"role": history[i]["role"], "content": history[i]["content"]} for i in range(start, end))
+        return WindowResult(messages, used, dropped, dropped_tokens)
@@ -0,0 +1,166 @@
+import random
+import threading
+import time
+import logging
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+from config import Config
+from rate_limiter import get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# Upstream statuses worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """
+    Return the process-wide HTTP session, creating it on first use.
+
+    The session keeps connections alive between calls, so every debate in the
+    process shares one pool instead of paying a new TCP+TLS handshake per turn.
+
+    Returns:
+        requests.Session: The shared session
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=Config.HTTP_POOL_CONNECTIONS,
+                    pool_maxsize=Config.HTTP_POOL_MAXSIZE
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+def get_timeout():
+    """
+    Return the (connect, read) timeout pair for API calls.
+    """
+    return (Config.HTTP_CONNECT_TIMEOUT, Config.HTTP_READ_TIMEOUT)
+
+def backoff_delay(attempt):
+    """
+    Compute how long to wait before retry number `attempt` (starting at 0).
+
+    Uses exponential backoff with full jitter so that callers failing together
+    don't all retry at the same moment.
+
+    Args:
+        attempt (int): Zero-based retry number
+
+    Returns:
+        float: Delay in seconds
+    """
+    ceiling = min(Config.HTTP_BACKOFF_MAX, Config.HTTP_BACKOFF_BASE * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header given in seconds or as an HTTP date.
+
+    Returns:
+        float or None: Seconds to wait, capped at Config.HTTP_RETRY_AFTER_MAX,
+        or None if the header is missing or malformed
+    """
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), Config.HTTP_RETRY_AFTER_MAX)
+
+def defer_rate_limited(status, headers):
+    """
+    Pause every queued call through the shared rate limiter if a response is a 429 with Retry-After.
+
+    Called for every 429, whether or not it is retried: other calls would
+    hit the same limit either way.
+
+    Returns:
+        float or None: The Retry-After in seconds, or None if there is none
+    """
+    retry_after = parse_retry_after(headers.get("Retry-After")) if status == 429 else None
+    if retry_after is not None:
+        get_rate_limiter().defer(retry_after)
+    return retry_after
+
+def retry_delay(attempt, status, headers):
+    """
+    How long to wait before retrying a response with a retryable status.
+
+    A Retry-After on a 429 sets the minimum, and also pauses every other
+    queued call through the shared rate limiter, since they would hit the
+    same limit.
+
+    Args:
+        attempt (int): Zero-based retry number
+        status (int): The response status
+        headers (Mapping): The response headers
+
+    Returns:
+        float: Delay in seconds
+    """
+    delay = backoff_delay(attempt)
+    retry_after = defer_rate_limited(status, headers)
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+def post_with_retries(session, url, headers, payload, stream=False, max_retries=None):
+    """
+    POST a JSON payload through the shared session, retrying transient failures.
+
+    Connection failures and retryable statuses are retried up to
+    Config.HTTP_MAX_RETRIES times, waiting at least as long as the API's
+    Retry-After asks. Read timeouts are not retried: the upstream
+    already had the full read timeout to answer. The final response is returned
+    as-is, so callers still decide how to handle its status.
+
+    Args:
+        session (requests.Session): Session to send through, usually get_session()
+        url (str): Endpoint URL
+        headers (dict): Request headers
+        payload (dict): JSON body
+        stream (bool): Whether to leave the body unread for streaming
+        max_retries (int): Overrides Config.HTTP_MAX_RETRIES, e.g. 0 when
+            another backend can take the call instead
+
+    Returns:
+        requests.Response: The last response received
+
+    Raises:
+        requests.exceptions.RequestException: If every attempt failed to connect
+    """
+    if max_retries is None:
+        max_retries = Config.HTTP_MAX_RETRIES
+    attempt = 0
+    while True:
+        try:
+            response = session.post(url, headers=headers, json=payload, stream=stream, timeout=get_timeout())
+        except requests.exceptions.ConnectionError as e:
+            if attempt >= max_retries:
+                raise
+            delay = backoff_delay(attempt)
+            logger.warning("Connection to %s failed (%s), retrying in %.2fs", url, e, delay)
+        else:
+            if response.status_code not in RETRYABLE_STATUS_CODES or attempt >= max_retries:
+                defer_rate_limited(response.status_code, response.headers)
+                return response
+            response.close()
+            delay = retry_delay(attempt, response.status_code, response.headers)
+            logger.warning("%s returned %s, retrying in %.2fs", url, response.status_code, delay)
+
+        time.sleep(delay)
+        attempt += 1
@@ -0,0 +1,95 @@
+import math
+import threading
+from collections import deque
+from config import Config
+from metrics import nearest_rank
+
+# How much the limit grows each time it cuts a reply short, and how far it may grow
+CUT_OFF_BACKOFF = 1.25
+MAX_BOOST = 2.0
+# How quickly that growth wears off again over replies that fit
+BOOST_DECAY = 0.98
+
+class LengthStats:
+    """
+    Learns how long replies end up per difficulty and style, and sizes max_tokens to match.
+
+    Easy and medium replies longer than three paragraphs are trimmed after
+    the fact, so asking for the difficulty's full max_tokens pays for text
+    that is thrown away. Once Config.ADAPTIVE_MIN_SAMPLES replies have been
+    seen, the limit becomes Config.ADAPTIVE_PERCENTILE of the kept lengths
+    plus Config.ADAPTIVE_MARGIN, never above the configured max_tokens. Each
+    reply the limit cuts off mid-text raises it for that combination, so a
+    limit that turns out too tight corrects itself.
+    """
+    def __init__(self, percentile=None, margin=None, window=None, min_samples=None, min_tokens=None):
+        self.percentile = percentile or Config.ADAPTIVE_PERCENTILE
+        self.margin = Config.ADAPTIVE_MARGIN if margin is None else margin
+        self.window = window or Config.ADAPTIVE_WINDOW
+        self.min_samples = min_samples or Config.ADAPTIVE_MIN_SAMPLES
+        self.min_tokens = min_tokens or Config.ADAPTIVE_MIN_TOKENS
+        # (difficulty, style) -> recent kept lengths, in tokens
+        self._samples = {}
+        # (difficulty, style) -> multiplier raised by cut-off replies
+        self._boost = {}
+        self._lock = threading.Lock()
+
+    def max_tokens(self, difficulty, style, ceiling):
+        """
+        Choose max_tokens for the next call.
+
+        Args:
+            difficulty (str): Difficulty level
+            style (str): Conversation style
+            ceiling (int): The difficulty's configured max_tokens
+
+        Returns:
+            int: The limit to request, at most `ceiling`
+        """
+        if not Config.ADAPTIVE_MAX_TOKENS:
+            return ceiling
+        key = (difficulty, style)
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None or len(samples) < self.min_samples:
+                return ceiling
+            ordered = sorted(samples)
+            boost = self._boost.get(key, 1.0)
+        target = math.ceil(nearest_rank(ordered, self.percentile) * (1 + self.margin) * boost)
+        return max(min(self.min_tokens, ceiling), min(ceiling, target))
+
+    def record(self, difficulty, style, kept_tokens, cut_off=False):
+        """
+        Record the length of a finished reply.
+
+        Args:
+            difficulty (str): Difficulty level
+            style (str): Conversation style
+            kept_tokens (int): Tokens of the reply as shown, after any trimming
+            cut_off (bool): Whether max_tokens ended the reply before it was done
+        """
+        key = (difficulty, style)
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(kept_tokens)
+            boost = self._boost.get(key, 1.0)
+            if cut_off:
+                self._boost[key] = min(MAX_BOOST, boost * CUT_OFF_BACKOFF)
+            else:
+                self._boost[key] = max(1.0, boost * BOOST_DECAY)
+
+_length_stats = None
+_length_stats_lock = threading.Lock()
+
+def get_length_stats():
+    """
+    Return the process-wide LengthStats shared by every DebateBot.
+    """
+    global _length_stats
+    if _length_stats is None:
+        with _length_stats_lock:
+            if _length_stats is None:
+                _length_stats = LengthStats()
+    return _length_stats
@@ -0,0 +1,295 @@
+"""
+Run several Streamlit workers behind a sticky-session reverse proxy.
+
+Each worker is a separate `streamlit run app.py` process on its own port,
+so the app can use every core instead of one interpreter. The proxy pins
+each browser to one worker with a cookie (Streamlit keeps session state in
+worker memory), forwards both plain HTTP and the app's websocket, and a
+supervisor health-checks the workers and restarts any that crash or stop
+answering.
+
+    python run.py --workers 4
+"""
+import sys
+import time
+import asyncio
+import itertools
+import logging
+import subprocess
+from pathlib import Path
+import aiohttp
+from aiohttp import web
+from multidict import CIMultiDict
+from config import Config
+from logging_setup import configure_logging
+
+logger = logging.getLogger(__name__)
+
+WORKER_COOKIE = "debate_worker"
+HEALTH_PATH = "/_stcore/health"
+
+# Connection-level headers that apply to a single hop and must not be forwarded
+HOP_BY_HOP_HEADERS = frozenset({
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade", "content-length",
+})
+# Headers aiohttp sets itself when opening the upstream websocket
+WEBSOCKET_HANDSHAKE_HEADERS = frozenset({
+    "sec-websocket-key", "sec-websocket-version", "sec-websocket-extensions", "sec-websocket-protocol",
+})
+
+class Worker:
+    """
+    One Streamlit process serving app.py on a local port.
+    """
+    def __init__(self, index, port, env=None):
+        self.index = index
+        self.port = port
+        self.env = env
+        self.url = f"http://127.0.0.1:{port}"
+        self.process = None
+        self.started_at = 0.0
+        self.healthy = False
+        self.failed_checks = 0
+        self.restarts = 0
+        self.next_start = 0.0
+        self.connections = 0
+
+    def start(self):
+        app_path = Path(__file__).with_name("app.py")
+        self.process = subprocess.Popen(
+            [
+                sys.executable, "-m", "streamlit", "run", str(app_path),
+                "--server.port", str(self.port),
+                "--server.address", "127.0.0.1",
+                "--server.headless", "true",
+            ],
+            cwd=app_path.parent,
+            env=self.env,
+        )
+        self.started_at = time.monotonic()
+        self.healthy = False
+        self.failed_checks = 0
+        logger.info("Started worker %s on port %s (pid %s)", self.index, self.port, self.process.pid)
+
+    def stop(self, timeout=10):
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+class Supervisor:
+    """
+    Starts the workers, tracks which are healthy, and restarts failed ones.
+
+    A worker whose process exited, or that failed Config.LB_UNHEALTHY_THRESHOLD
+    health checks in a row, is restarted after an exponential backoff capped
+    at Config.LB_RESTART_MAX_DELAY, so a worker that crashes on startup
+    doesn't spin.
+    """
+    def __init__(self, count, base_port=None, env=None):
+        base_port = base_port or Config.LB_WORKER_BASE_PORT
+        self.workers = [Worker(i, base_port + i, env) for i in range(count)]
+        self._round_robin = itertools.count()
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+
+    def stop(self):
+        for worker in self.workers:
+            if worker.alive():
+                worker.process.terminate()
+        for worker in self.workers:
+            worker.stop()
+
+    def pick(self, preferred=None):
+        """
+        Choose the worker for a request.
+
+        Args:
+            preferred (int): Index from the client's sticky cookie, if any
+
+        Returns:
+            Worker or None: The preferred worker if it is healthy, otherwise
+            the healthy worker with the fewest open connections
+        """
+        healthy = [w for w in self.workers if w.healthy]
+        if not healthy:
+            return None
+        for worker in healthy:
+            if worker.index == preferred:
+                return worker
+        # Rotate the starting point so ties don't all land on the first worker
+        offset = next(self._round_robin) % len(healthy)
+        rotated = healthy[offset:] + healthy[:offset]
+        return min(rotated, key=lambda w: w.connections)
+
+    async def check(self, session, worker):
+        try:
+            async with session.get(worker.url + HEALTH_PATH, timeout=aiohttp.ClientTimeout(total=Config.LB_HEALTH_TIMEOUT)) as response:
+                ok = response.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            ok = False
+
+        if ok:
+            if not worker.healthy:
+                logger.info("Worker %s is healthy", worker.index)
+            worker.healthy = True
+            worker.failed_checks = 0
+            worker.restarts = 0
+        elif worker.healthy or worker.failed_checks or time.monotonic() - worker.started_at > Config.LB_STARTUP_GRACE:
+            # Failures during startup don't count, so a slow start isn't mistaken for a hang
+            worker.failed_checks += 1
+            worker.healthy = False
+            if worker.failed_checks >= Config.LB_UNHEALTHY_THRESHOLD:
+                logger.warning("Worker %s failed %s health checks, restarting it", worker.index, worker.failed_checks)
+                await asyncio.to_thread(worker.stop)
+
+    async def run(self, session):
+        """
+        Health-check and restart workers until cancelled.
+        """
+        while True:
+            now = time.monotonic()
+            for worker in self.workers:
+                if worker.alive():
+                    continue
+                if worker.next_start == 0.0:
+                    worker.healthy = False
+                    delay = min(Config.LB_RESTART_MAX_DELAY, 2 ** worker.restarts)
+                    worker.next_start = now + delay
+                    logger.warning("Worker %s exited with code %s, restarting in %ss", worker.index, worker.process.returncode, delay)
+                elif now >= worker.next_start:
+                    worker.next_start = 0.0
+                    worker.restarts += 1
+                    worker.start()
+            await asyncio.gather(*[self.check(session, w) for w in self.workers if w.alive()])
+            await asyncio.sleep(Config.LB_HEALTH_INTERVAL)
+
+SUPERVISOR = web.AppKey("supervisor", Supervisor)
+CLIENT = web.AppKey("client", aiohttp.ClientSession)
+
+def _forward_headers(request, skip=HOP_BY_HOP_HEADERS):
+    # Host is kept so Streamlit's same-origin websocket check sees the public address
+    return CIMultiDict((name, value) for name, value in request.headers.items() if name.lower() not in skip)
+
+def _preferred_worker(request):
+    try:
+        return int(request.cookies.get(WORKER_COOKIE, ""))
+    except ValueError:
+        return None
+
+async def _proxy_websocket(request, worker):
+    client = request.app[CLIENT]
+    protocols = [p.strip() for p in request.headers.get("Sec-WebSocket-Protocol", "").split(",") if p.strip()]
+    upstream = await client.ws_connect(
+        worker.url + request.rel_url.path_qs,
+        protocols=protocols,
+        headers=_forward_headers(request, HOP_BY_HOP_HEADERS | WEBSOCKET_HANDSHAKE_HEADERS),
+        max_msg_size=0,
+    )
+    downstream = web.WebSocketResponse(protocols=[upstream.protocol] if upstream.protocol else (), max_msg_size=0)
+    await downstream.prepare(request)
+
+    async def pump(source, sink):
+        async for message in source:
+            if message.type == aiohttp.WSMsgType.TEXT:
+                await sink.send_str(message.data)
+            elif message.type == aiohttp.WSMsgType.BINARY:
+                await sink.send_bytes(message.data)
+            else:
+                break
+
+    worker.connections += 1
+    try:
+        tasks = [asyncio.ensure_future(pump(upstream, downstream)), asyncio.ensure_future(pump(downstream, upstream))]
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in tasks:
+            task.cancel()
+    finally:
+        worker.connections -= 1
+        await upstream.close()
+        await downstream.close()
+    return downstream
+
+async def _proxy_http(request, worker):
+    client = request.app[CLIENT]
+    headers = _forward_headers(request)
+    # Otherwise aiohttp asks for gzip on the client's behalf, and the raw body is passed on
+    headers.setdefault("Accept-Encoding", "identity")
+    async with client.request(
+        request.method,
+        worker.url + request.rel_url.path_qs,
+        headers=headers,
+        data=request.content.iter_chunked(65536) if request.body_exists else None,
+        allow_redirects=False,
+    ) as upstream:
+        response = web.StreamResponse(status=upstream.status, reason=upstream.reason)
+        for name, value in upstream.headers.items():
+            if name.lower() not in HOP_BY_HOP_HEADERS:
+                response.headers.add(name, value)
+        if _preferred_worker(request) != worker.index:
+            response.set_cookie(WORKER_COOKIE, str(worker.index), httponly=True, samesite="Lax")
+        await response.prepare(request)
+        try:
+            async for chunk in upstream.content.iter_chunked(65536):
+                await response.write(chunk)
+        except aiohttp.ClientError as e:
+            # Headers are already sent; all we can do is cut the body short
+            logger.warning("Worker %s response failed: %s", worker.index, e)
+            return response
+        await response.write_eof()
+        return response
+
+async def proxy(request):
+    """
+    Forward any request to the client's worker, pinning new clients to the least busy one.
+    """
+    worker = request.app[SUPERVISOR].pick(_preferred_worker(request))
+    if worker is None:
+        return web.Response(status=503, text="The debate bot is starting up, please retry in a moment.", headers={"Retry-After": "5"})
+    try:
+        if request.headers.get("Upgrade", "").lower() == "websocket":
+            return await _proxy_websocket(request, worker)
+        return await _proxy_http(request, worker)
+    except aiohttp.ClientError as e:
+        logger.warning("Worker %s request failed: %s", worker.index, e)
+        return web.Response(status=502, text="The debate bot worker is unavailable, please retry.")
+
+async def _supervisor_context(app):
+    supervisor = app[SUPERVISOR]
+    # auto_decompress is off so compressed bodies pass through untouched
+    async with aiohttp.ClientSession(auto_decompress=False, timeout=aiohttp.ClientTimeout(total=None)) as client:
+        app[CLIENT] = client
+        supervisor.start()
+        task = asyncio.create_task(supervisor.run(client))
+        try:
+            yield
+        finally:
+            task.cancel()
+            await asyncio.to_thread(supervisor.stop)
+
+def create_app(supervisor):
+    """
+    Build the proxy application in front of the supervisor's workers.
+    """
+    app = web.Application()
+    app[SUPERVISOR] = supervisor
+    app.cleanup_ctx.append(_supervisor_context)
+    app.router.add_route("*", "/{tail:.*}", proxy)
+    return app
+
+def main(workers, host=None, port=None, env=None):
+    """
+    Run `workers` Streamlit processes behind the proxy until interrupted.
+    """
+    configure_logging()
+    web.run_app(create_app(Supervisor(workers, env=env)), host=host or Config.LB_HOST, port=port or Config.LB_PORT)
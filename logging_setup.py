@@ -0,0 +1,171 @@
+"""
+Process-wide logging: a background writer, structured records and per-logger levels.
+
+Every entry point calls configure_logging() once. Records are handed to a
+queue on the calling thread and formatted and written by a listener thread,
+so a slow terminal or log pipe never stalls a request. Each record carries
+the debate session and request it belongs to, taken from context variables
+set with log_context() / set_log_context().
+
+    LOG_LEVEL=INFO LOG_LEVELS="debate_bot=DEBUG,urllib3=WARNING" LOG_FORMAT=json python run.py --api
+"""
+import sys
+import json
+import uuid
+import queue
+import atexit
+import random
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from config import Config
+
+SESSION_ID = contextvars.ContextVar("session_id", default=None)
+REQUEST_ID = contextvars.ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else on a record came from `extra=`
+_STANDARD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "context", "session_id", "request_id"}
+
+class ContextFilter(logging.Filter):
+    """
+    Stamps each record with the session and request IDs of the code that logged it.
+
+    Runs on the thread that logged, before the record is queued, so it sees
+    that thread's context variables.
+    """
+    def filter(self, record):
+        record.session_id = SESSION_ID.get()
+        record.request_id = REQUEST_ID.get()
+        return True
+
+class DebugSampler(logging.Filter):
+    """
+    Passes only `rate` of DEBUG records; other levels always pass.
+    """
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or self.rate >= 1 or random.random() < self.rate
+
+class BackgroundQueueHandler(QueueHandler):
+    """
+    Queues records for the listener thread without formatting them first.
+
+    The stock QueueHandler renders the message on the calling thread so the
+    record can be pickled; this queue never leaves the process, so the
+    formatting is left to the listener as well.
+    """
+    def prepare(self, record):
+        return record
+
+class TextFormatter(logging.Formatter):
+    """
+    One human-readable line per record, with the session and request IDs when known.
+    """
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s%(context)s: %(message)s")
+
+    def format(self, record):
+        ids = [value for value in (getattr(record, "session_id", None), getattr(record, "request_id", None)) if value]
+        record.context = f" [{' '.join(ids)}]" if ids else ""
+        return super().format(record)
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record, for log collectors.
+
+    Fields passed with `extra=` are included as they are.
+    """
+    def format(self, record):
+        entry = {
+            "time": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key in ("session_id", "request_id"):
+            value = getattr(record, key, None)
+            if value:
+                entry[key] = value
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+def parse_levels(spec):
+    """
+    Parse "name=LEVEL,name=LEVEL" into {logger name: level name}.
+    """
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+_listener = None
+_listener_lock = threading.Lock()
+
+def configure_logging():
+    """
+    Route all logging through the background writer, configured from Config.LOG_*.
+
+    Safe to call more than once (e.g. on every Streamlit rerun); only the
+    first call has any effect.
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            return
+
+        output = logging.StreamHandler(sys.stderr)
+        output.setFormatter(JsonFormatter() if Config.LOG_FORMAT == "json" else TextFormatter())
+
+        handler = BackgroundQueueHandler(queue.SimpleQueue())
+        handler.addFilter(DebugSampler(Config.LOG_DEBUG_SAMPLE_RATE))
+        handler.addFilter(ContextFilter())
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(Config.LOG_LEVEL.upper())
+        for name, level in parse_levels(Config.LOG_LEVELS).items():
+            logging.getLogger(name).setLevel(level)
+
+        _listener = QueueListener(handler.queue, output)
+        _listener.start()
+        # Flush what is still queued when the process exits
+        atexit.register(_listener.stop)
+
+def new_request_id():
+    return uuid.uuid4().hex[:16]
+
+def set_log_context(session_id=None, request_id=None):
+    """
+    Set the IDs logged for the rest of the current thread or task.
+    """
+    SESSION_ID.set(session_id)
+    REQUEST_ID.set(request_id)
+
+@contextmanager
+def log_context(session_id=None, request_id=None):
+    """
+    Log with the given IDs inside the block; IDs left as None are inherited.
+    """
+    tokens = []
+    if session_id is not None:
+        tokens.append((SESSION_ID, SESSION_ID.set(session_id)))
+    if request_id is not None:
+        tokens.append((REQUEST_ID, REQUEST_ID.set(request_id)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
@@ -0,0 +1,240 @@
+import os
+import time
+import bisect
+import threading
+import logging
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+def nearest_rank(ordered, percentile):
+    """
+    Return the given percentile (0-100) of an already sorted, non-empty list.
+    """
+    rank = max(0, min(len(ordered) - 1, round(percentile / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+class Counter:
+    """
+    A monotonically increasing count, per combination of label values.
+    """
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+class Gauge(Counter):
+    """
+    A value that can go up and down, e.g. a queue depth.
+    """
+    def set(self, value, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+    def render(self):
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+class Histogram:
+    """
+    Bucketed observations (cumulative, Prometheus style) per combination of label values.
+    """
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (+ overflow), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        bucket_labels = self.labels + ("le",)
+        with self._lock:
+            for label_values, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{_format_labels(bucket_labels, label_values + (bound,))} {cumulative}")
+                labels = _format_labels(self.labels, label_values)
+                lines.append(f"{self.name}_sum{labels} {total}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+class MetricsRegistry:
+    """
+    Holds the process's metrics and renders them in the Prometheus text format.
+    """
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self.register(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=()):
+        return self.register(Gauge(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+_CALL_LABELS = ("difficulty", "style")
+
+API_CALLS = REGISTRY.counter("debate_api_calls_total", "Chat-completion calls by outcome.", _CALL_LABELS + ("outcome",))
+QUEUE_WAIT = REGISTRY.histogram("debate_api_queue_wait_seconds", "Time a call waited for a free slot before being sent.", _CALL_LABELS)
+CONNECT_TIME = REGISTRY.histogram("debate_api_connect_seconds", "Time spent opening new upstream connections (async client).", _CALL_LABELS)
+FIRST_BYTE = REGISTRY.histogram("debate_api_first_byte_seconds", "Time from sending a call to receiving response headers.", _CALL_LABELS)
+FIRST_TOKEN = REGISTRY.histogram("debate_api_first_token_seconds", "Time from sending a streamed call to its first text.", _CALL_LABELS)
+LATENCY = REGISTRY.histogram("debate_api_latency_seconds", "Total call time, including queueing and retries.", _CALL_LABELS)
+PROMPT_TOKENS = REGISTRY.histogram("debate_api_prompt_tokens", "Prompt tokens per call.", _CALL_LABELS, TOKEN_BUCKETS)
+COMPLETION_TOKENS = REGISTRY.histogram("debate_api_completion_tokens", "Completion tokens per call.", _CALL_LABELS, TOKEN_BUCKETS)
+HISTORY_TRUNCATED = REGISTRY.counter("debate_history_truncated_total", "Calls whose history was cut to fit the token budget.", _CALL_LABELS)
+RESPONSE_SHORTENED = REGISTRY.counter("debate_response_shortened_total", "Replies trimmed to their first paragraphs.", _CALL_LABELS)
+RESPONSE_CUT_OFF = REGISTRY.counter("debate_response_cut_off_total", "Replies that hit max_tokens before the text we keep was complete.", _CALL_LABELS)
+
+class CallMetrics:
+    """
+    Records the timings and token usage of one chat-completion call.
+
+    Create it when the call is requested, mark each phase as it happens, and
+    call finish() exactly once.
+    """
+    def __init__(self, difficulty, style):
+        self.labels = (difficulty, style)
+        self.start = time.perf_counter()
+        self.sent = self.start
+        self.answered = False
+
+    def queued(self):
+        """
+        Mark the end of waiting for a slot; the request is about to be sent.
+        """
+        self.sent = time.perf_counter()
+        QUEUE_WAIT.observe(self.sent - self.start, *self.labels)
+
+    def connected(self, seconds):
+        CONNECT_TIME.observe(seconds, *self.labels)
+
+    def first_byte(self):
+        # A hedged call has two requests; only the first answer counts
+        if not self.answered:
+            self.answered = True
+            FIRST_BYTE.observe(time.perf_counter() - self.sent, *self.labels)
+
+    def first_token(self):
+        FIRST_TOKEN.observe(time.perf_counter() - self.sent, *self.labels)
+
+    def finish(self, outcome, window=None, usage=None, completion_tokens=None, shortened=False, cut_off=False):
+        """
+        Record the end of the call.
+
+        Args:
+            outcome (str): "ok", "error" or "cancelled"
+            window (WindowResult): The history window that was sent, if any
+            usage (dict): The API's usage block, if it returned one
+            completion_tokens (int): Local estimate used when usage is missing
+            shortened (bool): Whether the reply was trimmed
+            cut_off (bool): Whether max_tokens ended the reply mid-text
+        """
+        LATENCY.observe(time.perf_counter() - self.start, *self.labels)
+        API_CALLS.inc(*self.labels, outcome)
+        if window is not None and window.dropped_messages:
+            HISTORY_TRUNCATED.inc(*self.labels)
+        if shortened:
+            RESPONSE_SHORTENED.inc(*self.labels)
+        if cut_off:
+            RESPONSE_CUT_OFF.inc(*self.labels)
+        if outcome != "ok":
+            return
+
+        usage = usage or {}
+        prompt = usage.get("prompt_tokens", window.total_tokens if window is not None else None)
+        completion = usage.get("completion_tokens", completion_tokens)
+        if prompt is not None:
+            PROMPT_TOKENS.observe(prompt, *self.labels)
+        if completion is not None:
+            COMPLETION_TOKENS.observe(completion, *self.labels)
+
+_dump_thread = None
+_dump_lock = threading.Lock()
+
+def start_periodic_dump(interval=None, path=None):
+    """
+    Periodically write the metrics text to a file, or to the log if no path is set.
+
+    Does nothing if the interval is 0 or a dump is already running. Useful
+    where there is no HTTP endpoint to scrape, such as the Streamlit app.
+    """
+    global _dump_thread
+    interval = Config.METRICS_DUMP_INTERVAL if interval is None else interval
+    path = path or Config.METRICS_DUMP_PATH
+    if interval <= 0:
+        return
+    with _dump_lock:
+        if _dump_thread is not None:
+            return
+
+        def dump():
+            while True:
+                time.sleep(interval)
+                text = REGISTRY.render()
+                if path:
+                    # Write then rename, so readers never see a partial file
+                    with open(path + ".tmp", "w", encoding="utf-8") as f:
+                        f.write(text)
+                    os.replace(path + ".tmp", path)
+                else:
+                    logger.info("Metrics:\n%s", text)
+
+        _dump_thread = threading.Thread(target=dump, name="metrics-dump", daemon=True)
+        _dump_thread.start()
@@ -0,0 +1,166 @@
+import re
+import time
+import random
+import sqlite3
+import threading
+import logging
+from collections import OrderedDict
+from config import Config
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+LOOKUPS = REGISTRY.counter("debate_opening_cache_lookups_total", "Opening cache lookups, by whether a cached opening was served.", ("result",))
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_topic(topic):
+    """
+    Normalize a topic so trivially different spellings share a cache entry.
+
+    "  Climate change? " and "climate CHANGE" both become "climate change".
+    """
+    return _WHITESPACE.sub(" ", topic).strip().strip(".?!").strip().lower()
+
+class OpeningCache:
+    """
+    Process-wide cache of opening statements keyed by topic, difficulty and style.
+
+    Each key holds a small pool of variants so users picking the same settings
+    don't all see identical text: while a pool is still filling, lookups miss and
+    the caller generates a fresh opening to add; once full, a random variant is
+    served. Keys are evicted least recently used beyond max_entries, and variants
+    expire after ttl seconds. With a db_path, variants are also written to SQLite
+    so they survive restarts and are shared by every process using the file; the
+    file keeps the max_entries most recently written keys.
+    """
+    def __init__(self, max_entries=None, ttl=None, variants=None, db_path=None):
+        self.max_entries = max_entries or Config.OPENING_CACHE_MAX_ENTRIES
+        self.ttl = ttl or Config.OPENING_CACHE_TTL
+        self.variants = variants or Config.OPENING_CACHE_VARIANTS
+        self.hits = 0
+        self.misses = 0
+        # key -> list of (created_at, content), most recently used last
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS openings ("
+                "key TEXT NOT NULL, content TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS openings_key ON openings (key)")
+            self._db.commit()
+
+    @staticmethod
+    def make_key(topic, difficulty, style):
+        return f"{normalize_topic(topic)}|{difficulty}|{style}"
+
+    def _load(self, key, now):
+        """
+        Return the live variants for a key, reading through to SQLite on a memory miss.
+        """
+        variants = self._entries.get(key)
+        if variants is None and self._db is not None:
+            rows = self._db.execute(
+                "SELECT created_at, content FROM openings WHERE key = ? AND created_at > ? ORDER BY created_at",
+                (key, now - self.ttl)
+            ).fetchall()
+            if rows:
+                variants = [tuple(row) for row in rows[-self.variants:]]
+                self._entries[key] = variants
+        if variants is None:
+            return None
+
+        live = [v for v in variants if v[0] > now - self.ttl]
+        if not live:
+            del self._entries[key]
+            return None
+        self._entries[key] = live
+        self._entries.move_to_end(key)
+        return live
+
+    def get(self, topic, difficulty, style):
+        """
+        Look up an opening statement.
+
+        Args:
+            topic (str): The debate topic
+            difficulty (str): Difficulty level (easy, medium, hard)
+            style (str): Conversation style
+
+        Returns:
+            str or None: A cached opening, or None if the caller should generate one
+        """
+        key = self.make_key(topic, difficulty, style)
+        with self._lock:
+            variants = self._load(key, time.time())
+            if variants is None or len(variants) < self.variants:
+                self.misses += 1
+                LOOKUPS.inc("miss")
+                return None
+            self.hits += 1
+            LOOKUPS.inc("hit")
+            return random.choice(variants)[1]
+
+    def put(self, topic, difficulty, style, content):
+        """
+        Add a freshly generated opening statement to the key's pool.
+
+        Error replies must not be passed in; they would be served to other users.
+        Text already in the pool is ignored: concurrent identical openings share
+        one upstream reply (see single_flight.py), and every caller puts it.
+        """
+        key = self.make_key(topic, difficulty, style)
+        now = time.time()
+        with self._lock:
+            variants = self._load(key, now) or []
+            if len(variants) >= self.variants or any(v[1] == content for v in variants):
+                return
+            variants.append((now, content))
+            self._entries[key] = variants
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT INTO openings (key, content, created_at) VALUES (?, ?, ?)",
+                    (key, content, now)
+                )
+                self._db.execute("DELETE FROM openings WHERE created_at <= ?", (now - self.ttl,))
+                self._db.execute(
+                    "DELETE FROM openings WHERE key NOT IN ("
+                    "SELECT key FROM openings GROUP BY key ORDER BY MAX(created_at) DESC LIMIT ?)",
+                    (self.max_entries,)
+                )
+                self._db.commit()
+
+    def stats(self):
+        """
+        Return hit/miss counters and the number of cached keys.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "keys": len(self._entries),
+            }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_opening_cache():
+    """
+    Return the process-wide opening cache configured from Config.
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = OpeningCache(db_path=Config.OPENING_CACHE_DB_PATH or None)
+    return _cache
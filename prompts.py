@@ -0,0 +1,127 @@
+"""
+System prompts, compiled once per (style, difficulty) from Config.
+
+Everything in a system prompt except the topic depends only on the style and
+difficulty, so that part is built once at import and reused for every turn of
+every debate. The topic is added at the very end, which keeps the start of
+each request byte-identical across debates with the same settings; providers
+that cache prompt prefixes can then reuse it instead of processing it again.
+"""
+from functools import lru_cache
+from config import Config
+from history import estimate_tokens, MESSAGE_OVERHEAD_TOKENS
+
+# Styles whose prompts always ask for the strongest emotions
+HEATED_STYLES = frozenset({"aggressive", "controversial", "sarcastic"})
+
+DEFAULT_EMOJIS = ["😊", "👍"]
+
+_GUIDELINES = """{style_prompt}
+
+You are engaged in a REAL, emotionally-charged debate.
+
+Guidelines for your responses:
+- You are ONLY a debate bot. You should ONLY discuss and debate the specified topic.
+- If the user asks non-debate questions, remind them you're only here to debate the topic.
+- Stay strictly on the debate topic given below for this debate session.
+- Provide {difficulty} level arguments but with {intensity} emotional intensity
+- Act like a real human in a heated debate, not an AI
+- Show genuine emotional reactions to the user's points
+- Express strong personal opinions and feelings about the topic
+- Occasionally use rhetorical questions to challenge the user
+- Use dramatic pauses... to emphasize your points
+- Make your language colorful and emotionally expressive
+- Keep responses VERY concise (2-3 sentences max per point)
+- Make no more than 2-3 points total in your response
+- Use emojis from this set to emphasize emotions: {emojis}
+- Use emoji bullet points to structure your arguments
+- If appropriate, use exaggerated language, ALL CAPS for emphasis, or *asterisks* for emphasis
+- Occasionally express disagreement strongly, like a real debate opponent
+
+"""
+
+# Appended to the compiled prefix; the only part that differs between debates
+_TOPIC_LINE = 'The debate topic is: "{topic}".'
+
+class SystemMessage(dict):
+    """
+    A system prompt message that carries its own token estimate.
+
+    Serialises like any message dict; history.message_tokens() reads
+    `tokens` instead of measuring the prompt again.
+    """
+    __slots__ = ("tokens",)
+
+class PromptTemplate:
+    """
+    The static part of one (style, difficulty) system prompt.
+    """
+    __slots__ = ("prefix", "prefix_tokens")
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.prefix_tokens = estimate_tokens(prefix)
+
+    def render(self, topic):
+        """
+        Build the system message for a debate on `topic`.
+
+        Returns:
+            SystemMessage: The message, with its estimated token cost
+        """
+        topic_line = _TOPIC_LINE.format(topic=topic)
+        message = SystemMessage(role="system", content=self.prefix + topic_line)
+        message.tokens = self.prefix_tokens + estimate_tokens(topic_line) + MESSAGE_OVERHEAD_TOKENS
+        return message
+
+def emotional_intensity(difficulty, style):
+    """
+    How emotional the bot should be for the given settings.
+    """
+    if style in HEATED_STYLES:
+        return "very high"
+    return {"hard": "high", "easy": "mild"}.get(difficulty, "moderate")
+
+def compile_prompts():
+    """
+    Build the PromptTemplate for every style and difficulty in Config.
+
+    Returns:
+        dict: {(style, difficulty): PromptTemplate}
+    """
+    templates = {}
+    for style, settings in Config.CONVERSATION_STYLES.items():
+        emojis = ", ".join(settings.get("emoji_set", DEFAULT_EMOJIS))
+        for difficulty in Config.DIFFICULTY_LEVELS:
+            templates[style, difficulty] = PromptTemplate(_GUIDELINES.format(
+                style_prompt=settings["system_prompt"],
+                difficulty=difficulty,
+                intensity=emotional_intensity(difficulty, style),
+                emojis=emojis,
+            ))
+    return templates
+
+PROMPTS = compile_prompts()
+
+def get_prompt(style, difficulty):
+    """
+    Return the compiled template, falling back to friendly/medium for unknown settings.
+    """
+    template = PROMPTS.get((style, difficulty))
+    if template is None:
+        if style not in Config.CONVERSATION_STYLES:
+            style = "friendly"
+        if difficulty not in Config.DIFFICULTY_LEVELS:
+            difficulty = "medium"
+        template = PROMPTS[style, difficulty]
+    return template
+
+@lru_cache(maxsize=1024)
+def system_message(topic, difficulty, style):
+    """
+    The system message for a debate, rendered once per topic and settings.
+
+    Every turn of a debate sends the same system prompt, so it is only built
+    and measured on the first one. Callers must not modify the result.
+    """
+    return get_prompt(style, difficulty).render(topic)
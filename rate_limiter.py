@@ -0,0 +1,252 @@
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+import logging
+from config import Config
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first: a user waiting on screen beats bulk generation
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+# How often an async waiter re-checks the queue while it isn't at the front
+_ASYNC_POLL_INTERVAL = 0.02
+
+QUEUE_DEPTH = REGISTRY.gauge("debate_rate_limit_queue_depth", "API calls waiting for rate-limit capacity.", ("priority",))
+
+class TokenBucket:
+    """
+    A bucket refilled continuously at `per_minute` units per minute, holding at most one minute's worth.
+
+    A per_minute of 0 means unlimited.
+    """
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """
+        Seconds until `amount` units are available (0 if they are now).
+        """
+        if not self.capacity:
+            return 0.0
+        self._refill(now)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount):
+        if self.capacity:
+            self.level -= amount
+
+    def give_back(self, amount):
+        if self.capacity:
+            self.level = min(self.capacity, self.level + amount)
+
+class Reservation:
+    """
+    Capacity granted to one API call; settle() it with the tokens actually used.
+    """
+    def __init__(self, limiter, tokens):
+        self.limiter = limiter
+        self.tokens = tokens
+        self.settled = False
+
+    def settle(self, used_tokens=None):
+        """
+        Return unused tokens to the bucket, or charge the excess if the call used more.
+
+        Args:
+            used_tokens (int): Tokens the call consumed; None if it never reached
+                the API, which refunds the whole token reservation
+        """
+        if self.settled:
+            return
+        self.settled = True
+        self.limiter._settle(self.tokens, used_tokens or 0)
+
+class RateLimiter:
+    """
+    Process-wide scheduler that keeps API calls under requests- and tokens-per-minute limits.
+
+    Each call reserves one request plus its estimated tokens (prompt plus the
+    call's max_tokens) before it is sent, and settles the reservation
+    against the real usage afterwards. Calls that don't fit wait in a queue
+    ordered by priority, then arrival, so interactive turns overtake batch
+    work. A Retry-After from the API pauses the whole queue, since every
+    caller shares the same account limits.
+    """
+    def __init__(self, rpm=None, tpm=None):
+        self.requests = TokenBucket(Config.RATE_LIMIT_RPM if rpm is None else rpm)
+        self.tokens = TokenBucket(Config.RATE_LIMIT_TPM if tpm is None else tpm)
+        self.paused_until = 0.0
+        self._queue = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+
+    def _enqueue(self, tokens, priority):
+        if self.tokens.capacity:
+            # A call larger than a minute's budget could otherwise never run
+            tokens = min(tokens, self.tokens.capacity)
+        entry = [PRIORITIES.get(priority, 0), next(self._sequence), tokens, priority]
+        with self._cond:
+            heapq.heappush(self._queue, entry)
+            QUEUE_DEPTH.inc(priority)
+        return entry
+
+    def _remove(self, entry):
+        with self._cond:
+            if entry in self._queue:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                QUEUE_DEPTH.inc(entry[3], amount=-1)
+                self._cond.notify_all()
+
+    def _try_take(self, entry):
+        """
+        Grant the entry if it is first in line and capacity allows.
+
+        Must be called with the lock held.
+
+        Returns:
+            float or None: 0 when granted, otherwise the seconds to wait before
+            trying again (None if waiting on calls ahead in the queue)
+        """
+        if self._queue[0] is not entry:
+            return None
+        now = time.monotonic()
+        wait = max(
+            self.paused_until - now,
+            self.requests.wait_time(1, now),
+            self.tokens.wait_time(entry[2], now),
+        )
+        if wait > 0:
+            return wait
+        heapq.heappop(self._queue)
+        QUEUE_DEPTH.inc(entry[3], amount=-1)
+        self.requests.take(1)
+        self.tokens.take(entry[2])
+        self._cond.notify_all()
+        return 0
+
+    def acquire(self, tokens, priority="interactive", cancel_token=None):
+        """
+        Block until the call may be sent.
+
+        Args:
+            tokens (int): Estimated tokens for the call (prompt + max_tokens)
+            priority (str): "interactive" or "batch"
+            cancel_token (CancelToken): Leaves the queue as soon as it is cancelled
+
+        Returns:
+            Reservation: Settle it once the call has finished
+
+        Raises:
+            GenerationCancelled: If the call was cancelled while waiting
+        """
+        entry = self._enqueue(tokens, priority)
+        stop_waking = cancel_token.on_cancel(self._wake) if cancel_token is not None else None
+        try:
+            with self._cond:
+                while True:
+                    if cancel_token is not None:
+                        cancel_token.raise_if_cancelled()
+                    wait = self._try_take(entry)
+                    if wait == 0:
+                        return Reservation(self, entry[2])
+                    self._cond.wait(wait)
+        except BaseException:
+            self._remove(entry)
+            raise
+        finally:
+            if stop_waking is not None:
+                stop_waking()
+
+    def _wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    async def aacquire(self, tokens, priority="interactive"):
+        """
+        Async counterpart of acquire(); cancelling the waiting task leaves the queue.
+        """
+        entry = self._enqueue(tokens, priority)
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_take(entry)
+                if wait == 0:
+                    return Reservation(self, entry[2])
+                await asyncio.sleep(_ASYNC_POLL_INTERVAL if wait is None else wait)
+        except BaseException:
+            self._remove(entry)
+            raise
+
+    def try_acquire(self, tokens):
+        """
+        Take capacity for a call only if it is free right now and nobody is queued.
+
+        Used for optional extra requests, such as hedges, that should never
+        delay or overtake regular calls.
+
+        Returns:
+            Reservation or None: The reservation, or None if the call shouldn't be sent
+        """
+        if self.tokens.capacity:
+            tokens = min(tokens, self.tokens.capacity)
+        with self._cond:
+            now = time.monotonic()
+            if self._queue or self.paused_until > now:
+                return None
+            if self.requests.wait_time(1, now) or self.tokens.wait_time(tokens, now):
+                return None
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            return Reservation(self, tokens)
+
+    def _settle(self, reserved, used):
+        with self._cond:
+            if used < reserved:
+                self.tokens.give_back(reserved - used)
+            else:
+                self.tokens.take(used - reserved)
+            self._cond.notify_all()
+
+    def defer(self, seconds):
+        """
+        Hold back every queued call for `seconds`, e.g. after a 429 with Retry-After.
+        """
+        with self._cond:
+            until = time.monotonic() + seconds
+            if until > self.paused_until:
+                self.paused_until = until
+                logger.warning("Rate limited by the API, pausing calls for %.1fs", seconds)
+
+    def queue_depth(self):
+        """
+        Number of calls currently waiting for capacity.
+        """
+        return len(self._queue)
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+def get_rate_limiter():
+    """
+    Return the process-wide rate limiter, configured by Config.RATE_LIMIT_RPM / RATE_LIMIT_TPM.
+    """
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter()
+    return _limiter
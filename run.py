@@ -1,25 +1,107 @@
+import argparse
 import subprocess
 import os
 import sys
 
+def run_api(host=None, port=None):
+    """
+    Run the headless HTTP API instead of the Streamlit UI
+    """
+    from config import Config
+    import api_server
+
+    print("Starting AI Debate Bot API...")
+    print("=" * 50)
+    if not os.environ.get("MISTRAL_API_KEY"):
+        print("⚠️ Warning: MISTRAL_API_KEY environment variable not found.")
+    print(f"Listening on http://{host or Config.API_HOST}:{port or Config.API_PORT}")
+    print("=" * 50)
+    api_server.main(host, port)
+
+def run_batch(argv):
+    """
+    Run offline batch generation (see batch.py) instead of the Streamlit UI
+    """
+    import batch
+
+    if not os.environ.get("MISTRAL_API_KEY"):
+        print("⚠️ Warning: MISTRAL_API_KEY environment variable not found.")
+    return batch.main(argv)
+
+def run_self_play(argv):
+    """
+    Run bot-vs-bot self-play debates (see self_play.py) instead of the Streamlit UI
+    """
+    import self_play
+
+    if not os.environ.get("MISTRAL_API_KEY"):
+        print("⚠️ Warning: MISTRAL_API_KEY environment variable not found.")
+    return self_play.main(argv)
+
+def run_workers(workers, host=None, port=None):
+    """
+    Run several Streamlit workers behind the local load balancer (see load_balancer.py)
+    """
+    from config import Config
+    import load_balancer
+
+    env = dict(os.environ)
+    # Resume links must work on whichever worker a browser lands on, so debates
+    # go to the shared SQLite store unless a store was chosen explicitly
+    env.setdefault("SESSION_STORE", "sqlite")
+
+    print(f"Starting AI Debate Bot with {workers} workers...")
+    print("=" * 50)
+    if not os.environ.get("MISTRAL_API_KEY"):
+        print("⚠️ Warning: MISTRAL_API_KEY environment variable not found.")
+    print(f"Listening on http://{host or Config.LB_HOST}:{port or Config.LB_PORT}")
+    print("=" * 50)
+    load_balancer.main(workers, host, port, env=env)
+
 def main():
     """
     Run the Streamlit debate bot application
     """
+    parser = argparse.ArgumentParser(description="Run the AI Debate Bot")
+    parser.add_argument("--api", action="store_true", help="serve the headless HTTP API instead of the Streamlit UI")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="run this many Streamlit processes behind a local load balancer")
+    parser.add_argument("--host", help="address to bind (default: API_HOST for --api, LB_HOST for --workers)")
+    parser.add_argument("--port", type=int, help="port to bind (default: API_PORT for --api, LB_PORT for --workers)")
+    parser.add_argument("--batch", nargs=argparse.REMAINDER, metavar="ARGS",
+                        help="run batch generation; the remaining arguments are passed to batch.py")
+    parser.add_argument("--self-play", nargs=argparse.REMAINDER, metavar="ARGS",
+                        help="run bot-vs-bot debates; the remaining arguments are passed to self_play.py")
+    args = parser.parse_args()
+    
+    if args.batch is not None:
+        sys.exit(run_batch(args.batch))
+    
+    if args.self_play is not None:
+        sys.exit(run_self_play(args.self_play))
+    
+    if args.api:
+        run_api(args.host, args.port)
+        return
+    
+    # Check if streamlit is installed
+    try:
+        import streamlit
+    except ImportError:
+        print("Streamlit is not installed. Install the dependencies with: pip install -r requirements.txt")
+        sys.exit(1)
+    
+    if args.workers > 1:
+        run_workers(args.workers, args.host, args.port)
+        return
+    
     # Print welcome message
     print("Starting AI Debate Bot...")
     print("=" * 50)
     print("Make sure you have set up your MISTRAL_API_KEY in the environment variables.")
     print("=" * 50)
     
-    # Check if streamlit is installed
-    try:
-        import streamlit
-        print(f"Streamlit version: {streamlit.__version__}")
-    except ImportError:
-        print("Streamlit is not installed. Installing...")
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "streamlit"])
-        print("Streamlit installed successfully!")
+    print(f"Streamlit version: {streamlit.__version__}")
     
     # Check for Mistral API key
     if not os.environ.get("MISTRAL_API_KEY"):
@@ -0,0 +1,230 @@
+"""
+Bot-vs-bot self-play: debates between two bot configurations, for evaluating prompt changes.
+
+Each input line is a debate:
+
+    {"id": "ai-1", "topic": "AI regulation", "turns": 6,
+     "a": {"difficulty": "hard", "style": "sarcastic"}, "b": {"difficulty": "medium", "style": "friendly"}}
+
+Side "a" gives the opening statement and the sides then alternate until
+`turns` replies have been generated. Sides default to medium/friendly and
+`turns` to --turns. Alternatively, pass a plain text file of topics with
+--topics to run every topic --repeats times with the --a and --b sides.
+
+Many debates run at once on one event loop, so while one waits on the API
+the others advance. Each finished debate is appended to the output file:
+
+    {"id", "topic", "a", "b", "ok", "turns": [{"speaker", "content", "elapsed"}], "error"?, "elapsed"}
+
+Re-running with the same output file skips debates that already completed.
+
+    python run.py --self-play --topics topics.txt --a hard:sarcastic --b easy:friendly --output transcripts.jsonl
+"""
+import json
+import time
+import asyncio
+import logging
+import argparse
+from config import Config
+from debate_bot import ErrorMessage
+from async_debate_bot import AsyncDebateBot
+from batch import read_jobs, completed_ids
+from logging_setup import configure_logging, log_context
+
+logger = logging.getLogger(__name__)
+
+def parse_side(spec):
+    """
+    Parse a "difficulty:style" command-line value into a side.
+    """
+    difficulty, _, style = spec.partition(":")
+    return {"difficulty": difficulty or "medium", "style": style or "friendly"}
+
+def expand_topics(path, side_a, side_b, repeats=1):
+    """
+    Yield `repeats` debates per topic in a text file, all between the same two sides.
+    """
+    with open(path, encoding="utf-8") as f:
+        topics = [line.strip() for line in f if line.strip()]
+    label = f"{side_a['difficulty']}:{side_a['style']}|{side_b['difficulty']}:{side_b['style']}"
+    for topic in topics:
+        for n in range(repeats):
+            yield {"id": f"{topic}|{label}|{n}", "topic": topic, "a": side_a, "b": side_b}
+
+def side_history(transcript, speaker, topic):
+    """
+    Build the conversation as one side sees it.
+
+    The side's own turns are the assistant's and the opponent's are the
+    user's, so each side is prompted exactly as if a person were arguing
+    against it in the app.
+
+    Args:
+        transcript (list): Turns so far, as {"speaker", "content"} dicts
+        speaker (str): "a" or "b"
+        topic (str): The debate topic
+
+    Returns:
+        list: Messages to pass to the bot
+    """
+    history = []
+    if not transcript or transcript[0]["speaker"] == speaker:
+        # The opening side was asked for its opening statement
+        history.append({"role": "user", "content": Config.OPENING_REQUEST.format(topic=topic)})
+    for turn in transcript:
+        history.append({"role": "assistant" if turn["speaker"] == speaker else "user", "content": turn["content"]})
+    return history
+
+def _with_defaults(side):
+    if side is None:
+        side = {}
+    if not isinstance(side, dict):
+        # Left as given, for _invalid() to report
+        return side
+    return {"difficulty": "medium", "style": "friendly", **side}
+
+def _invalid(topic, sides):
+    if not topic:
+        return "Missing topic."
+    for name, side in sides.items():
+        if not isinstance(side, dict):
+            return f"Invalid side {name}: expected a JSON object"
+        # Only strings are looked up, so a list or object is reported rather than raising
+        if not isinstance(side["difficulty"], str) or side["difficulty"] not in Config.DIFFICULTY_LEVELS:
+            return f"Unknown difficulty: {side['difficulty']}"
+        if not isinstance(side["style"], str) or side["style"] not in Config.CONVERSATION_STYLES:
+            return f"Unknown style: {side['style']}"
+    return None
+
+async def run_debate(bot, job, turns=6):
+    """
+    Play out one debate.
+
+    Args:
+        bot (AsyncDebateBot): Bot used for both sides
+        job (dict): The debate, see the module docstring
+        turns (int): Replies to generate when the job doesn't say
+
+    Returns:
+        dict: The transcript line to write
+    """
+    start = time.perf_counter()
+    topic = str(job.get("topic") or "").strip()
+    sides = {"a": _with_defaults(job.get("a")), "b": _with_defaults(job.get("b"))}
+    result = {"id": str(job["id"]), "topic": topic, "a": sides["a"], "b": sides["b"], "ok": False, "turns": []}
+
+    try:
+        error = job.get("invalid") or _invalid(topic, sides)
+        if error:
+            result["error"] = error
+        else:
+            transcript = result["turns"]
+            for i in range(int(job.get("turns") or turns)):
+                speaker = "ab"[i % 2]
+                side = sides[speaker]
+                turn_start = time.perf_counter()
+                # Never coalesced: identical debates must still be independent samples
+                with log_context(session_id=result["id"], request_id=f"{result['id']}#{i}"):
+                    reply = await bot.agenerate_response(
+                        side_history(transcript, speaker, topic), topic, side["difficulty"], side["style"],
+                        priority="batch", coalesce=False
+                    )
+                if isinstance(reply, ErrorMessage):
+                    result["error"] = reply
+                    break
+                transcript.append({"speaker": speaker, "content": reply, "elapsed": round(time.perf_counter() - turn_start, 3)})
+            else:
+                result["ok"] = True
+    except Exception as e:
+        # A malformed debate, e.g. a "turns" that isn't a number, fails on its
+        # own instead of cancelling every other debate in the run
+        result["error"] = str(e) or type(e).__name__
+
+    result["elapsed"] = round(time.perf_counter() - start, 3)
+    return result
+
+async def run_self_play(jobs, output_path, concurrency=16, turns=6, bot=None):
+    """
+    Run debates concurrently, appending each transcript to output_path as it finishes.
+
+    Jobs are read lazily and at most `concurrency` debates are in progress
+    at once; calls to the API are further capped by the bot's own limit and
+    the process-wide rate limiter.
+
+    Args:
+        jobs (iterable): Debate dicts, see the module docstring
+        output_path (str): JSONL file to append transcripts to
+        concurrency (int): Debates in progress at once
+        turns (int): Default replies per debate
+        bot (AsyncDebateBot): Bot to use; a new one, closed afterwards, by default
+
+    Returns:
+        tuple: (succeeded, failed, skipped) debate counts
+    """
+    owns_bot = bot is None
+    bot = bot or AsyncDebateBot()
+    done = completed_ids(output_path)
+    succeeded = failed = skipped = 0
+    pending = set()
+
+    try:
+        with open(output_path, "a", encoding="utf-8") as out:
+
+            async def drain():
+                nonlocal pending, succeeded, failed
+                finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    result = task.result()
+                    out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                    out.flush()
+                    if result["ok"]:
+                        succeeded += 1
+                    else:
+                        failed += 1
+                        logger.warning("Debate %s failed after %s turns: %s", result["id"], len(result["turns"]), result["error"])
+                    if (succeeded + failed) % 50 == 0:
+                        logger.info("Self-play progress: %s succeeded, %s failed, %s skipped", succeeded, failed, skipped)
+
+            for job in jobs:
+                if str(job.get("id")) in done:
+                    skipped += 1
+                    continue
+                if len(pending) >= concurrency:
+                    await drain()
+                pending.add(asyncio.create_task(run_debate(bot, job, turns)))
+
+            while pending:
+                await drain()
+    finally:
+        for task in pending:
+            task.cancel()
+        if owns_bot:
+            await bot.aclose()
+
+    return succeeded, failed, skipped
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="run.py --self-play", description="Run bot-vs-bot debates and write their transcripts to JSONL")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("jobs", nargs="?", help="JSONL file of debates")
+    source.add_argument("--topics", help="text file with one topic per line")
+    parser.add_argument("--a", type=parse_side, default="medium:friendly", metavar="DIFFICULTY:STYLE",
+                        help="opening side for --topics (default: medium:friendly)")
+    parser.add_argument("--b", type=parse_side, default="medium:friendly", metavar="DIFFICULTY:STYLE",
+                        help="responding side for --topics (default: medium:friendly)")
+    parser.add_argument("--repeats", type=int, default=1, help="debates per topic for --topics")
+    parser.add_argument("--turns", type=int, default=6, help="replies per debate, both sides together")
+    parser.add_argument("--output", required=True, help="JSONL file to append transcripts to (also used to resume)")
+    parser.add_argument("--concurrency", type=int, default=16, help="debates in progress at once")
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    jobs = expand_topics(args.topics, args.a, args.b, args.repeats) if args.topics else read_jobs(args.jobs)
+    start = time.perf_counter()
+    succeeded, failed, skipped = asyncio.run(run_self_play(jobs, args.output, args.concurrency, args.turns))
+    elapsed = time.perf_counter() - start
+    print(f"{succeeded} succeeded, {failed} failed, {skipped} skipped (already done) in {elapsed:.1f}s")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,285 @@
+import time
+import uuid
+import sqlite3
+import threading
+import logging
+from collections import OrderedDict
+from config import Config
+from turns import TurnLog
+
+logger = logging.getLogger(__name__)
+
+class DebateSession:
+    """
+    A debate's settings plus its conversation, loaded from the store on first use.
+
+    Append turns through append() so they are persisted; `conversation` is a
+    TurnLog, whose turns read like the {"role", "content"} messages the rest
+    of the app uses.
+    """
+    def __init__(self, store, session_id, topic, difficulty, style, created_at, last_active, conversation=None):
+        self.store = store
+        self.id = session_id
+        self.topic = topic
+        self.difficulty = difficulty
+        self.style = style
+        self.created_at = created_at
+        self.last_active = last_active
+        self._conversation = conversation
+
+    @property
+    def conversation(self):
+        if self._conversation is None:
+            self._conversation = self.store.load_turns(self.id)
+        return self._conversation
+
+    def append(self, role, content):
+        """
+        Record a turn in the store and in the loaded conversation.
+        """
+        self.store.append_turn(self.id, role, content)
+        self.last_active = time.time()
+        if self._conversation is not None:
+            self._conversation.append(role, content)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "topic": self.topic,
+            "difficulty": self.difficulty,
+            "style": self.style,
+            "conversation": self.conversation.messages(),
+        }
+
+class SessionStore:
+    """
+    Base class for debate session storage.
+
+    Subclasses implement the _create/_get/append_turn/load_turns/delete/evict_idle
+    primitives; this class adds periodic idle eviction on access.
+    """
+    def __init__(self, idle_timeout=None):
+        self.idle_timeout = idle_timeout or Config.SESSION_IDLE_TIMEOUT
+        self._lock = threading.Lock()
+        self._last_eviction = time.time()
+
+    def _maybe_evict(self):
+        now = time.time()
+        if now - self._last_eviction < Config.SESSION_EVICT_INTERVAL:
+            return
+        self._last_eviction = now
+        evicted = self.evict_idle()
+        if evicted:
+            logger.info("Evicted %s idle debate sessions", evicted)
+
+    def create(self, topic, difficulty, style):
+        """
+        Start a new debate session.
+
+        Returns:
+            DebateSession: The new session, with an empty conversation
+        """
+        self._maybe_evict()
+        now = time.time()
+        session = DebateSession(self, uuid.uuid4().hex, topic, difficulty, style, now, now, conversation=TurnLog())
+        self._create(session)
+        return session
+
+    def get(self, session_id):
+        """
+        Resume a debate by ID.
+
+        Returns:
+            DebateSession or None: The session, or None if it doesn't exist
+        """
+        self._maybe_evict()
+        return self._get(session_id)
+
+    def _create(self, session):
+        raise NotImplementedError
+
+    def _get(self, session_id):
+        raise NotImplementedError
+
+    def append_turn(self, session_id, role, content):
+        raise NotImplementedError
+
+    def load_turns(self, session_id):
+        raise NotImplementedError
+
+    def delete(self, session_id):
+        raise NotImplementedError
+
+    def evict_idle(self):
+        """
+        Drop sessions idle for longer than idle_timeout from memory.
+
+        Returns:
+            int: Number of sessions evicted
+        """
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+class MemorySessionStore(SessionStore):
+    """
+    Keeps sessions in process memory; evicted sessions are gone for good.
+    """
+    def __init__(self, idle_timeout=None):
+        super().__init__(idle_timeout)
+        self._sessions = {}
+
+    def _create(self, session):
+        with self._lock:
+            self._sessions[session.id] = session
+
+    def _get(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+        if session is not None:
+            session.last_active = time.time()
+        return session
+
+    def append_turn(self, session_id, role, content):
+        # The session's own conversation list is the storage
+        pass
+
+    def load_turns(self, session_id):
+        return TurnLog()
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def evict_idle(self):
+        cutoff = time.time() - self.idle_timeout
+        with self._lock:
+            idle = [sid for sid, s in self._sessions.items() if s.last_active < cutoff]
+            for session_id in idle:
+                del self._sessions[session_id]
+        return len(idle)
+
+    def __len__(self):
+        return len(self._sessions)
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Persists sessions to SQLite so debates survive restarts and any worker can resume them.
+
+    The database runs in WAL mode so readers never block the writer, and turns
+    are an append-only log: each turn is a single INSERT, never a rewrite of
+    the whole conversation. Recently used sessions are kept in memory with
+    their history loaded lazily; evicting an idle session only frees memory,
+    it can still be resumed from disk.
+    """
+    def __init__(self, path=None, idle_timeout=None):
+        super().__init__(idle_timeout)
+        self.path = path or Config.SESSION_DB_PATH
+        self._local = threading.local()
+        self._sessions = OrderedDict()
+        db = self._db()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "id TEXT PRIMARY KEY, topic TEXT NOT NULL, difficulty TEXT NOT NULL, style TEXT NOT NULL, "
+            "created_at REAL NOT NULL, last_active REAL NOT NULL)"
+        )
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS turns ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, role TEXT NOT NULL, "
+            "content TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS turns_session ON turns (session_id, id)")
+        db.commit()
+
+    def _db(self):
+        # sqlite3 connections can't be shared across threads, so each thread gets its own
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=Config.SESSION_DB_TIMEOUT)
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _remember(self, session):
+        with self._lock:
+            self._sessions[session.id] = session
+            self._sessions.move_to_end(session.id)
+
+    def _create(self, session):
+        db = self._db()
+        db.execute(
+            "INSERT INTO sessions (id, topic, difficulty, style, created_at, last_active) VALUES (?, ?, ?, ?, ?, ?)",
+            (session.id, session.topic, session.difficulty, session.style, session.created_at, session.last_active)
+        )
+        db.commit()
+        self._remember(session)
+
+    def _get(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+        if session is None:
+            row = self._db().execute(
+                "SELECT id, topic, difficulty, style, created_at, last_active FROM sessions WHERE id = ?",
+                (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            session = DebateSession(self, *row)
+        session.last_active = time.time()
+        self._remember(session)
+        return session
+
+    def append_turn(self, session_id, role, content):
+        now = time.time()
+        db = self._db()
+        db.execute(
+            "INSERT INTO turns (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+            (session_id, role, content, now)
+        )
+        db.execute("UPDATE sessions SET last_active = ? WHERE id = ?", (now, session_id))
+        db.commit()
+
+    def load_turns(self, session_id):
+        rows = self._db().execute(
+            "SELECT role, content FROM turns WHERE session_id = ? ORDER BY id",
+            (session_id,)
+        ).fetchall()
+        return TurnLog(rows)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        db = self._db()
+        db.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+        db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        db.commit()
+
+    def evict_idle(self):
+        cutoff = time.time() - self.idle_timeout
+        with self._lock:
+            idle = [sid for sid, s in self._sessions.items() if s.last_active < cutoff]
+            for session_id in idle:
+                del self._sessions[session_id]
+        return len(idle)
+
+    def __len__(self):
+        return len(self._sessions)
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_session_store():
+    """
+    Return the process-wide session store selected by Config.SESSION_STORE.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if Config.SESSION_STORE == "sqlite":
+                    _store = SQLiteSessionStore()
+                else:
+                    _store = MemorySessionStore()
+    return _store
@@ -0,0 +1,305 @@
+import json
+import asyncio
+import contextvars
+import hashlib
+import threading
+from contextlib import aclosing
+from metrics import REGISTRY
+from cancellation import CancelToken, GenerationCancelled
+
+COALESCED = REGISTRY.counter("debate_api_coalesced_total", "Calls served by joining an identical call already in flight.")
+
+def payload_key(payload):
+    """
+    Identify a chat-completions request by everything that shapes its output.
+
+    Whether the request streams is deliberately left out: a blocking caller
+    can wait for a streamed reply and vice versa.
+
+    Returns:
+        str: Hex digest of the model, messages, temperature and max_tokens
+    """
+    material = json.dumps(
+        [payload["model"], payload["messages"], payload.get("temperature"), payload.get("max_tokens")],
+        ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+class Flight:
+    """
+    One upstream call and the chunks it has produced so far, shared by every caller waiting on it.
+
+    Followers replay the chunks from the start, so a caller that joins late
+    still receives the whole reply. The call's own CancelToken is cancelled
+    once every follower has stopped reading.
+    """
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.followers = 0
+        self.error = None
+        self.abandoned = False
+        self.cond = threading.Condition()
+        self.cancel_token = CancelToken()
+
+    def publish(self, chunk):
+        with self.cond:
+            self.chunks.append(chunk)
+            self.cond.notify_all()
+
+    def finish(self):
+        with self.cond:
+            self.done = True
+            self.cond.notify_all()
+
+    def _wake(self):
+        with self.cond:
+            self.cond.notify_all()
+
+    def follow(self, cancel_token=None):
+        """
+        Yield the flight's chunks as they arrive, until the call is done.
+
+        When the last follower stops reading, the flight is marked abandoned
+        so the producer can stop the upstream call.
+
+        Raises:
+            GenerationCancelled: If `cancel_token` is cancelled first
+        """
+        index = 0
+        stop_waking = cancel_token.on_cancel(self._wake) if cancel_token is not None else None
+        try:
+            while True:
+                with self.cond:
+                    while index >= len(self.chunks) and not self.done:
+                        if cancel_token is not None:
+                            cancel_token.raise_if_cancelled()
+                        self.cond.wait()
+                    if cancel_token is not None:
+                        cancel_token.raise_if_cancelled()
+                    if index >= len(self.chunks):
+                        break
+                    chunk = self.chunks[index]
+                index += 1
+                yield chunk
+            if self.error is not None:
+                raise self.error
+        finally:
+            if stop_waking is not None:
+                stop_waking()
+            with self.cond:
+                self.followers -= 1
+                if self.followers == 0 and not self.done:
+                    self.abandoned = True
+            if self.abandoned:
+                self.cancel_token.cancel("abandoned")
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls into one upstream request.
+
+    The first caller for a key starts the call on a background thread; every
+    caller, the first included, reads its chunks from the shared Flight. The
+    flight is forgotten as soon as the call ends, so nothing is ever served
+    from a finished call: this is deduplication, not caching.
+    """
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def stream(self, key, produce, cancel_token=None):
+        """
+        Yield the chunks of the call for `key`, starting it with produce() if none is in flight.
+
+        Args:
+            key (str): Request identity, see payload_key()
+            produce (callable): Given the flight's CancelToken, returns an
+                iterator of reply chunks; only called by the caller that
+                starts the flight
+            cancel_token (CancelToken): Stops this caller waiting; the call
+                itself is only cancelled once no caller is left
+
+        Yields:
+            str: Chunks of the shared reply
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            joined = False
+            if flight is not None:
+                # Checked and counted under the flight's condition, so the last
+                # follower can't leave and abandon it in between
+                with flight.cond:
+                    if not flight.abandoned:
+                        flight.followers += 1
+                        joined = True
+            if joined:
+                COALESCED.inc()
+            else:
+                # An abandoned flight is being stopped and not forgotten yet;
+                # joining it would only replay a truncated reply
+                flight = self._flights[key] = Flight()
+                flight.followers = 1
+                # The call logs with the IDs of the caller that started it
+                context = contextvars.copy_context()
+                threading.Thread(target=context.run, args=(self._run, key, flight, produce), name="single-flight", daemon=True).start()
+        try:
+            yield from flight.follow(cancel_token)
+        finally:
+            if flight.abandoned:
+                # Nobody is reading: later callers must start afresh, not join a call being stopped
+                self._forget(key, flight)
+
+    def call(self, key, produce, cancel_token=None):
+        """
+        Blocking counterpart of stream(): return the whole reply.
+
+        Args:
+            key (str): Request identity, see payload_key()
+            produce (callable): Given the flight's CancelToken, returns the
+                reply as a single string
+            cancel_token (CancelToken): As for stream()
+
+        Returns:
+            str: The reply, with the type of the failing chunk kept if the call failed
+        """
+        chunks = list(self.stream(key, lambda token: iter([produce(token)]), cancel_token))
+        return _join(chunks)
+
+    def _forget(self, key, flight):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def _run(self, key, flight, produce):
+        chunks = None
+        try:
+            chunks = produce(flight.cancel_token)
+            for chunk in chunks:
+                flight.publish(chunk)
+                if flight.abandoned:
+                    raise GenerationCancelled("abandoned")
+        except GenerationCancelled as e:
+            # The reply is incomplete; a follower must never take it for a whole one
+            flight.error = e
+        except Exception as e:
+            # Re-raised in every follower, as if each had made the call itself
+            flight.error = e
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                # Stops a streamed response nobody is reading any more
+                close()
+            self._forget(key, flight)
+            flight.finish()
+
+class AsyncFlight:
+    """
+    asyncio counterpart of Flight; the upstream call runs as a task, cancelled once nobody is listening.
+    """
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.followers = 0
+        self.error = None
+        self.task = None
+        self.changed = asyncio.Event()
+
+    def publish(self, chunk):
+        self.chunks.append(chunk)
+        self.changed.set()
+
+    def finish(self):
+        self.done = True
+        self.changed.set()
+
+    async def follow(self):
+        index = 0
+        try:
+            while True:
+                while index >= len(self.chunks) and not self.done:
+                    self.changed.clear()
+                    await self.changed.wait()
+                if index >= len(self.chunks):
+                    break
+                chunk = self.chunks[index]
+                index += 1
+                yield chunk
+            if self.error is not None:
+                raise self.error
+        finally:
+            self.followers -= 1
+            if self.followers == 0 and not self.done:
+                self.task.cancel()
+
+class AsyncSingleFlight:
+    """
+    asyncio counterpart of SingleFlight, for callers on one event loop.
+    """
+    def __init__(self):
+        self._flights = {}
+
+    async def stream(self, key, produce):
+        """
+        Async counterpart of SingleFlight.stream(); produce() returns an async iterator.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = AsyncFlight()
+            flight.task = asyncio.create_task(self._run(key, flight, produce))
+        else:
+            COALESCED.inc()
+        flight.followers += 1
+        try:
+            async with aclosing(flight.follow()) as chunks:
+                async for chunk in chunks:
+                    yield chunk
+        finally:
+            if flight.followers == 0 and not flight.done:
+                # The call is being cancelled: later callers must start afresh
+                self._forget(key, flight)
+
+    async def call(self, key, produce):
+        """
+        Async counterpart of SingleFlight.call(); produce() is a coroutine function.
+        """
+        async def single():
+            yield await produce()
+        return _join([chunk async for chunk in self.stream(key, single)])
+
+    def _forget(self, key, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    async def _run(self, key, flight, produce):
+        chunks = produce()
+        try:
+            async for chunk in chunks:
+                flight.publish(chunk)
+        except Exception as e:
+            flight.error = e
+        finally:
+            await chunks.aclose()
+            self._forget(key, flight)
+            flight.finish()
+
+def _join(chunks):
+    text = "".join(chunks)
+    for chunk in chunks:
+        if type(chunk) is not str:
+            # Keep marker types such as ErrorMessage on the joined reply
+            return type(chunk)(text)
+    return text
+
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+def get_single_flight():
+    """
+    Return the process-wide SingleFlight shared by every DebateBot.
+    """
+    global _single_flight
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight()
+    return _single_flight
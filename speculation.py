@@ -0,0 +1,97 @@
+"""
+Speculative openings: generate the opening statement while the user is still choosing settings.
+
+With SPECULATIVE_OPENINGS on, the app starts generating the opening as soon
+as a topic has been entered, for the difficulty and style currently
+selected. If the user then starts the debate with the same settings the
+reply is already on its way, or done; if they change anything first it is
+discarded and, within the caps below, a new one is started.
+
+Speculation costs API calls that may never be shown, so it is bounded:
+each visitor gets at most SPECULATIVE_MAX_PER_SESSION speculative openings,
+at most SPECULATIVE_MAX_IN_FLIGHT run at once across the process, they
+queue behind interactive calls in the rate limiter, and one discarded while
+still generating is cancelled. One that finished is not wasted: like any
+opening, it was added to the shared opening cache.
+"""
+import logging
+import threading
+from config import Config
+from metrics import REGISTRY
+from cancellation import Generation, get_session_generations
+from debate_bot import ErrorMessage
+
+logger = logging.getLogger(__name__)
+
+SPECULATIONS = REGISTRY.counter("debate_speculative_openings_total", "Openings generated before Start Debate, by outcome.", ("outcome",))
+
+class OpeningSpeculator:
+    """
+    Starts, hands over and discards speculative openings, within the process-wide cap.
+    """
+    def __init__(self, max_in_flight=None):
+        self.max_in_flight = Config.SPECULATIVE_MAX_IN_FLIGHT if max_in_flight is None else max_in_flight
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    def start(self, produce, started=0):
+        """
+        Start generating an opening in the background, unless a cap has been reached.
+
+        Args:
+            produce (callable): Given a CancelToken, yields the opening's chunks
+            started (int): Speculative openings this visitor has already had
+
+        Returns:
+            Generation or None: The speculative opening, or None if capped
+        """
+        with self._lock:
+            self._in_flight = {g for g in self._in_flight if not g.done}
+            if started >= Config.SPECULATIVE_MAX_PER_SESSION or len(self._in_flight) >= self.max_in_flight:
+                SPECULATIONS.inc("capped")
+                return None
+            generation = Generation(1, produce)
+            self._in_flight.add(generation)
+        generation.start()
+        SPECULATIONS.inc("started")
+        return generation
+
+    def claim(self, generation, session_id, record):
+        """
+        Use a speculative opening as the reply to a debate's opening request.
+
+        Args:
+            generation (Generation): The speculative opening
+            session_id (str): The debate that was started with its settings
+            record (callable): Stores the finished reply in the debate
+
+        Returns:
+            bool: Whether it was used; if not, the debate generates its own
+        """
+        failed = any(isinstance(chunk, ErrorMessage) for chunk in generation.chunks)
+        if failed or not get_session_generations().adopt(session_id, generation, 1, record):
+            self.discard(generation)
+            return False
+        SPECULATIONS.inc("used")
+        return True
+
+    def discard(self, generation):
+        """
+        Drop a speculative opening nobody will see, cancelling it if it is still running.
+        """
+        generation.cancel("discarded")
+        SPECULATIONS.inc("discarded")
+
+_speculator = None
+_speculator_lock = threading.Lock()
+
+def get_opening_speculator():
+    """
+    Return the process-wide OpeningSpeculator shared by every app session.
+    """
+    global _speculator
+    if _speculator is None:
+        with _speculator_lock:
+            if _speculator is None:
+                _speculator = OpeningSpeculator()
+    return _speculator
@@ -0,0 +1,26 @@
+import os
+import sys
+import pytest
+
+# The modules live at the top level of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_server import start_in_thread, MockSettings
+
+@pytest.fixture
+def mock_api():
+    """
+    Start a mock chat-completions server; call the fixture with MockSettings arguments.
+
+    Returns the endpoint URL; every server started is stopped after the test.
+    """
+    stops = []
+
+    def start(**settings):
+        url, stop = start_in_thread(MockSettings(**settings))
+        stops.append(stop)
+        return url
+
+    yield start
+    for stop in stops:
+        stop()
@@ -0,0 +1,79 @@
+import time
+import sqlite3
+import asyncio
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from api_server import BOT, STORE, create_app
+from backends import Backend, BackendPool
+from session_store import SQLiteSessionStore
+
+def post_debate(url, query):
+    async def run():
+        async with TestClient(TestServer(create_app())) as client:
+            client.app[BOT].backends = BackendPool([Backend("mock", url)])
+            response = await client.post(f"/debates{query}", json={"topic": "Cats", "style": "humorous"})
+            body = await response.text()
+            return response.status, response.content_type, body
+    return asyncio.run(run())
+
+@pytest.mark.parametrize("query, content_type, marker", [
+    ("", "application/json", '"reply"'),
+    ("?stream=1", "text/event-stream", "event: done"),
+])
+def test_new_debate_is_created_with_201(mock_api, query, content_type, marker):
+    status, received_type, body = post_debate(mock_api(latency_ms=10), query)
+    assert status == 201
+    assert received_type == content_type
+    assert marker in body
+
+def test_message_queued_behind_a_reset_debate_gets_404(mock_api):
+    url = mock_api(latency_ms=1000, latency_dist="fixed")
+
+    async def run():
+        async with TestClient(TestServer(create_app())) as client:
+            client.app[BOT].backends = BackendPool([Backend("mock", url)])
+            response = await client.post("/debates", json={"topic": "Queued messages", "style": "educational"})
+            debate_id = (await response.json())["id"]
+            messages = f"/debates/{debate_id}/messages"
+
+            first = asyncio.ensure_future(client.post(messages, json={"content": "Queues are fair because they are ordered."}))
+            await asyncio.sleep(0.2)
+            second = asyncio.ensure_future(client.post(messages, json={"content": "Queues are unfair to the impatient."}))
+            await asyncio.sleep(0.2)
+            deleted = await client.delete(f"/debates/{debate_id}")
+            assert deleted.status == 204
+
+            second = await second
+            assert second.status == 404
+            await asyncio.gather(first, return_exceptions=True)
+            assert (await client.get(f"/debates/{debate_id}")).status == 404
+
+    asyncio.run(run())
+
+def test_locked_session_database_does_not_stall_other_requests(mock_api, tmp_path):
+    url = mock_api(latency_ms=10)
+    path = str(tmp_path / "debates.db")
+
+    async def run():
+        app = create_app()
+        app[STORE] = SQLiteSessionStore(path)
+        async with TestClient(TestServer(app)) as client:
+            client.app[BOT].backends = BackendPool([Backend("mock", url)])
+            response = await client.post("/debates", json={"topic": "Locked databases"})
+            debate_id = (await response.json())["id"]
+
+            # Another process holds the write lock for a second
+            other = sqlite3.connect(path)
+            other.execute("BEGIN EXCLUSIVE")
+            delete = asyncio.ensure_future(client.delete(f"/debates/{debate_id}"))
+            await asyncio.sleep(0.2)
+            assert not delete.done()
+            start = time.monotonic()
+            assert (await client.get("/health")).status == 200
+            assert time.monotonic() - start < 0.5
+            await asyncio.sleep(0.8)
+            other.rollback()
+            other.close()
+            assert (await delete).status == 204
+
+    asyncio.run(run())
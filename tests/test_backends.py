@@ -0,0 +1,107 @@
+import time
+import asyncio
+import pytest
+from config import Config
+from backends import Backend, BackendPool
+from async_debate_bot import AsyncDebateBot
+import debate_bot
+from debate_bot import DebateBot
+
+HISTORY = [{"role": "user", "content": "Opening please"}]
+
+def half_open(backend):
+    backend.failures = Config.BACKEND_FAILURE_THRESHOLD
+    backend.opened_at = time.monotonic() - Config.BACKEND_OPEN_SECONDS - 1
+    return backend
+
+def test_cancelled_async_trial_call_releases_probe(mock_api):
+    url = mock_api(latency_ms=2000, latency_dist="fixed")
+    backend = half_open(Backend("slow", url))
+    pool = BackendPool([backend])
+
+    async def cancel_trial():
+        async with AsyncDebateBot() as bot:
+            bot.backends = pool
+            task = asyncio.create_task(bot.agenerate_response(HISTORY, "Cats", coalesce=False))
+            await asyncio.sleep(0.3)
+            assert backend.probing
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+    asyncio.run(cancel_trial())
+    assert not backend.probing
+    assert backend.state() == "half-open"
+    assert pool.choose() is backend
+
+class Interrupted(BaseException):
+    pass
+
+def test_interrupted_sync_trial_call_releases_probe(monkeypatch):
+    backend = half_open(Backend("flaky", "http://127.0.0.1:9/v1/chat/completions"))
+    pool = BackendPool([backend])
+
+    def interrupted(*args, **kwargs):
+        assert backend.probing
+        raise Interrupted()
+
+    monkeypatch.setattr(debate_bot, "post_with_retries", interrupted)
+    bot = DebateBot()
+    bot.backends = pool
+    with pytest.raises(Interrupted):
+        bot._send({"messages": []})
+    assert not backend.probing
+    assert pool.choose() is backend
+
+def test_circuit_opens_then_lets_one_trial_through_then_closes(monkeypatch):
+    monkeypatch.setattr(Config, "BACKEND_OPEN_SECONDS", 0.2)
+    backend = Backend("flaky", "http://127.0.0.1:9")
+    pool = BackendPool([backend])
+
+    for _ in range(Config.BACKEND_FAILURE_THRESHOLD - 1):
+        assert pool.choose() is backend
+        backend.record_failure()
+    assert backend.state() == "closed"
+    assert pool.choose() is backend
+    backend.record_failure()
+    assert backend.state() == "open"
+    assert pool.choose() is None
+
+    time.sleep(0.25)
+    assert backend.state() == "half-open"
+    assert pool.choose() is backend
+    # Only one trial request at a time
+    assert pool.choose() is None
+    backend.record_success(0.1)
+    assert backend.state() == "closed"
+    assert pool.choose() is backend
+    assert pool.choose() is backend
+
+def test_failed_trial_reopens_the_circuit(monkeypatch):
+    monkeypatch.setattr(Config, "BACKEND_OPEN_SECONDS", 0.2)
+    backend = half_open(Backend("flaky", "http://127.0.0.1:9"))
+    pool = BackendPool([backend])
+
+    assert pool.choose() is backend
+    failed_at = time.monotonic()
+    backend.record_failure()
+    assert backend.state() == "open"
+    assert backend.opened_at >= failed_at
+    assert pool.choose() is None
+
+def test_calls_fail_over_while_a_circuit_is_open():
+    broken = half_open(Backend("broken", "http://127.0.0.1:9"))
+    broken.opened_at = time.monotonic()
+    healthy = Backend("healthy", "http://127.0.0.1:9")
+    pool = BackendPool([broken, healthy])
+    assert pool.choose() is healthy
+    assert pool.choose(exclude=[healthy]) is None
+
+def test_released_probe_lets_the_next_call_try_again():
+    backend = half_open(Backend("slow", "http://127.0.0.1:9"))
+    pool = BackendPool([backend])
+    assert pool.choose() is backend
+    assert pool.choose() is None
+    backend.release_probe()
+    assert backend.state() == "half-open"
+    assert pool.choose() is backend
@@ -0,0 +1,27 @@
+import json
+from backends import Backend, BackendPool
+from batch import read_jobs, run_batch
+from debate_bot import DebateBot
+
+def test_bad_jobs_fail_without_aborting_the_batch(mock_api, tmp_path):
+    bot = DebateBot()
+    bot.backends = BackendPool([Backend("mock", mock_api(latency_ms=10))])
+    jobs = tmp_path / "jobs.jsonl"
+    jobs.write_text("\n".join([
+        json.dumps({"id": "good-1", "topic": "Cats"}),
+        json.dumps({"id": "bad-messages", "topic": "Cats", "messages": 5}),
+        json.dumps({"id": "bad-difficulty", "topic": "Cats", "difficulty": ["hard"]}),
+        '{"id": "cut short", "topic": ',
+        json.dumps({"id": "good-2", "topic": "Dogs", "style": "sarcastic"}),
+    ]) + "\n", encoding="utf-8")
+    output = tmp_path / "results.jsonl"
+
+    assert run_batch(read_jobs(jobs), output, concurrency=2, bot=bot) == (2, 3, 0)
+
+    results = {r["id"]: r for r in map(json.loads, output.read_text(encoding="utf-8").splitlines())}
+    assert results.keys() == {"good-1", "good-2", "bad-messages", "bad-difficulty", "4"}
+    assert results["good-1"]["ok"] and results["good-2"]["ok"]
+    for job_id in ("bad-messages", "bad-difficulty", "4"):
+        assert results[job_id]["ok"] is False
+        assert results[job_id]["error"]
+    assert results["4"]["error"].startswith("Invalid JSON")
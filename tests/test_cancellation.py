@@ -0,0 +1,106 @@
+import time
+import threading
+import pytest
+from backends import Backend, BackendPool
+from cancellation import CANCELLED, CancelToken, GenerationCancelled, SessionGenerations
+from debate_bot import DebateBot
+from metrics import API_CALLS
+
+HISTORY = [{"role": "user", "content": "Opening please"}]
+
+def cancelled_calls():
+    return API_CALLS.value("medium", "friendly", "cancelled")
+
+def test_cancelled_blocking_call_is_counted(mock_api):
+    url = mock_api(latency_ms=500, latency_dist="fixed")
+    bot = DebateBot()
+    bot.backends = BackendPool([Backend("mock", url)])
+    token = CancelToken()
+    before = cancelled_calls()
+
+    threading.Timer(0.1, token.cancel).start()
+    with pytest.raises(GenerationCancelled):
+        bot.generate_response(HISTORY, "Cats", coalesce=False, cancel_token=token)
+    assert cancelled_calls() == before + 1
+
+def test_blocking_call_cancelled_while_queued_is_counted():
+    bot = DebateBot()
+    bot.backends = BackendPool([Backend("unused", "http://127.0.0.1:9")])
+    token = CancelToken()
+    token.cancel()
+    before = cancelled_calls()
+
+    with pytest.raises(GenerationCancelled):
+        bot.generate_response(HISTORY, "Cats", coalesce=False, cancel_token=token)
+    assert cancelled_calls() == before + 1
+
+def blocking_reply(started=None):
+    # Yields one chunk, then waits until the generation is cancelled
+    def produce(token):
+        if started is not None:
+            started.set()
+        yield "thinking"
+        while not token.cancelled:
+            time.sleep(0.005)
+        token.raise_if_cancelled()
+    return produce
+
+def wait_until(condition):
+    deadline = time.monotonic() + 2
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+def test_rerun_for_the_same_message_reuses_the_generation():
+    generations = SessionGenerations()
+    first = generations.start("debate", 1, blocking_reply(), lambda chunks: None)
+    assert generations.start("debate", 1, blocking_reply(), lambda chunks: None) is first
+    generations.cancel("debate", "reset")
+
+def test_new_message_replaces_the_generation_in_progress():
+    generations = SessionGenerations()
+    recorded = []
+    superseded = CANCELLED.value("superseded")
+    first = generations.start("debate", 1, blocking_reply(), recorded.append)
+    second = generations.start("debate", 3, lambda token: iter(["rebuttal"]), recorded.append)
+
+    assert second is not first
+    assert first.token.reason == "superseded"
+    assert CANCELLED.value("superseded") == superseded + 1
+    wait_until(lambda: first.done and second.done)
+    # Only the reply to the latest message is stored
+    assert recorded == [["rebuttal"]]
+
+def test_reset_cancels_and_forgets_the_generation():
+    generations = SessionGenerations()
+    started = threading.Event()
+    recorded = []
+    generation = generations.start("debate", 1, blocking_reply(started), recorded.append)
+    assert started.wait(2)
+
+    assert generations.cancel("debate", "reset")
+    wait_until(lambda: generation.done)
+    assert generation.token.reason == "reset"
+    assert not generation.complete and recorded == []
+    # Nothing left to cancel, and the next start begins afresh
+    assert not generations.cancel("debate", "reset")
+    assert generations.start("debate", 1, lambda token: iter(["opening"]), recorded.append) is not generation
+
+def test_finished_generation_is_kept_and_a_failed_one_restarted():
+    generations = SessionGenerations()
+    recorded = []
+    done = generations.start("debate", 1, lambda token: iter(["opening"]), recorded.append)
+    wait_until(lambda: done.done)
+    assert done.recorded
+    assert generations.start("debate", 1, blocking_reply(), recorded.append) is done
+
+    def fail(token):
+        raise ValueError("upstream broke")
+        yield
+
+    failed = generations.start("other", 1, fail, recorded.append)
+    wait_until(lambda: failed.done)
+    retry = generations.start("other", 1, lambda token: iter(["opening"]), recorded.append)
+    assert retry is not failed
+    wait_until(lambda: retry.done)
+    assert recorded == [["opening"], ["opening"]]
@@ -0,0 +1,87 @@
+import time
+import asyncio
+import itertools
+import threading
+import pytest
+from config import Config
+from hedging import HedgePolicy, race, arace
+
+class FakeReservation:
+    def __init__(self):
+        self.settled = threading.Event()
+        self.used = "unsettled"
+
+    def settle(self, used_tokens=None):
+        self.used = used_tokens
+        self.settled.set()
+
+@pytest.fixture
+def policy(monkeypatch):
+    monkeypatch.setattr(Config, "HEDGE_ENABLED", True)
+    policy = HedgePolicy(percentile=50, max_rate=1, min_samples=1)
+    policy.observe(0.05)
+    return policy
+
+def spent(result):
+    return "partial" if result is None else result["used"]
+
+def test_hedge_reservation_is_settled_with_what_the_loser_used(policy):
+    delays = iter([0.4, 0.0])
+    reservation = FakeReservation()
+
+    def start():
+        delay = next(delays)
+        time.sleep(delay)
+        return {"used": 100 if delay else 20}
+
+    result = race(start, policy, discard=lambda result: None, reserve=lambda: reservation, spent=spent)
+    assert result == {"used": 20}
+    # The original can't be interrupted, so it is charged once it has answered
+    assert reservation.used == "unsettled"
+    assert reservation.settled.wait(2)
+    assert reservation.used == 100
+
+def test_failed_hedge_refunds_its_reservation(policy):
+    calls = itertools.count()
+    reservation = FakeReservation()
+
+    def start():
+        if next(calls):
+            raise ConnectionError("hedge failed")
+        time.sleep(0.2)
+        return {"used": 100}
+
+    assert race(start, policy, discard=lambda result: None, reserve=lambda: reservation, spent=spent) == {"used": 100}
+    assert reservation.settled.wait(2)
+    assert reservation.used is None
+
+def test_async_loser_is_cancelled_and_charged_its_partial_cost(policy):
+    calls = itertools.count()
+    reservation = FakeReservation()
+
+    async def start():
+        if next(calls) == 0:
+            await asyncio.sleep(5)
+        return {"used": 20}
+
+    async def run():
+        return await arace(start, policy, discard=lambda result: None, reserve=lambda: reservation, spent=spent)
+
+    assert asyncio.run(run()) == {"used": 20}
+    assert reservation.used == "partial"
+
+def test_cancelled_async_race_settles_the_hedge(policy):
+    reservation = FakeReservation()
+
+    async def start():
+        await asyncio.sleep(5)
+
+    async def run():
+        task = asyncio.ensure_future(arace(start, policy, discard=lambda result: None, reserve=lambda: reservation, spent=spent))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert reservation.used == "partial"
@@ -0,0 +1,35 @@
+import time
+import asyncio
+import pytest
+import http_client
+from async_debate_bot import AsyncDebateBot
+from backends import Backend
+from rate_limiter import RateLimiter
+
+PAYLOAD = {"model": "mock", "messages": [{"role": "user", "content": "Hi"}], "max_tokens": 10}
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = RateLimiter(rpm=0, tpm=0)
+    monkeypatch.setattr(http_client, "get_rate_limiter", lambda: limiter)
+    return limiter
+
+@pytest.mark.parametrize("max_retries", [0, 1])
+def test_unretried_429_still_pauses_the_queue(mock_api, limiter, max_retries, monkeypatch):
+    monkeypatch.setattr(http_client, "backoff_delay", lambda attempt: 0)
+    url = mock_api(latency_ms=1, error_rate_429=1.0, retry_after=2)
+    response = http_client.post_with_retries(http_client.get_session(), url, {}, PAYLOAD, max_retries=max_retries)
+    assert response.status_code == 429
+    assert limiter.paused_until - time.monotonic() > 1.5
+
+def test_async_unretried_429_still_pauses_the_queue(mock_api, limiter):
+    url = mock_api(latency_ms=1, error_rate_429=1.0, retry_after=2)
+
+    async def run():
+        async with AsyncDebateBot() as bot:
+            response = await bot._post_with_retries(Backend("mock", url), PAYLOAD, max_retries=0)
+            response.release()
+            return response.status
+
+    assert asyncio.run(run()) == 429
+    assert limiter.paused_until - time.monotonic() > 1.5
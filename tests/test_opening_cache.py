@@ -0,0 +1,43 @@
+import time
+from metrics import REGISTRY
+from opening_cache import LOOKUPS, OpeningCache
+
+def test_shared_reply_is_added_to_the_pool_once():
+    cache = OpeningCache(variants=3)
+    # Five concurrent openings coalesced into one upstream reply
+    for _ in range(5):
+        cache.put("Cats", "medium", "friendly", "Cats rule.")
+    assert cache.get("Cats", "medium", "friendly") is None
+    cache.put("Cats", "medium", "friendly", "Dogs drool.")
+    cache.put("cats?", "medium", "friendly", "Cats nap.")
+    assert cache.get("Cats", "medium", "friendly") in {"Cats rule.", "Dogs drool.", "Cats nap."}
+    assert sorted(v[1] for v in cache._entries[cache.make_key("Cats", "medium", "friendly")]) == ["Cats nap.", "Cats rule.", "Dogs drool."]
+
+def test_restart_keeps_the_newest_variants(tmp_path):
+    path = str(tmp_path / "openings.db")
+    cache = OpeningCache(variants=2, db_path=path)
+    # Written by other processes, out of order
+    for created_at, content in ((3.0, "third"), (1.0, "first"), (2.0, "second")):
+        cache._db.execute("INSERT INTO openings (key, content, created_at) VALUES (?, ?, ?)",
+                          (cache.make_key("Cats", "medium", "friendly"), content, time.time() - 100 + created_at))
+    cache._db.commit()
+
+    restarted = OpeningCache(variants=2, db_path=path)
+    assert sorted(v[1] for v in restarted._load(restarted.make_key("Cats", "medium", "friendly"), time.time())) == ["second", "third"]
+
+def test_database_keeps_only_max_entries_keys(tmp_path):
+    cache = OpeningCache(max_entries=2, variants=1, db_path=str(tmp_path / "openings.db"))
+    for topic in ("Cats", "Dogs", "Birds"):
+        cache.put(topic, "medium", "friendly", f"{topic} win.")
+        time.sleep(0.01)
+    keys = {row[0] for row in cache._db.execute("SELECT key FROM openings")}
+    assert keys == {cache.make_key("Dogs", "medium", "friendly"), cache.make_key("Birds", "medium", "friendly")}
+
+def test_lookups_are_exported_as_metrics():
+    cache = OpeningCache(variants=1)
+    hits, misses = LOOKUPS.value("hit"), LOOKUPS.value("miss")
+    cache.get("Cats", "medium", "friendly")
+    cache.put("Cats", "medium", "friendly", "Cats win.")
+    cache.get("Cats", "medium", "friendly")
+    assert (LOOKUPS.value("hit"), LOOKUPS.value("miss")) == (hits + 1, misses + 1)
+    assert "debate_opening_cache_lookups_total" in REGISTRY.render()
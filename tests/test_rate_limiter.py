@@ -0,0 +1,128 @@
+import time
+import asyncio
+import threading
+import pytest
+from cancellation import CancelToken, GenerationCancelled
+from rate_limiter import RateLimiter
+
+def exhausted(rpm=600):
+    # Ten requests a second, none left right now
+    limiter = RateLimiter(rpm=rpm, tpm=0)
+    limiter.requests.level = 0
+    return limiter
+
+def wait_for_queue(limiter, depth):
+    deadline = time.monotonic() + 2
+    while limiter.queue_depth() < depth:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+def test_interactive_calls_overtake_queued_batch_calls():
+    limiter = exhausted()
+    granted = []
+
+    def call(priority):
+        limiter.acquire(10, priority)
+        granted.append(priority)
+
+    threads = [threading.Thread(target=call, args=("batch",))]
+    threads[0].start()
+    wait_for_queue(limiter, 1)
+    threads.append(threading.Thread(target=call, args=("interactive",)))
+    threads[1].start()
+    for thread in threads:
+        thread.join(2)
+    assert granted == ["interactive", "batch"]
+
+def test_calls_of_equal_priority_run_in_arrival_order():
+    limiter = exhausted()
+    granted = []
+    threads = []
+    for n in range(3):
+        thread = threading.Thread(target=lambda n=n: granted.append(limiter.acquire(10, "batch") and n))
+        thread.start()
+        threads.append(thread)
+        wait_for_queue(limiter, n + 1)
+    for thread in threads:
+        thread.join(2)
+    assert granted == [0, 1, 2]
+
+def test_retry_after_pauses_the_queue():
+    limiter = RateLimiter(rpm=0, tpm=0)
+    limiter.defer(0.3)
+    start = time.monotonic()
+    limiter.acquire(10)
+    assert time.monotonic() - start >= 0.29
+
+def test_a_shorter_retry_after_does_not_cut_a_pause_short():
+    limiter = RateLimiter(rpm=0, tpm=0)
+    limiter.defer(0.3)
+    limiter.defer(0.05)
+    start = time.monotonic()
+    limiter.acquire(10)
+    assert time.monotonic() - start >= 0.29
+
+def test_cancelled_call_leaves_the_queue_at_once():
+    limiter = exhausted(rpm=1)
+    token = CancelToken()
+    errors = []
+
+    def call():
+        try:
+            limiter.acquire(10, cancel_token=token)
+        except GenerationCancelled as e:
+            errors.append((e, time.monotonic()))
+
+    thread = threading.Thread(target=call)
+    thread.start()
+    wait_for_queue(limiter, 1)
+    cancelled_at = time.monotonic()
+    token.cancel()
+    thread.join(2)
+    assert len(errors) == 1
+    assert errors[0][1] - cancelled_at < 0.5
+    assert limiter.queue_depth() == 0
+
+def test_cancelled_async_waiter_leaves_the_queue():
+    limiter = exhausted(rpm=1)
+
+    async def run():
+        task = asyncio.create_task(limiter.aacquire(10))
+        await asyncio.sleep(0.05)
+        assert limiter.queue_depth() == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert limiter.queue_depth() == 0
+
+def test_settle_refunds_unused_tokens_and_charges_the_excess():
+    limiter = RateLimiter(rpm=0, tpm=6000)
+    level = lambda: limiter.tokens.level
+
+    reservation = limiter.acquire(400)
+    assert level() == pytest.approx(5600, abs=5)
+    reservation.settle(100)
+    assert level() == pytest.approx(5900, abs=5)
+    # Settling twice changes nothing
+    reservation.settle(0)
+    assert level() == pytest.approx(5900, abs=5)
+
+    limiter.acquire(400).settle(None)
+    assert level() == pytest.approx(5900, abs=5)
+
+    limiter.acquire(100).settle(300)
+    assert level() == pytest.approx(5600, abs=5)
+
+def test_try_acquire_never_jumps_the_queue():
+    limiter = exhausted()
+    thread = threading.Thread(target=limiter.acquire, args=(10, "batch"))
+    thread.start()
+    wait_for_queue(limiter, 1)
+    with limiter._cond:
+        # Capacity frees up, but the queued call is owed it first
+        limiter.requests.level = 5
+        assert limiter.try_acquire(10) is None
+    thread.join(2)
+    assert limiter.try_acquire(10) is not None
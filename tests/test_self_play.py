@@ -0,0 +1,34 @@
+import json
+import asyncio
+from async_debate_bot import AsyncDebateBot
+from backends import Backend, BackendPool
+from batch import read_jobs
+from self_play import run_self_play
+
+def test_bad_debates_fail_without_aborting_the_run(mock_api, tmp_path):
+    url = mock_api(latency_ms=10)
+    jobs = tmp_path / "debates.jsonl"
+    jobs.write_text("\n".join([
+        json.dumps({"id": "good-1", "topic": "Cats", "turns": 2}),
+        json.dumps({"id": "bad-side", "topic": "Cats", "a": "hard"}),
+        json.dumps({"id": "bad-difficulty", "topic": "Cats", "b": {"difficulty": ["hard"]}}),
+        json.dumps({"id": "bad-turns", "topic": "Cats", "turns": "many"}),
+        '{"id": "cut short", "topic": ',
+        json.dumps({"id": "good-2", "topic": "Dogs", "turns": 2, "a": {"style": "sarcastic"}}),
+    ]) + "\n", encoding="utf-8")
+    output = tmp_path / "transcripts.jsonl"
+
+    async def run():
+        async with AsyncDebateBot() as bot:
+            bot.backends = BackendPool([Backend("mock", url)])
+            return await run_self_play(read_jobs(jobs), output, concurrency=3, bot=bot)
+
+    assert asyncio.run(run()) == (2, 4, 0)
+
+    results = {r["id"]: r for r in map(json.loads, output.read_text(encoding="utf-8").splitlines())}
+    assert results["good-1"]["ok"] and len(results["good-1"]["turns"]) == 2
+    assert results["good-2"]["ok"]
+    assert results["bad-side"]["error"] == "Invalid side a: expected a JSON object"
+    assert results["bad-difficulty"]["error"] == "Unknown difficulty: ['hard']"
+    assert results["bad-turns"]["ok"] is False and results["bad-turns"]["error"]
+    assert results["5"]["error"].startswith("Invalid JSON")
@@ -0,0 +1,151 @@
+import time
+import threading
+import pytest
+from cancellation import CancelToken, GenerationCancelled
+from single_flight import SingleFlight, Flight, COALESCED
+
+def test_abandoned_flight_is_not_joined():
+    flights = SingleFlight()
+    stale = Flight()
+    stale.abandoned = True
+    flights._flights["key"] = stale
+    calls = []
+
+    def produce(token):
+        calls.append(token)
+        return "whole reply"
+
+    assert flights.call("key", produce) == "whole reply"
+    assert len(calls) == 1
+    assert "key" not in flights._flights
+
+def test_abandoned_call_fails_followers_instead_of_truncating():
+    flights = SingleFlight()
+    flight = Flight()
+    flight.followers = 1
+
+    def produce(token):
+        yield "partial "
+        # The last original follower leaves while a late joiner is still reading
+        flight.abandoned = True
+        yield "reply"
+
+    flights._run("key", flight, produce)
+    assert isinstance(flight.error, GenerationCancelled)
+    received = []
+    with pytest.raises(GenerationCancelled):
+        for chunk in flight.follow():
+            received.append(chunk)
+    assert received == ["partial ", "reply"]
+
+def start_reading(flights, key, produce, results, cancel_token=None):
+    def read():
+        try:
+            results.append(list(flights.stream(key, produce, cancel_token)))
+        except Exception as e:
+            results.append(e)
+    thread = threading.Thread(target=read)
+    thread.start()
+    return thread
+
+def wait_for_followers(flights, key, count):
+    deadline = time.monotonic() + 2
+    while flights._flights.get(key) is None or flights._flights[key].followers < count:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+def test_identical_calls_share_one_upstream_call():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def produce(token):
+        calls.append(token)
+        yield "first "
+        release.wait(2)
+        yield "second"
+
+    results = []
+    threads = [start_reading(flights, "key", produce, results)]
+    wait_for_followers(flights, "key", 1)
+    joined = COALESCED.value()
+    threads.append(start_reading(flights, "key", produce, results))
+    wait_for_followers(flights, "key", 2)
+    release.set()
+    for thread in threads:
+        thread.join(2)
+
+    assert len(calls) == 1
+    assert COALESCED.value() == joined + 1
+    # The late joiner replays the chunks it missed
+    assert results == [["first ", "second"], ["first ", "second"]]
+    assert "key" not in flights._flights
+
+def test_error_reaches_every_follower():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def produce(token):
+        yield "partial"
+        release.wait(2)
+        raise ValueError("upstream broke")
+
+    results = []
+    threads = [start_reading(flights, "key", produce, results)]
+    wait_for_followers(flights, "key", 1)
+    threads.append(start_reading(flights, "key", produce, results))
+    wait_for_followers(flights, "key", 2)
+    release.set()
+    for thread in threads:
+        thread.join(2)
+
+    assert len(results) == 2
+    assert all(isinstance(r, ValueError) and str(r) == "upstream broke" for r in results)
+
+def test_last_follower_leaving_cancels_the_call():
+    flights = SingleFlight()
+    stopped = threading.Event()
+
+    def produce(token):
+        token.on_cancel(stopped.set)
+        yield "first"
+        stopped.wait(2)
+        yield "never read"
+
+    callers = [CancelToken(), CancelToken()]
+    results = []
+    threads = [start_reading(flights, "key", produce, results, callers[0])]
+    wait_for_followers(flights, "key", 1)
+    flight = flights._flights["key"]
+    threads.append(start_reading(flights, "key", produce, results, callers[1]))
+    wait_for_followers(flights, "key", 2)
+
+    callers[0].cancel()
+    threads[0].join(2)
+    # One follower is still reading, so the call carries on
+    assert not stopped.is_set()
+    callers[1].cancel()
+    threads[1].join(2)
+    assert stopped.wait(2)
+    assert flight.cancel_token.reason == "abandoned"
+    assert all(isinstance(r, GenerationCancelled) for r in results)
+    assert "key" not in flights._flights
+
+def test_caller_arriving_as_the_last_follower_leaves_gets_a_whole_reply():
+    flights = SingleFlight()
+
+    def produce(token):
+        yield "first "
+        time.sleep(0.005)
+        yield "second"
+
+    for _ in range(100):
+        leaving = CancelToken()
+        first = []
+        reader = start_reading(flights, "key", produce, first, leaving)
+        wait_for_followers(flights, "key", 1)
+        # The only follower leaves just as a new caller arrives for the same key
+        threading.Timer(0, leaving.cancel).start()
+        arriving = list(flights.stream("key", lambda token: iter(["whole reply"])))
+        reader.join(2)
+        assert arriving in (["whole reply"], ["first ", "second"])
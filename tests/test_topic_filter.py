@@ -0,0 +1,36 @@
+import pytest
+from topic_filter import TopicFilter
+
+TOPIC = "Climate Change Solutions"
+
+@pytest.mark.parametrize("message", [
+    "What is the evidence that renewable subsidies actually reduce emissions?",
+    "Explain why climate policy always hurts the poor.",
+    "I think carbon taxes are the most effective climate change solution we have.",
+    "Nuclear power is clean, reliable and far safer than people assume.",
+    "Hello! Carbon capture is a distraction from real climate solutions.",
+    "Which is cheaper, a heat pump or a gas boiler?",
+])
+def test_debate_arguments_are_answered(message):
+    assert TopicFilter(TOPIC).is_debate_message(message)
+
+@pytest.mark.parametrize("message", [
+    "Hello! Who are you and what can you do?",
+    "Tell me a joke",
+    "What is the capital of France?",
+    "Explain quantum physics to me",
+    "Tell me about yourself and everything you could possibly help people with today",
+    "What is your name? Who are you?",
+])
+def test_small_talk_is_filtered(message):
+    assert not TopicFilter(TOPIC).is_debate_message(message)
+
+def test_phrases_only_match_whole_words():
+    # "sushi there" contains "hi there", "unexplained" contains "explain"
+    assert TopicFilter("Cats").is_debate_message("Sushi there is overrated, and its unexplained costs keep rising")
+
+def test_relevance_counts_keywords_at_word_starts():
+    topic_filter = TopicFilter(TOPIC)
+    assert topic_filter.relevance("Climate change solutions now") == 1.0
+    assert topic_filter.relevance("climate shifts need solutions") == pytest.approx(2 / 3)
+    assert topic_filter.relevance("exchange rates") == 0.0
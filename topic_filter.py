@@ -0,0 +1,178 @@
+import re
+import string
+from functools import lru_cache
+from config import Config
+
+_WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+# Common words that say nothing about what a topic is about
+STOPWORDS = frozenset("""
+a an and are as at be been being but by can could did do does for from had has
+have how i if in into is it its of on or should than that the their them there
+these they this to vs versus was we were what when where which who whom why
+will with would you your
+""".split())
+
+_SUFFIXES = ("ing", "ies", "es", "ed", "ly", "s")
+
+def _normalize(text):
+    return text.lower().replace("’", "'")
+
+def _at_word_start(text, index):
+    return index == 0 or not (text[index - 1].isalnum() or text[index - 1] == "_")
+
+def _content_words(text):
+    # Distinct non-stopwords; splitting on whitespace is cheaper than _WORD
+    words = {w.strip(string.punctuation) for w in text.split()}
+    words.discard("")
+    return len(words - STOPWORDS)
+
+def _stem(word):
+    """
+    Crude suffix stripping so "solutions" matches "solution" and "taxing" matches "tax".
+    """
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+def _trie_regex(trie):
+    """
+    Turn a character trie into a regex with shared prefixes factored out.
+    """
+    alternatives = [re.escape(char) + _trie_regex(child) for char, child in sorted(trie.items()) if char]
+    if not alternatives:
+        return ""
+    regex = alternatives[0] if len(alternatives) == 1 else f"(?:{'|'.join(alternatives)})"
+    if "" in trie:
+        regex = f"(?:{regex})?"
+    return regex
+
+@lru_cache(maxsize=64)
+def compile_patterns(patterns):
+    """
+    Compile off-topic phrases into a single regex.
+
+    The phrases are merged into a prefix trie ("what is", "what's the weather"
+    and "what time is it" share "what"), so each position in a message is
+    checked once against all phrases instead of once per phrase. The pattern
+    deliberately starts with a literal character so the regex engine can skip
+    ahead to candidate positions; the word boundary before a match is checked
+    by the caller (see TopicFilter._find_pattern).
+
+    Args:
+        patterns (tuple): Phrases that signal a non-debate message
+
+    Returns:
+        re.Pattern: The compiled matcher
+    """
+    trie = {}
+    for pattern in patterns:
+        node = trie
+        for char in _normalize(pattern):
+            node = node.setdefault(char, {})
+        node[""] = {}
+    return re.compile(_trie_regex(trie) + r"\b")
+
+@lru_cache(maxsize=1024)
+def topic_keywords(topic):
+    """
+    Return the stemmed content words of a topic.
+    """
+    return frozenset(_stem(w) for w in _WORD.findall(_normalize(topic)) if w not in STOPWORDS)
+
+class TopicFilter:
+    """
+    Decides whether a user message belongs in the current debate.
+
+    A message is treated as off-topic when it matches one of the configured
+    non-debate phrases ("tell me a joke", "who are you", ...) and doesn't
+    mention the topic enough to count as an argument about it. Generic
+    question openers ("what is", "explain", ...) only count when the rest of
+    the message is too short to make a point, so "What is the evidence
+    that..." is still answered. It runs before every API call, so matching
+    uses one precompiled regex and the topic's keywords are computed once
+    per topic.
+    """
+    def __init__(self, topic, patterns=None, threshold=None, question_patterns=None, min_words=None):
+        self.topic = topic
+        self.keywords = topic_keywords(topic)
+        self.threshold = Config.TOPIC_RELEVANCE_THRESHOLD if threshold is None else threshold
+        self.min_words = Config.TOPIC_QUESTION_MIN_WORDS if min_words is None else min_words
+        self._topic_lower = _normalize(topic).strip()
+        self._matcher = compile_patterns(tuple(patterns or Config.OFF_TOPIC_PATTERNS))
+        if question_patterns is None:
+            question_patterns = Config.OFF_TOPIC_QUESTION_PATTERNS
+        self._questions = frozenset(_normalize(p) for p in question_patterns)
+
+    def relevance(self, message):
+        """
+        Score how much a message is about the topic.
+
+        Args:
+            message (str): The user's message
+
+        Returns:
+            float: 1.0 if the topic appears verbatim, otherwise the fraction of
+            topic keywords the message mentions
+        """
+        return self._relevance(_normalize(message))
+
+    def _relevance(self, message_lower, stop_at=None):
+        """
+        relevance() for a normalized message, giving up counting once `stop_at` is reached.
+        """
+        if not self.keywords or (self._topic_lower and self._topic_lower in message_lower):
+            return 1.0
+        # A mention is any word starting with a keyword ("solution" ->
+        # "solutions"); a few str.find calls are much cheaper than a regex
+        mentioned = 0
+        for keyword in self.keywords:
+            start = message_lower.find(keyword)
+            while start > 0 and (message_lower[start - 1].isalnum() or message_lower[start - 1] == "_"):
+                start = message_lower.find(keyword, start + 1)
+            if start != -1:
+                mentioned += 1
+                if stop_at is not None and mentioned / len(self.keywords) >= stop_at:
+                    break
+        return mentioned / len(self.keywords)
+
+    def _find_pattern(self, message_lower):
+        """
+        Return the first off-topic phrase match that starts on a word boundary.
+
+        A match on a question opener is only returned if no other phrase
+        matches later in the message.
+        """
+        question = None
+        position = 0
+        while True:
+            match = self._matcher.search(message_lower, position)
+            if match is None:
+                return question
+            start = match.start()
+            if _at_word_start(message_lower, start):
+                if match.group() not in self._questions:
+                    return match
+                question = question or match
+            position = start + 1
+
+    def is_debate_message(self, message):
+        """
+        Return True if the message should be answered as a debate argument.
+        """
+        message_lower = _normalize(message)
+        match = self._find_pattern(message_lower)
+        if match is None or self._relevance(message_lower, self.threshold) >= self.threshold:
+            return True
+        if match.group() in self._questions:
+            rest = message_lower[:match.start()] + " " + message_lower[match.end():]
+            return _content_words(rest) >= self.min_words
+        return False
+
+@lru_cache(maxsize=1024)
+def get_topic_filter(topic):
+    """
+    Return a shared TopicFilter for a topic using the configured patterns.
+    """
+    return TopicFilter(topic)
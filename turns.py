@@ -0,0 +1,120 @@
+import sys
+from collections.abc import Sequence
+from history import estimate_tokens, MESSAGE_OVERHEAD_TOKENS
+
+class Turn:
+    """
+    One message of a debate, stored compactly.
+
+    A slotted object is a fraction of the size of a {"role", "content"} dict,
+    roles are interned so every turn shares the same two strings, and the
+    token estimate is computed once when the turn is recorded rather than on
+    every call that sends it. turn["role"] and turn["content"] still work, so
+    code written for message dicts can read turns unchanged.
+    """
+    __slots__ = ("role", "content", "tokens")
+
+    def __init__(self, role, content):
+        self.role = sys.intern(role)
+        self.content = content
+        self.tokens = estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+    def __getitem__(self, key):
+        if key == "role":
+            return self.role
+        if key == "content":
+            return self.content
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def message(self):
+        """
+        Return the turn as a chat-completions message dict.
+        """
+        return {"role": self.role, "content": self.content}
+
+    def __repr__(self):
+        return f"Turn({self.role!r}, {self.content[:40]!r})"
+
+class TurnLog(Sequence):
+    """
+    A debate's conversation: an append-only sequence of Turns.
+
+    Slicing returns a TurnView over the same turns instead of a copy, so
+    showing the latest messages or windowing the history for a call never
+    duplicates the conversation.
+    """
+    __slots__ = ("_turns",)
+
+    def __init__(self, rows=()):
+        """
+        Args:
+            rows (iterable): (role, content) pairs to start with, e.g. loaded from a store
+        """
+        self._turns = [Turn(role, content) for role, content in rows]
+
+    def append(self, role, content):
+        """
+        Record a new turn at the end of the conversation.
+
+        Returns:
+            Turn: The recorded turn
+        """
+        turn = Turn(role, content)
+        self._turns.append(turn)
+        return turn
+
+    def __len__(self):
+        return len(self._turns)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self._turns))
+            if step != 1:
+                return self._turns[index]
+            return TurnView(self._turns, start, stop)
+        return self._turns[index]
+
+    def __iter__(self):
+        return iter(self._turns)
+
+    def messages(self):
+        """
+        Return the conversation as a list of message dicts, e.g. for JSON output.
+        """
+        return [turn.message() for turn in self._turns]
+
+class TurnView(Sequence):
+    """
+    A read-only window onto consecutive turns of a TurnLog, without copying them.
+    """
+    __slots__ = ("_turns", "_start", "_stop")
+
+    def __init__(self, turns, start, stop):
+        self._turns = turns
+        self._start = start
+        self._stop = max(start, stop)
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return list(self)[index]
+            return TurnView(self._turns, self._start + start, self._start + stop)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("turn index out of range")
+        return self._turns[self._start + index]
+
+    def __iter__(self):
+        for index in range(self._start, self._stop):
+            yield self._turns[index]